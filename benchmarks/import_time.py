@@ -0,0 +1,69 @@
+"""
+Measure how long importing usgeocoder takes in a new interpreter, and fail if it regresses.
+
+Each case is run in a fresh `python` process several times and the fastest run is kept. The script exits with
+status 1 if a case takes longer than its budget, or imports a module it should not, so it can run in CI.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 10 --scale 2
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# Statement run by each case, the seconds it may take, and modules it must not import
+CASES = {
+    'import usgeocoder': ('import usgeocoder', 0.05, ['pandas', 'numpy', 'requests']),
+    'single requests': ('from usgeocoder import geocode_address, geocode_coordinates', 0.5, ['pandas', 'numpy']),
+    'cli --help': ('from usgeocoder.cli import main\ntry:\n    main(["--help"])\nexcept SystemExit:\n    pass',
+                   0.1, ['pandas', 'numpy', 'requests']),
+    'Geocoder': ('from usgeocoder import Geocoder', 2.0, []),
+}
+
+SCRIPT = '''
+import io, json, sys, time
+from contextlib import redirect_stdout
+start = time.perf_counter()
+with redirect_stdout(io.StringIO()):
+    exec({statement!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(sys.modules)}}))
+'''
+
+
+def measure(statement):
+    """ Return the seconds a statement takes in a new interpreter and the modules it imported. """
+    output = subprocess.run([sys.executable, '-c', SCRIPT.format(statement=statement)], check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.splitlines()[-1])
+    return result['seconds'], set(result['modules'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Runs of each case. Default is 5.')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiply every budget, for slower machines. Default is 1.')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name, (statement, budget, forbidden) in CASES.items():
+        results = [measure(statement) for _ in range(args.runs)]
+        seconds = min(seconds for seconds, _ in results)
+        imported = sorted(module for module in forbidden if module in results[0][1])
+
+        status = 'ok'
+        if seconds > budget * args.scale:
+            status = f'FAILED: over budget of {budget * args.scale * 1000:.0f} ms'
+        elif imported:
+            status = f'FAILED: imports {", ".join(imported)}'
+        failed |= status != 'ok'
+        print(f'{name:<18} {seconds * 1000:8.1f} ms  {status}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Compare the memory used by located reverse geocoding results in the default schema and in the compact schema of
+`compact_results`.
+
+    python -m benchmarks.memory --rows 2000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from usgeocoder import compact_results
+
+
+def located_coordinates(rows, seed=0):
+    """ Return synthetic located coordinates in the default schema, with realistic numbers of distinct names. """
+    rng = np.random.default_rng(seed)
+    states = np.array([f'State {i}' for i in range(56)], dtype=object)
+    counties = np.array([f'County {i}' for i in range(3200)], dtype=object)
+    tracts = np.array([f'{i // 100}.{i % 100:02d}' if i % 100 else str(i // 100) for i in range(10000, 40000)],
+                      dtype=object)
+    blocks = np.array([str(i) for i in range(1000, 5000)], dtype=object)
+    dates = pd.date_range('2023-01-01', periods=365).strftime('%Y-%m-%d').to_numpy(dtype=object)
+
+    longitudes = rng.uniform(-125, -67, rows).round(6)
+    latitudes = rng.uniform(25, 49, rows).round(6)
+    return pd.DataFrame({
+        'Coordinates': list(zip(longitudes.tolist(), latitudes.tolist())),
+        'Date': dates[rng.integers(0, len(dates), rows)],
+        'State': states[rng.integers(0, len(states), rows)],
+        'County': counties[rng.integers(0, len(counties), rows)],
+        'Census Block': blocks[rng.integers(0, len(blocks), rows)],
+        'Census Tract': tracts[rng.integers(0, len(tracts), rows)],
+    })
+
+
+def memory(df):
+    """ Return the bytes used by a DataFrame, including the floats inside coordinate tuples. """
+    size = df.memory_usage(deep=True).sum()
+    if 'Coordinates' in df.columns and df['Coordinates'].dtype == object:
+        # `memory_usage` counts each tuple but not the two float objects it holds
+        size += 2 * 24 * df['Coordinates'].notna().sum()
+    return int(size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000, help='Number of results. Default is 2,000,000.')
+    args = parser.parse_args()
+
+    df = located_coordinates(args.rows)
+    start = time.perf_counter()
+    compact = compact_results(df)
+    seconds = time.perf_counter() - start
+
+    default_size, compact_size = memory(df), memory(compact)
+    print(f'{args.rows:,} located coordinates')
+    print(f' - default schema: {default_size / 2 ** 20:,.1f} MiB')
+    print(f' - compact schema: {compact_size / 2 ** 20:,.1f} MiB ({default_size / compact_size:.1f}x smaller)')
+    print(f' - conversion:     {seconds:.2f} seconds')
+    print()
+    for column in df.columns:
+        print(f'   {column:<14} {memory(df[[column]]) / args.rows:7.1f} bytes per row', end='')
+        compact_columns = ['Longitude', 'Latitude'] if column == 'Coordinates' else [column]
+        print(f' -> {memory(compact[compact_columns]) / args.rows:5.1f}')
+
+
+if __name__ == '__main__':
+    main()
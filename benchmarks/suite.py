@@ -0,0 +1,342 @@
+"""
+Benchmark usgeocoder against a local mock of the Census Geocoder and compare the results with a baseline.
+
+Each scenario runs against `tests.mock_census.MockCensusServer`, which answers the single address, coordinates, and
+batch endpoints with a configurable latency distribution, error rate, timeout rate, and match rate. Scenarios cover
+`batch_geocode`, `bulk_geocode`, and `Geocoder.forward`, `reverse`, `merge_data`, and `save_data` at several input
+sizes, cache sizes, and concurrency levels.
+
+For each scenario the suite reports rows and requests per second, the p50 and p99 request latency seen by the
+server, and the peak memory traced by `tracemalloc` during one extra run. Throughput is the median of `--repeat`
+runs. With `--compare`, the suite exits with status 1 if a scenario is slower or uses more memory than the baseline
+by more than `--tolerance`.
+
+Run from the root of the repository:
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only geocoder --latency lognormal --error-rate 0.01
+    python -m benchmarks.suite --save benchmarks/baseline.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from usgeocoder import census_api, geocoder as geocoder_module
+from usgeocoder import (Geocoder, ResultStore, batch_geocode, bulk_geocode, configure_rate_controller,
+                        normalize_addresses)
+from tests.mock_census import MockCensusServer, geographies, locate
+
+# Latency distributions of the mock server, as functions of a random.Random and the mean latency in seconds
+LATENCIES = {
+    'constant': lambda rng, mean: mean,
+    'uniform': lambda rng, mean: rng.uniform(0, 2 * mean),
+    'exponential': lambda rng, mean: rng.expovariate(1 / mean) if mean else 0.0,
+    # Median of half the mean with a long tail, like the response times of a shared web service
+    'lognormal': lambda rng, mean: rng.lognormvariate(np.log(mean / 2), 1.18) if mean else 0.0,
+}
+
+
+def addresses(rows, start=0):
+    """ Return synthetic addresses that the mock server can geocode. """
+    return [f'{i} Main St, Springfield, IL 62701' for i in range(start, start + rows)]
+
+
+def forward_results(rows, start=0):
+    """ Return located forward results for synthetic addresses, keyed by their canonical form like a `Geocoder`. """
+    located = [(address, locate(address)) for address in addresses(rows, start)]
+    return pd.DataFrame({
+        'Address': normalize_addresses(pd.Series([address for address, _ in located])).tolist(),
+        'Date': '2024-01-01',
+        'Longitude': [point[0] for _, point in located],
+        'Latitude': [point[1] for _, point in located],
+        'Coordinates': [point for _, point in located],
+    })
+
+
+def reverse_results(points):
+    """ Return located reverse results for points, as cached by a previous run. """
+    rows = []
+    for longitude, latitude in points:
+        layers = geographies(longitude, latitude)
+        rows.append({'Coordinates': (longitude, latitude), 'Date': '2024-01-01',
+                     'State': layers['States'][0]['BASENAME'], 'County': layers['Counties'][0]['BASENAME'],
+                     'Census Block': layers['2020 Census Blocks'][0]['BASENAME'],
+                     'Census Tract': layers['Census Tracts'][0]['BASENAME']})
+    return pd.DataFrame(rows)
+
+
+# Geocoder directory with a cache of each size, built once and copied for every run
+_caches = {}
+
+
+def _cache(cache_size):
+    """ Return a geocoder directory with the results of `cache_size` other addresses and their coordinates. """
+    if cache_size not in _caches:
+        directory = Path(tempfile.mkdtemp(prefix='usgeocoder-benchmark-cache-')) / 'geocoder'
+        directory.mkdir()
+        store = ResultStore(directory / 'geocoder.db')
+        cached = forward_results(cache_size, start=10 ** 8)
+        store.upsert('addresses', cached)
+        store.upsert('coordinates', reverse_results(cached['Coordinates']))
+        store.save_index()
+        store.close()
+        _caches[cache_size] = directory
+    return _caches[cache_size]
+
+
+class Run:
+    """ A fresh geocoder directory for one run of a scenario, with a cache of `cache_size` results. """
+
+    def __init__(self, cache_size=0):
+        self.directory = Path(tempfile.mkdtemp(prefix='usgeocoder-benchmark-'))
+        if cache_size:
+            shutil.copytree(_cache(cache_size), self.directory / 'geocoder')
+        else:
+            (self.directory / 'geocoder').mkdir()
+        geocoder_module.ROOT = self.directory
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def scenario_batch_geocode(rows, n_threads, **_):
+    """ Forward geocode addresses one request at a time with `batch_geocode`. """
+    data = addresses(rows)
+
+    def run():
+        batch_geocode(data, direction='forward', n_threads=n_threads)
+
+    return None, run
+
+
+def scenario_bulk_geocode(rows, chunk_size, n_threads, **_):
+    """ Forward geocode addresses through the batch endpoint with `bulk_geocode`. """
+    data = addresses(rows)
+
+    def run():
+        bulk_geocode(data, chunk_size=chunk_size, n_threads=n_threads)
+
+    return None, run
+
+
+def scenario_forward(rows, cache_size, engine, **_):
+    """ Forward geocode new addresses with `Geocoder.forward` against a cache of `cache_size` results. """
+    state = {}
+
+    def setup():
+        state['run'] = Run(cache_size)
+        state['geo'] = Geocoder()
+        state['geo'].add_addresses(pd.Series(addresses(rows), name='Address'))
+        return state['run']
+
+    def run():
+        state['geo'].forward(engine=engine)
+
+    return setup, run
+
+
+def scenario_reverse(rows, cache_size, **_):
+    """ Reverse geocode new coordinates with `Geocoder.reverse` against a cache of `cache_size` results. """
+    state = {}
+    points = forward_results(rows)['Coordinates'].tolist()
+
+    def setup():
+        state['run'] = Run(cache_size)
+        state['geo'] = Geocoder()
+        state['geo'].add_coordinates(pd.Series(points, name='Coordinates'))
+        return state['run']
+
+    def run():
+        state['geo'].reverse()
+
+    return setup, run
+
+
+def scenario_merge_data(rows, cache_size, **_):
+    """ Merge data of cached addresses with their results with `Geocoder.merge_data`. """
+    state = {}
+
+    def setup():
+        state['run'] = Run(cache_size)
+        located = forward_results(rows)
+        store = ResultStore(state['run'].directory / 'geocoder' / 'geocoder.db')
+        store.upsert('addresses', located)
+        store.upsert('coordinates', reverse_results(located['Coordinates']))
+        store.close()
+        state['geo'] = Geocoder(data=pd.DataFrame({'Address': addresses(rows)}))
+        return state['run']
+
+    def run():
+        state['geo'].merge_data()
+
+    return setup, run
+
+
+def scenario_save_data(rows, cache_size, **_):
+    """ Save new results to a store of `cache_size` results with `Geocoder.save_data`. """
+    state = {}
+    located = forward_results(rows)
+    failed = pd.DataFrame(columns=located.columns.tolist() + ['Status', 'Attempts'])
+
+    def setup():
+        state['run'] = Run(cache_size)
+        state['geo'] = Geocoder()
+        state['geo']._add_forward_results(located, failed)
+        return state['run']
+
+    def run():
+        state['geo'].save_data()
+
+    return setup, run
+
+
+# Name, scenario, and parameters of each benchmark
+SCENARIOS = [
+    ('batch_geocode[rows=2000,threads=4]', scenario_batch_geocode, {'rows': 2000, 'n_threads': 4}),
+    ('batch_geocode[rows=2000,threads=16]', scenario_batch_geocode, {'rows': 2000, 'n_threads': 16}),
+    ('bulk_geocode[rows=20000,chunk=2000,threads=4]', scenario_bulk_geocode,
+     {'rows': 20000, 'chunk_size': 2000, 'n_threads': 4}),
+    ('geocoder.forward[rows=20000,cache=0,batch]', scenario_forward,
+     {'rows': 20000, 'cache_size': 0, 'engine': 'batch'}),
+    ('geocoder.forward[rows=20000,cache=200000,batch]', scenario_forward,
+     {'rows': 20000, 'cache_size': 200000, 'engine': 'batch'}),
+    ('geocoder.forward[rows=1000,cache=0,request]', scenario_forward,
+     {'rows': 1000, 'cache_size': 0, 'engine': 'request'}),
+    ('geocoder.reverse[rows=1000,cache=0]', scenario_reverse, {'rows': 1000, 'cache_size': 0}),
+    ('geocoder.reverse[rows=1000,cache=200000]', scenario_reverse, {'rows': 1000, 'cache_size': 200000}),
+    ('geocoder.merge_data[rows=100000,cache=0]', scenario_merge_data, {'rows': 100000, 'cache_size': 0}),
+    ('geocoder.merge_data[rows=100000,cache=200000]', scenario_merge_data, {'rows': 100000, 'cache_size': 200000}),
+    ('geocoder.save_data[rows=50000,cache=0]', scenario_save_data, {'rows': 50000, 'cache_size': 0}),
+    ('geocoder.save_data[rows=50000,cache=200000]', scenario_save_data, {'rows': 50000, 'cache_size': 200000}),
+]
+
+
+def measure(server, scenario, params, repeat):
+    """ Run a scenario `repeat` times for throughput and once more under tracemalloc for peak memory. """
+    setup, run = scenario(**params)
+
+    def once(trace=False):
+        context = setup() if setup else None
+        counts, durations = sum(server.counts.values()), len(server.durations)
+        try:
+            if trace:
+                tracemalloc.start()
+            start = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if trace else None
+        finally:
+            if trace:
+                tracemalloc.stop()
+            if context is not None:
+                context.close()
+        return seconds, sum(server.counts.values()) - counts, server.durations[durations:], peak
+
+    runs = [once() for _ in range(repeat)]
+    seconds = statistics.median(run[0] for run in runs)
+    requests = statistics.median(run[1] for run in runs)
+    latencies = np.concatenate([run[2] for run in runs]) if any(run[2] for run in runs) else np.array([np.nan])
+    peak = once(trace=True)[3]
+
+    return {
+        'seconds': round(seconds, 4),
+        'rows_per_second': round(params['rows'] / seconds, 1),
+        'requests_per_second': round(requests / seconds, 1),
+        'p50_latency_ms': round(float(np.nanpercentile(latencies, 50)) * 1000, 2) if requests else None,
+        'p99_latency_ms': round(float(np.nanpercentile(latencies, 99)) * 1000, 2) if requests else None,
+        'peak_memory_mb': round(peak / 2 ** 20, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """ Print the change of each scenario against the baseline and return the names of those that regressed. """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        speed = result['rows_per_second'] / before['rows_per_second']
+        memory = result['peak_memory_mb'] / max(before['peak_memory_mb'], 0.1)
+        regressed = speed < 1 - tolerance or memory > 1 + tolerance
+        if regressed:
+            regressions.append(name)
+        print(f'{name:<48} {speed:6.2f}x speed {memory:6.2f}x memory{"  REGRESSED" if regressed else ""}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='run only scenarios whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of each scenario (default: 3)')
+    parser.add_argument('--latency', choices=list(LATENCIES), default='constant',
+                        help='latency distribution of the mock server (default: constant)')
+    parser.add_argument('--mean-latency', type=float, default=0.005,
+                        help='mean latency of the mock server in seconds (default: 0.005)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='fraction of requests that time out')
+    parser.add_argument('--match-rate', type=float, default=1.0, help='fraction of addresses that match')
+    parser.add_argument('--rate', type=float, default=5000.0,
+                        help='requests per second allowed by the rate controller, or 0 for the library defaults. '
+                             'The default of 5000 keeps the controller from hiding client overhead (default: 5000)')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare the results with a baseline JSON file written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='fraction of speed or memory a scenario may lose against the baseline (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    distribution = LATENCIES[args.latency]
+    server = MockCensusServer(latency=lambda rng: distribution(rng, args.mean_latency), error_rate=args.error_rate,
+                              timeout_rate=args.timeout_rate, match_rate=args.match_rate)
+    server.start()
+    base_url, root = census_api.BASE_URL, geocoder_module.ROOT
+    census_api.BASE_URL = server.url
+
+    results = {}
+    try:
+        for name, scenario, params in SCENARIOS:
+            if args.only and args.only not in name:
+                continue
+            # Each scenario starts from the same request rate rather than the rate the previous one reached
+            configure_rate_controller(**({'rate': args.rate, 'max_rate': args.rate} if args.rate else {}))
+            results[name] = measure(server, scenario, params, args.repeat)
+            result = results[name]
+            latency = '' if result['p50_latency_ms'] is None else \
+                f'p50 {result["p50_latency_ms"]:7.2f} ms  p99 {result["p99_latency_ms"]:7.2f} ms  '
+            print(f'{name:<48} {result["rows_per_second"]:10,.0f} rows/s  {result["requests_per_second"]:8,.0f} '
+                  f'req/s  {latency}{result["peak_memory_mb"]:7.1f} MB')
+    finally:
+        census_api.BASE_URL, geocoder_module.ROOT = base_url, root
+        configure_rate_controller()
+        server.stop()
+        for directory in _caches.values():
+            shutil.rmtree(directory.parent, ignore_errors=True)
+
+    if args.save:
+        keys = ['latency', 'mean_latency', 'error_rate', 'timeout_rate', 'match_rate', 'rate', 'repeat']
+        settings = {key: getattr(args, key) for key in keys}
+        output = {'python': platform.python_version(), 'pandas': pd.__version__, 'settings': settings,
+                  'results': results}
+        Path(args.save).write_text(json.dumps(output, indent=2) + '\n')
+
+    if args.compare:
+        print()
+        baseline = json.loads(Path(args.compare).read_text())['results']
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+A local stand-in for the U.S. Census Geocoder used by the tests and benchmarks.
+
+Addresses containing the word "Nowhere" never match, and those containing "Malformed" get a single address match
+without coordinates from the onelineaddress endpoints. Every other address is placed at a deterministic point derived
+from a checksum of the address, so repeated requests for the same address return the same coordinates. With a
+`match_rate` below 1, the same checksum decides which addresses do not match.
+"""
+import csv
+import io
+import json
+import random
+import threading
+import time
+import zlib
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def locate(address, match_rate=1.0):
+    """ Return the deterministic (longitude, latitude) of an address, or None if it does not match. """
+    if 'nowhere' in address.lower():
+        return None
+    checksum = zlib.crc32(address.encode('utf-8'))
+    if checksum % 10000 >= match_rate * 10000:
+        return None
+    longitude = round(-124 + (checksum % 50000) / 1000, 6)
+    latitude = round(25 + (checksum // 50000 % 23000) / 1000, 6)
+    return longitude, latitude
+
+
+def geographies(longitude, latitude):
+    """ Return deterministic Census geographies for a point, mirroring the layers of the real response. """
+    checksum = zlib.crc32(f'{longitude:.6f},{latitude:.6f}'.encode('utf-8'))
+    state_fips = f'{checksum % 56 + 1:02d}'
+    county_fips = f'{checksum // 56 % 999 + 1:03d}'
+    tract = f'{checksum // 100 % 999999:06d}'
+    block = f'{checksum // 1000 % 9999:04d}'
+    return {
+        'States': [{'BASENAME': f'State {state_fips}', 'STATE': state_fips}],
+        'Counties': [{'BASENAME': f'County {county_fips}', 'STATE': state_fips, 'COUNTY': county_fips}],
+        'Census Tracts': [{'BASENAME': str(int(tract) / 100).rstrip('0').rstrip('.'), 'TRACT': tract}],
+        '2020 Census Blocks': [{'BASENAME': block, 'BLOCK': block}],
+    }
+
+
+class MockCensusServer:
+    """
+    A threaded HTTP server that mimics the Census Geocoder endpoints used by usgeocoder.
+
+    Attributes
+    ----------
+    url : str
+        Base URL to assign to `usgeocoder.census_api.BASE_URL`.
+    counts : dict
+        Number of requests received per endpoint path.
+    durations : list of float
+        Seconds the server spent on each request, from reading it to sending the response.
+    latency : float or callable
+        Seconds to wait before answering each request, or a function that takes a `random.Random` and returns the
+        seconds to wait, such as `lambda rng: rng.lognormvariate(-4, 0.5)`.
+    error_rate : float
+        Fraction of requests answered with a 503 Service Unavailable error.
+    timeout_rate : float
+        Fraction of requests that are only answered after `timeout_delay` seconds, so the client times out.
+    timeout_delay : float
+        Seconds before a request selected by `timeout_rate` is answered. Default is 2, longer than the first
+        request timeout of `census_api.timeouts`.
+    match_rate : float
+        Fraction of addresses that match. Default is 1.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0, timeout_rate=0.0, timeout_delay=2.0, match_rate=1.0):
+        self.counts = {}
+        self.durations = []
+        self.latency = latency
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.match_rate = match_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        # Clients close connections of requests that timed out, so failed writes are expected
+        self._server.handle_error = lambda request, client_address: None
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}/geocoder'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, path):
+        """ Return the number of requests received for an endpoint path such as 'locations/addressbatch'. """
+        return self.counts.get(f'/geocoder/{path}', 0)
+
+    def _record(self, path):
+        """ Count a request, wait for the configured latency, and return True if it should fail. """
+        with self._lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+            draw = self._random.random()
+            latency = self.latency(self._random) if callable(self.latency) else self.latency
+        if draw < self.timeout_rate:
+            latency = max(latency, self.timeout_delay)
+        if latency:
+            time.sleep(latency)
+        return self.timeout_rate <= draw < self.timeout_rate + self.error_rate
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, which would wait for delayed ACKs on kept-alive connections
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, content_type='application/json'):
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._timed(self._get)
+
+            def do_POST(self):
+                self._timed(self._post)
+
+            def _timed(self, method):
+                start = time.perf_counter()
+                try:
+                    method()
+                finally:
+                    server.durations.append(time.perf_counter() - start)
+
+            def _get(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if server._record(url.path):
+                    self.send_error(503)
+                    return
+
+                if 'malformed' in params.get('address', '').lower():
+                    self._send(json.dumps({'result': {'addressMatches': [{'matchedAddress': params['address']}]}}))
+
+                elif url.path == '/geocoder/locations/onelineaddress':
+                    point = locate(params.get('address', ''), server.match_rate)
+                    matches = [] if point is None else [{'coordinates': {'x': point[0], 'y': point[1]}}]
+                    self._send(json.dumps({'result': {'addressMatches': matches}}))
+
+                elif url.path == '/geocoder/geographies/onelineaddress':
+                    point = locate(params.get('address', ''), server.match_rate)
+                    matches = [] if point is None else [{
+                        'coordinates': {'x': point[0], 'y': point[1]},
+                        'geographies': geographies(*point)
+                    }]
+                    self._send(json.dumps({'result': {'addressMatches': matches}}))
+
+                elif url.path == '/geocoder/geographies/coordinates':
+                    layers = geographies(float(params['x']), float(params['y']))
+                    self._send(json.dumps({'result': {'geographies': layers}}))
+
+                else:
+                    self.send_error(404)
+
+            def _post(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length', 0))
+                payload = self.rfile.read(length)
+                if server._record(url.path):
+                    self.send_error(503)
+                    return
+
+                if url.path != '/geocoder/locations/addressbatch':
+                    self.send_error(404)
+                    return
+
+                # Parse the multipart upload and read the address file
+                header = f'Content-Type: {self.headers["Content-Type"]}\r\n\r\n'.encode('utf-8')
+                message = BytesParser(policy=HTTP).parsebytes(header + payload)
+                address_file = ''
+                for part in message.iter_parts():
+                    if part.get_param('name', header='content-disposition') == 'addressFile':
+                        address_file = part.get_payload(decode=True).decode('utf-8')
+
+                output = io.StringIO()
+                writer = csv.writer(output, quoting=csv.QUOTE_ALL)
+                for row in csv.reader(io.StringIO(address_file)):
+                    unique_id, street, city, state, zip_code = (row + [''] * 5)[:5]
+                    address = ', '.join(part for part in [street, city, state] if part)
+                    address = f'{address} {zip_code}'.strip()
+                    point = locate(address, server.match_rate)
+                    if point is None:
+                        writer.writerow([unique_id, address, 'No_Match'])
+                    else:
+                        writer.writerow([unique_id, address, 'Match', 'Exact', address.upper(),
+                                         f'{point[0]},{point[1]}', '1', 'L'])
+                self._send(output.getvalue(), content_type='text/csv')
+
+        return Handler
@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from usgeocoder import GeocodeCache, ResultStore, census_api
+
+from .mock_census import MockCensusServer, locate
+
+
+class TestGeocodeCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+
+    def requests(self):
+        return self.server.count('locations/onelineaddress') + self.server.count('geographies/coordinates')
+
+    def test_hits_and_misses(self):
+        cache = GeocodeCache()
+        before = self.requests()
+
+        # Variants of the same address share one request, and each result keeps the requested address
+        response = cache.geocode_address('200 East Colfax Avenue, Denver, CO 80203')
+        variant = cache.geocode_address('200 E. Colfax Ave, Denver, CO 80203')
+        self.assertEqual(response['Coordinates'], locate('200 East Colfax Avenue, Denver, CO 80203'))
+        self.assertEqual(variant['Coordinates'], response['Coordinates'])
+        self.assertEqual(variant['Address'], '200 E. Colfax Ave, Denver, CO 80203')
+
+        # Unmatched addresses are cached as misses
+        self.assertIsNone(cache.geocode_address('1 Nowhere Rd, Springfield, IL 62701'))
+        self.assertIsNone(cache.geocode_address('1 Nowhere Rd, Springfield, IL 62701'))
+
+        # Points in the same grid cell share one request
+        cache.geocode_coordinates((-104.98, 39.74))
+        nearby = cache.geocode_coordinates((-104.98 + 1e-8, 39.74))
+        self.assertEqual(nearby['Coordinates'], (-104.98 + 1e-8, 39.74))
+
+        self.assertEqual(self.requests() - before, 3)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['requests'], stats['size']), (3, 3, 3, 3))
+
+    def test_eviction_and_expiry(self):
+        cache = GeocodeCache(maxsize=2, ttl=0.2)
+        for i in range(3):
+            cache.geocode_address(f'{i} Main St, Springfield, IL 62701')
+
+        # The least recently used address was evicted
+        self.assertEqual(cache.stats()['evictions'], 1)
+        before = self.requests()
+        cache.geocode_address('0 Main St, Springfield, IL 62701')
+        self.assertEqual(self.requests() - before, 1)
+
+        time.sleep(0.3)
+        cache.geocode_address('0 Main St, Springfield, IL 62701')
+        self.assertEqual(cache.stats()['expirations'], 1)
+        self.assertEqual(self.requests() - before, 2)
+
+    def test_concurrent_lookups(self):
+        cache = GeocodeCache()
+        before = self.requests()
+        threads = [threading.Thread(target=cache.geocode_address, args=('7 Elm St, Springfield, IL 62701',))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Concurrent lookups of the same address share one request
+        self.assertEqual(self.requests() - before, 1)
+        self.assertEqual(cache.stats()['hits'], 7)
+
+    def test_store_read_through(self):
+        directory = tempfile.mkdtemp()
+        try:
+            store = ResultStore(Path(directory) / 'geocoder.db')
+            address = '9 Oak St, Springfield, IL 62701'
+            GeocodeCache(store=store).geocode_address(address)
+            self.assertEqual(store.seen('addresses', ['9 OAK ST, SPRINGFIELD, IL 62701']),
+                             {'9 OAK ST, SPRINGFIELD, IL 62701'})
+
+            # A new cache finds the result in the store without a request
+            cache = GeocodeCache(store=store)
+            before = self.requests()
+            response = cache.geocode_address(address)
+            self.assertEqual(self.requests() - before, 0)
+            self.assertEqual(response['Address'], address)
+            self.assertEqual(response['Coordinates'], locate(address))
+            self.assertEqual(cache.stats()['store_hits'], 1)
+            store.close()
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
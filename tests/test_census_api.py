@@ -0,0 +1,130 @@
+import unittest
+
+from usgeocoder import census_api, batch_geocode, bulk_geocode, geocode_address, iter_geocode
+
+from .mock_census import MockCensusServer, locate
+
+
+class TestCensusAPI(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+
+    def test_geocode_address(self):
+        address = '200 East Colfax Avenue, Denver, CO 80203'
+        response = geocode_address(address)
+        self.assertEqual(response['Coordinates'], locate(address))
+
+    def test_bulk_geocode(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(25)]
+        addresses += ['1 Nowhere Rd, Springfield, IL 62701', addresses[0]]
+        before = self.server.count('locations/addressbatch')
+
+        located, failed = bulk_geocode(addresses, chunk_size=10, n_threads=2)
+
+        # 26 unique addresses in chunks of 10 is three uploads
+        self.assertEqual(self.server.count('locations/addressbatch') - before, 3)
+        self.assertEqual(len(located), 25)
+        self.assertEqual(failed['Address'].tolist(), ['1 Nowhere Rd, Springfield, IL 62701'])
+        self.assertEqual(list(located.columns), census_api.FORWARD_COLUMNS + census_api.STATUS_COLUMNS)
+
+        # Batch results match the single address endpoint
+        row = located[located['Address'] == addresses[3]].iloc[0]
+        self.assertEqual(row['Coordinates'], locate(addresses[3]))
+
+    def test_batch_geocode_status(self):
+        addresses = ['1 Main St, Springfield, IL 62701', '1 Nowhere Rd, Springfield, IL 62701']
+        located, failed = batch_geocode(addresses, direction='forward')
+        self.assertEqual(located[['Status', 'Attempts']].values.tolist(), [['located', 1]])
+        self.assertEqual(failed[['Status', 'Attempts']].values.tolist(), [['no_match', 1]])
+
+    def test_malformed_match(self):
+        # A match without coordinates fails with a decode error, and the rest of the batch still completes
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(10)] + ['1 Malformed St, Springfield, IL']
+        located, failed = batch_geocode(addresses, direction='forward', n_threads=4)
+        self.assertEqual(len(located), 10)
+        self.assertEqual(failed[['Address', 'Status']].values.tolist(),
+                         [['1 Malformed St, Springfield, IL', 'decode_error']])
+        self.assertTrue(failed['Coordinates'].isna().all())
+
+        located, failed = batch_geocode(addresses, direction='combined', n_threads=4)
+        self.assertEqual(len(located), 10)
+        self.assertEqual(failed['Status'].tolist(), ['decode_error'])
+
+    def test_batch_geocode_checkpoint(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(25)]
+        checkpoints = []
+        located, failed = batch_geocode(addresses, direction='forward', n_threads=4,
+                                        checkpoint=lambda located, failed: checkpoints.append(len(located)),
+                                        checkpoint_size=10)
+
+        # Every result is passed to exactly one checkpoint
+        self.assertGreater(len(checkpoints), 2)
+        self.assertEqual(sum(checkpoints), len(located))
+
+    def test_iter_geocode(self):
+        consumed = []
+
+        # The input is read lazily, a few submissions ahead of the results
+        def addresses():
+            for i in range(1000):
+                consumed.append(i)
+                yield f'{i} Main St, Springfield, IL 62701'
+
+        results = iter_geocode(addresses(), direction='forward', n_threads=2, max_in_flight=4)
+        first = [next(results) for _ in range(3)]
+        results.close()
+
+        self.assertEqual([response['Status'] for response in first], ['located'] * 3)
+        self.assertLessEqual(len(consumed), 3 + 4)
+
+    def test_bulk_geocode_chunk_size(self):
+        with self.assertRaises(ValueError):
+            bulk_geocode(['1 Main St'], chunk_size=census_api.BATCH_SIZE + 1)
+
+
+class TestDeferredRetries(unittest.TestCase):
+
+    def setUp(self):
+        self.base_url = census_api.BASE_URL
+        self.retry_backoff = census_api.retry_backoff
+        census_api.retry_backoff = 0.01
+
+    def tearDown(self):
+        census_api.BASE_URL = self.base_url
+        census_api.retry_backoff = self.retry_backoff
+
+    def test_retry_transient_errors(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(30)]
+        with MockCensusServer(error_rate=0.5) as server:
+            census_api.BASE_URL = server.url
+            located, failed = batch_geocode(addresses, direction='forward', n_threads=8, max_attempts=12)
+
+        # Every address is located eventually, and some needed more than one attempt
+        self.assertEqual(len(located), 30)
+        self.assertTrue(failed.empty)
+        self.assertGreater(located['Attempts'].max(), 1)
+        self.assertEqual(server.count('locations/onelineaddress'), located['Attempts'].sum())
+
+    def test_record_failure_class(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(5)]
+        with MockCensusServer(error_rate=1.0) as server:
+            census_api.BASE_URL = server.url
+            located, failed = batch_geocode(addresses, direction='forward', n_threads=5, max_attempts=3)
+
+        self.assertTrue(located.empty)
+        self.assertEqual(set(failed['Status']), {'throttled'})
+        self.assertEqual(set(failed['Attempts']), {3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from usgeocoder import Geocoder, census_api, batch_geocode_async
+from usgeocoder.census_async import aiohttp
+from usgeocoder.rate import configure_rate_controller
+
+from .mock_census import MockCensusServer, locate
+
+ROOT = Path(os.getcwd())
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class TestCensusAsync(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+
+    def tearDown(self):
+        configure_rate_controller()
+        if os.path.exists(ROOT / 'geocoder'):
+            shutil.rmtree(ROOT / 'geocoder')
+
+    def test_batch_geocode_async(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(200)] + ['1 Nowhere Rd', '1 Malformed St']
+        located, failed = asyncio.run(batch_geocode_async(addresses, direction='forward', concurrency=50))
+
+        # A match without coordinates fails with a decode error instead of ending the run
+        self.assertEqual(len(located), 200)
+        self.assertEqual(sorted(failed[['Address', 'Status']].values.tolist()),
+                         [['1 Malformed St', 'decode_error'], ['1 Nowhere Rd', 'no_match']])
+        self.assertEqual(list(located.columns), census_api.FORWARD_COLUMNS + census_api.STATUS_COLUMNS)
+        row = located[located['Address'] == addresses[7]].iloc[0]
+        self.assertEqual(row['Coordinates'], locate(addresses[7]))
+
+        located, failed = asyncio.run(batch_geocode_async(located['Coordinates'], direction='reverse'))
+        self.assertEqual(len(located), 200)
+        self.assertTrue(failed.empty)
+
+    def test_retry_transient_errors(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(30)]
+        configure_rate_controller(rate=500, min_rate=500, concurrency=8, min_concurrency=8)
+        with MockCensusServer(error_rate=0.5) as server:
+            with mock.patch.multiple(census_api, BASE_URL=server.url, retry_backoff=0.01):
+                located, failed = asyncio.run(batch_geocode_async(addresses, concurrency=8, max_attempts=12))
+
+        # Every address is located eventually, and some needed more than one attempt
+        self.assertEqual(len(located), 30)
+        self.assertTrue(failed.empty)
+        self.assertEqual(set(located['Status']), {'located'})
+        self.assertGreater(located['Attempts'].max(), 1)
+        self.assertEqual(server.count('locations/onelineaddress'), located['Attempts'].sum())
+
+    def test_record_failure_class(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(5)]
+        self.server.error_rate = 1.0
+        try:
+            with mock.patch.object(census_api, 'retry_backoff', 0.01):
+                located, failed = asyncio.run(batch_geocode_async(addresses, max_attempts=3))
+        finally:
+            self.server.error_rate = 0.0
+
+        # HTTP 503 responses are throttling, not decoding errors, and are retried up to max_attempts
+        self.assertTrue(located.empty)
+        self.assertEqual(set(failed['Status']), {'throttled'})
+        self.assertEqual(set(failed['Attempts']), {3})
+
+    def test_rate_controlled(self):
+        controller = configure_rate_controller(rate=200, concurrency=20, target_latency=0.2)
+        self.server.error_rate = 1.0
+        try:
+            addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(20)]
+            asyncio.run(batch_geocode_async(addresses, direction='forward', max_attempts=1))
+        finally:
+            self.server.error_rate = 0.0
+
+        # Requests are paced by the shared rate controller, which backs off when the service is throttling
+        stats = controller.stats()
+        self.assertGreater(stats['throttled'], 0)
+        self.assertLess(stats['concurrency'], 20)
+        self.assertLess(stats['rate'], 200)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_geocoder_async(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(20)] + ['1 Nowhere Rd, Springfield, IL 62701']
+
+        # Run inside an existing event loop
+        async def run():
+            geo = Geocoder()
+            await geo.forward_async(addresses)
+            await geo.reverse_async()
+            return geo
+
+        geo = asyncio.run(run())
+        self.assertEqual(len(geo.located_addresses), 20)
+        self.assertEqual(len(geo.located_coordinates), 20)
+
+        # The address without a match is stored as failed, not as a located result without coordinates
+        geo = Geocoder()
+        self.assertEqual(len(geo.located_addresses), 20)
+        self.assertEqual(geo.failed_addresses['Status'].tolist(), ['no_match'])
+        self.assertEqual(geo.store.count('addresses', located=True), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,13 @@ import pandas as pd
 import os
 from pathlib import Path
 import shutil
+import time
+from unittest import mock
 
-from usgeocoder import Geocoder, concatenate_address
+from usgeocoder import Geocoder, census_api, concatenate_address
+from usgeocoder.rate import configure_rate_controller
+
+from .mock_census import MockCensusServer
 
 # Get root of test directory
 ROOT = Path(os.getcwd())
@@ -40,5 +45,218 @@ class TestGeocoder(unittest.TestCase):
         self.assertTrue('Coordinates' in test.columns)
 
 
+class TestGeocoderMockCensus(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.state_capitals = pd.read_csv(ROOT / 'state_capitals.csv')
+        cls.state_capitals['Address'] = concatenate_address(cls.state_capitals)
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.counts.clear()
+        self.geo = Geocoder()
+
+    def tearDown(self):
+        if os.path.exists(ROOT / 'geocoder'):
+            shutil.rmtree(ROOT / 'geocoder')
+
+    def test_process(self):
+        test = self.geo.process(data=self.state_capitals)
+        self.assertEqual(self.server.count('geographies/onelineaddress'), 0)
+        self.assertEqual(len(self.geo.located_addresses), 56)
+        self.assertEqual(len(self.geo.located_coordinates), 56)
+        self.assertFalse(test['State_y'].isna().any())
+
+    def test_process_combined(self):
+        test = self.geo.process(data=self.state_capitals, combined=True)
+        self.assertEqual(self.server.count('geographies/onelineaddress'), 56)
+        self.assertEqual(self.server.count('locations/onelineaddress'), 0)
+        self.assertEqual(self.server.count('geographies/coordinates'), 0)
+        self.assertEqual(len(self.geo.located_addresses), 56)
+        self.assertEqual(len(self.geo.located_coordinates), 56)
+        self.assertFalse(test['State_y'].isna().any())
+
+    def test_process_cached(self):
+        self.geo.process(data=self.state_capitals)
+        self.server.counts.clear()
+
+        # A second run with every address cached sends no requests, also from a new instance
+        self.geo.process(data=self.state_capitals)
+        Geocoder().process(data=self.state_capitals)
+        self.assertEqual(sum(self.server.counts.values()), 0)
+
+    def test_process_normalized(self):
+        data = pd.DataFrame({'Address': ['200 East Colfax Avenue, Denver, CO 80203',
+                                         '200 E. Colfax Ave, Denver, Colorado 80203-1234']})
+        test = self.geo.process(data=data)
+
+        # Both variants share one request and one result, and keep their original address
+        self.assertEqual(self.server.count('locations/addressbatch'), 1)
+        self.assertEqual(len(self.geo.located_addresses), 1)
+        self.assertEqual(test['Address'].tolist(), data['Address'].tolist())
+        self.assertEqual(test['Coordinates'][0], test['Coordinates'][1])
+
+    def test_merge_data_repeated(self):
+        test = self.geo.process(data=self.state_capitals).copy()
+
+        # Merging again replaces the results instead of adding suffixed copies
+        self.geo.merge_data()
+        self.geo.merge_data()
+        pd.testing.assert_frame_equal(self.geo.data, test)
+        self.assertEqual(list(test.columns), ['Street Address', 'City', 'State_x', 'ZIP', 'Address', 'Date_x',
+                                              'Longitude', 'Latitude', 'Coordinates', 'Date_y', 'State_y', 'County',
+                                              'Census Block', 'Census Tract'])
+
+    def test_results_loaded_lazily(self):
+        test = self.geo.process(data=self.state_capitals).copy()
+
+        # A new instance merges cached results without loading the result tables
+        geo = Geocoder()
+        pd.testing.assert_frame_equal(geo.process(data=self.state_capitals), test)
+        self.assertEqual(geo._results, {})
+        self.assertEqual(len(geo.located_addresses), 56)
+        self.assertEqual(list(geo._results), ['located_addresses'])
+
+    def test_compact_results(self):
+        test = self.geo.process(data=self.state_capitals).copy()
+
+        # A compact instance merges the same results, with Longitude and Latitude columns instead of tuples
+        geo = Geocoder(compact=True)
+        self.assertNotIn('Coordinates', geo.located_coordinates.columns)
+        self.assertIsInstance(geo.located_coordinates['State'].dtype, pd.CategoricalDtype)
+        compact = geo.process(data=self.state_capitals)
+        self.assertEqual(compact['State_y'].astype(str).tolist(), test['State_y'].tolist())
+        self.assertEqual(compact['Census Tract'].astype(str).tolist(), test['Census Tract'].tolist())
+
+    def test_process_pipelined(self):
+        test = self.geo.process(data=self.state_capitals, pipelined=True)
+        self.assertEqual(self.server.count('locations/onelineaddress'), 56)
+        self.assertEqual(self.server.count('geographies/coordinates'), 56)
+        self.assertEqual(len(self.geo.located_addresses), 56)
+        self.assertEqual(len(self.geo.located_coordinates), 56)
+        self.assertFalse(test['State_y'].isna().any())
+
+        # A sequential run of a new instance merges the same results without sending requests
+        self.server.counts.clear()
+        pd.testing.assert_frame_equal(Geocoder().process(data=self.state_capitals), test)
+        self.assertEqual(sum(self.server.counts.values()), 0)
+
+    def test_profile(self):
+        self.assertIsNone(self.geo.profile)
+        geo = Geocoder(profile=True)
+        try:
+            geo.process(data=self.state_capitals)
+        finally:
+            geo.profiler.close()
+
+        # Every phase of the run is recorded, nested under the stage it belongs to
+        report = geo.profile
+        self.assertEqual(report['process'].depth, 0)
+        self.assertEqual(report['forward.geocode'].path, ('process', 'forward', 'forward.geocode'))
+        self.assertEqual(report['forward.geocode'].attributes, {'inputs': 56})
+        self.assertEqual(report['reverse.results'].attributes, {'located': 56, 'failed': 0})
+        for name in ['open_store', 'import_csv', 'forward.dedupe', 'reverse.dedupe', 'merge.join', 'save']:
+            self.assertGreaterEqual(report[name].wall, 0)
+            self.assertGreaterEqual(report[name].peak_memory, 0)
+        self.assertGreaterEqual(report['process'].wall, report['forward'].wall + report['reverse'].wall)
+        self.assertEqual(report.totals()['save']['count'], 2)
+
+    def test_reverse_cached_after_csv_round_trip(self):
+        coordinates = [(-104.98 + i / 100, 39.74) for i in range(10)]
+        self.geo.reverse(coordinates=coordinates)
+        self.server.counts.clear()
+
+        # Coordinates read back from CSV as strings, or shifted within the grid, are found in the cache
+        data = pd.DataFrame({'Coordinates': [str((longitude + 1e-9, latitude)) for longitude, latitude in coordinates]})
+        test = Geocoder().process(data=data, forward=False)
+        self.assertEqual(sum(self.server.counts.values()), 0)
+        self.assertFalse(test['Census Tract'].isna().any())
+
+    def test_process_sharded(self):
+        test = self.geo.process(data=self.state_capitals, n_workers=2)
+        self.assertEqual(self.server.count('geographies/coordinates'), 56)
+        self.assertEqual(len(self.geo.located_addresses), 56)
+        self.assertEqual(len(self.geo.located_coordinates), 56)
+        self.assertFalse(test['State_y'].isna().any())
+
+    def test_resume_interrupted_run(self):
+        geo = Geocoder(checkpoint_size=10)
+        save = geo._checkpoint('forward')
+
+        # Interrupt the run after the first checkpoint
+        def interrupt(located_df, failed_df):
+            save(located_df, failed_df)
+            raise KeyboardInterrupt
+
+        geo._checkpoint = lambda table: interrupt
+        with self.assertRaises(KeyboardInterrupt):
+            geo.forward(addresses=self.state_capitals['Address'], engine='request')
+        saved = geo.store.count('addresses')
+        self.assertGreater(saved, 0)
+        self.assertLess(saved, 56)
+
+        # A new run only requests the addresses that were not saved
+        self.server.counts.clear()
+        Geocoder().forward(addresses=self.state_capitals['Address'], engine='request')
+        self.assertEqual(self.server.count('locations/onelineaddress'), 56 - saved)
+
+    def test_resume_after_transient_failures(self):
+        addresses = self.state_capitals['Address']
+        for engine in ['request', 'batch']:
+            # Every request of the first run is throttled, and the failures are saved
+            configure_rate_controller(rate=500, min_rate=500)
+            self.server.error_rate = 1.0
+            try:
+                with mock.patch.multiple(census_api, timeouts=[0.5], batch_timeouts=[5], retry_backoff=0.0):
+                    with self.assertRaises(ValueError):
+                        Geocoder().forward(addresses=addresses, engine=engine)
+            finally:
+                self.server.error_rate = 0.0
+                configure_rate_controller()
+            self.assertEqual(self.geo.store.count('addresses', located=False), 56)
+
+            # A resumed run requests them again and replaces the failures
+            geo = Geocoder()
+            self.assertEqual(len(geo.failed_addresses), 56)
+            geo.forward(addresses=addresses, engine=engine)
+            self.assertEqual(geo.store.count('addresses', located=True), 56)
+            self.assertEqual(len(geo.located_addresses), 56)
+            self.assertTrue(geo.failed_addresses.empty)
+            geo.store.delete('addresses', geo.located_addresses['Address'])
+
+    def test_start_refresh(self):
+        self.geo.forward(addresses=self.state_capitals['Address'][:5], engine='request')
+        self.server.counts.clear()
+
+        # With a negative TTL every result is stale, and is refreshed in place without being deleted first
+        refresher = self.geo.start_refresh(ttl=-1, batch_size=5, interval=0.01)
+        try:
+            deadline = time.monotonic() + 10
+            while refresher.stats()['refreshed'] < 5 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            self.geo.stop_refresh()
+        self.assertIsNone(self.geo.refresher)
+        self.assertFalse(refresher.running)
+        self.assertGreaterEqual(self.server.count('locations/onelineaddress'), 5)
+        self.assertEqual(self.geo.store.count('addresses'), 5)
+
+    def test_delete_data_without_confirmation(self):
+        self.geo.forward(addresses=self.state_capitals['Address'][:5], engine='request')
+        self.geo.delete_data(records='located', time='all', confirm=False)
+        self.assertEqual(len(self.geo.located_addresses), 5)
+        self.geo.delete_data(records='located', time=-1, confirm=False)
+        self.assertEqual(len(self.geo.located_addresses), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
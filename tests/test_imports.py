@@ -0,0 +1,34 @@
+import subprocess
+import sys
+import unittest
+
+
+def imported_modules(statement):
+    """ Return the modules imported by a statement in a new interpreter. """
+    script = f'import sys\n{statement}\nprint(" ".join(sys.modules))'
+    output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout
+    return set(output.split())
+
+
+class TestImports(unittest.TestCase):
+
+    def test_single_requests_without_pandas(self):
+        modules = imported_modules('from usgeocoder import geocode_address, geocode_coordinates')
+        self.assertNotIn('pandas', modules)
+        self.assertNotIn('numpy', modules)
+
+    def test_cli_help_without_pandas(self):
+        modules = imported_modules('from usgeocoder.cli import main\ntry:\n    main(["--help"])\nexcept SystemExit:\n'
+                                   '    pass')
+        self.assertNotIn('pandas', modules)
+
+    def test_lazy_exports(self):
+        import usgeocoder
+        for name in usgeocoder.__all__:
+            self.assertTrue(hasattr(usgeocoder, name), name)
+        with self.assertRaises(AttributeError):
+            usgeocoder.missing_name
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import pandas as pd
+
+from usgeocoder.census_api import FORWARD_COLUMNS, REVERSE_COLUMNS
+from usgeocoder.join import join_results
+
+
+class TestJoin(unittest.TestCase):
+
+    def test_join_results(self):
+        data = pd.DataFrame({'Address': ['1 Main St', '2 Main St', '1 Main St']}, index=[5, 6, 7])
+        located_addresses = pd.DataFrame({'Address': ['1 Main St'], 'Date': ['2024-01-01'], 'Longitude': [-104.98],
+                                          'Latitude': [39.74], 'Coordinates': [(-104.98, 39.74)]})
+        joined = join_results(data, located_addresses)
+        self.assertEqual(joined.index.tolist(), [5, 6, 7])
+        self.assertEqual(joined['Coordinates'].tolist()[::2], [(-104.98, 39.74)] * 2)
+        self.assertTrue(pd.isna(joined['Coordinates'][6]))
+
+    def test_empty_results(self):
+        # Data whose keys have no cached result is joined with empty result tables
+        data = pd.DataFrame({'Address': ['1 Main St', '2 Main St']})
+        joined = join_results(data, pd.DataFrame(columns=FORWARD_COLUMNS), pd.DataFrame(columns=REVERSE_COLUMNS))
+        self.assertEqual(len(joined), 2)
+        self.assertTrue(joined['Coordinates'].isna().all())
+        self.assertTrue(joined['Census Tract'].isna().all())
+
+        data = pd.DataFrame({'Coordinates': [(-104.98, 39.74)]})
+        joined = join_results(data, located_coordinates=pd.DataFrame(columns=REVERSE_COLUMNS))
+        self.assertTrue(joined['State'].isna().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+
+from usgeocoder import census_api, batch_geocode, bulk_geocode, geocode_address
+from usgeocoder.metrics import RequestMetrics, enable_metrics, disable_metrics, get_metrics
+
+from .mock_census import MockCensusServer
+
+
+class TestMetrics(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+
+    def setUp(self):
+        self.metrics = enable_metrics()
+        self.metrics.reset()
+
+    def tearDown(self):
+        disable_metrics()
+
+    def test_batch_geocode(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(9)] + ['1 Nowhere Rd, Springfield, IL 62701']
+        batch_geocode(addresses, direction='forward', n_threads=4)
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['requests'], 10)
+        self.assertEqual(snapshot['outcomes'], {('locations/onelineaddress', 'ok'): 10})
+        self.assertEqual(snapshot['status_codes'], {('locations/onelineaddress', 200): 10})
+        self.assertGreater(snapshot['bytes']['locations/onelineaddress'], 0)
+        self.assertEqual(snapshot['latency']['locations/onelineaddress']['count'], 10)
+        self.assertEqual(snapshot['attempts'], {(0, census_api.timeouts[0]): 10})
+        self.assertEqual(snapshot['retries'], 0)
+        self.assertEqual(snapshot['results'], {('forward', 'located'): 9, ('forward', 'no_match'): 1})
+        self.assertAlmostEqual(snapshot['match_rate'], 0.9)
+        self.assertEqual(snapshot['in_flight'], 0)
+        self.assertGreaterEqual(snapshot['max_in_flight'], 1)
+
+    def test_timeout_ladder(self):
+        timeouts = census_api.timeouts
+        census_api.timeouts = [0.05, 0.1]
+        self.server.timeout_rate, self.server.timeout_delay = 1.0, 0.3
+        try:
+            with self.assertLogs('usgeocoder.census_api', level='WARNING') as logs:
+                self.assertIsNone(geocode_address('1 Main St, Springfield, IL 62701'))
+        finally:
+            census_api.timeouts = timeouts
+            self.server.timeout_rate = 0.0
+
+        # Every rung of the ladder timed out, and the second attempt was a retry
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['attempts'], {(0, 0.05): 1, (1, 0.1): 1})
+        self.assertEqual(snapshot['timeouts'], snapshot['attempts'])
+        self.assertEqual(snapshot['retries'], 1)
+        self.assertEqual(snapshot['outcomes'], {('locations/onelineaddress', 'timeout'): 2})
+        self.assertEqual(snapshot['results'], {('forward', 'timeout'): 1})
+        self.assertIn('All attempts failed', logs.output[0])
+
+    def test_bulk_geocode(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(15)] + ['1 Nowhere Rd, Springfield, IL 62701']
+        bulk_geocode(addresses, chunk_size=8, n_threads=2)
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['outcomes'], {('locations/addressbatch', 'ok'): 2})
+        self.assertEqual(snapshot['results'], {('forward', 'located'): 15, ('forward', 'no_match'): 1})
+
+    def test_prometheus(self):
+        self.server.error_rate = 1.0
+        try:
+            geocode_address('1 Main St, Springfield, IL 62701', batch=True)
+        finally:
+            self.server.error_rate = 0.0
+
+        text = self.metrics.to_prometheus()
+        self.assertIn('# TYPE usgeocoder_request_duration_seconds histogram', text)
+        self.assertIn('usgeocoder_request_duration_seconds_bucket{endpoint="locations/onelineaddress",le="+Inf"} 1',
+                      text)
+        self.assertIn('usgeocoder_requests_total{endpoint="locations/onelineaddress",outcome="throttled"} 1', text)
+        self.assertIn('usgeocoder_http_responses_total{endpoint="locations/onelineaddress",code="503"} 1', text)
+        self.assertIn('usgeocoder_results_total{direction="forward",status="throttled"} 1', text)
+        self.assertIn('usgeocoder_requests_in_flight 0', text)
+
+    def test_hooks(self):
+        events = []
+        self.metrics.add_hook(events.append)
+        try:
+            geocode_address('1 Main St, Springfield, IL 62701')
+        finally:
+            self.metrics.remove_hook(events.append)
+
+        self.assertEqual([event['event'] for event in events], ['request', 'attempt', 'result'])
+        self.assertEqual(events[0]['status_code'], 200)
+        self.assertEqual(events[2]['status'], 'located')
+
+    def test_disabled(self):
+        disable_metrics()
+        self.assertIsNone(get_metrics())
+        self.assertIsNotNone(geocode_address('1 Main St, Springfield, IL 62701'))
+        self.assertEqual(self.metrics.snapshot()['requests'], 0)
+
+    def test_latency_quantile(self):
+        metrics = RequestMetrics(buckets=(0.1, 1.0))
+        self.assertIsNone(metrics.latency_quantile(0.5))
+        for seconds in [0.05] * 8 + [0.5, 5.0]:
+            metrics.request_started()
+            metrics.request_finished('locations/onelineaddress', seconds, 200)
+
+        self.assertAlmostEqual(metrics.latency_quantile(0.4), 0.05)
+        self.assertAlmostEqual(metrics.latency_quantile(0.9), 1.0)
+        self.assertEqual(metrics.latency_quantile(0.99), 1.0)
+        self.assertIsNone(metrics.latency_quantile(0.5, endpoint='geographies/coordinates'))
+
+
+if __name__ == '__main__':
+    unittest.main()
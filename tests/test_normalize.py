@@ -0,0 +1,67 @@
+import unittest
+import pandas as pd
+from unittest import mock
+
+from usgeocoder import normalize, normalize_address, normalize_addresses
+
+
+class TestNormalize(unittest.TestCase):
+
+    def test_variants_share_key(self):
+        variants = pd.Series([
+            '200 East Colfax Avenue, Denver, CO 80203',
+            '200 E. Colfax Ave, Denver, Colorado 80203-1234',
+            '200 east colfax ave.,  denver , co 802031234',
+        ])
+        self.assertEqual(set(normalize_addresses(variants)), {'200 E COLFAX AVE, DENVER, CO 80203'})
+
+    def test_unit_designators(self):
+        self.assertEqual(normalize_address('1 Main Street Apartment #5, Springfield, IL 62701'),
+                         '1 MAIN ST APT 5, SPRINGFIELD, IL 62701')
+        self.assertEqual(normalize_address('1 Main St Suite 200, Springfield, IL 62701'),
+                         '1 MAIN ST STE 200, SPRINGFIELD, IL 62701')
+        self.assertEqual(normalize_address('1 Main St #5, Springfield, IL 62701'),
+                         '1 MAIN ST # 5, SPRINGFIELD, IL 62701')
+
+    def test_city_is_kept(self):
+        # Words that are street suffixes or directionals are not abbreviated in the city
+        self.assertEqual(normalize_address('5 Main St, Fort Worth, Texas 76102'), '5 MAIN ST, FORT WORTH, TX 76102')
+        self.assertEqual(normalize_address('5 Main St, West Point, NY 10996'), '5 MAIN ST, WEST POINT, NY 10996')
+
+    def test_street_name_is_kept(self):
+        # Only the directionals around the street name and its suffix are abbreviated, not words of the name
+        self.assertEqual(normalize_address('100 North Ave, Chicago, IL 60601'), '100 NORTH AVE, CHICAGO, IL 60601')
+        self.assertEqual(normalize_address('1500 Lake Shore Drive, Chicago, IL 60610'),
+                         '1500 LAKE SHORE DR, CHICAGO, IL 60610')
+        self.assertEqual(normalize_address('20 Court Street, Boston, MA 02108'), '20 COURT ST, BOSTON, MA 02108')
+        self.assertEqual(normalize_address('20 North Court Street West, Boston, MA 02108'),
+                         '20 N COURT ST W, BOSTON, MA 02108')
+
+    def test_missing(self):
+        normalized = normalize_addresses(pd.Series(['1 Main St', None], index=[3, 7]))
+        self.assertEqual(normalized.index.tolist(), [3, 7])
+        self.assertIsNone(normalized[7])
+        self.assertIsNone(normalize_address(None))
+        self.assertIsNone(normalize_address(float('nan')))
+
+    def test_single_matches_vectorized(self):
+        addresses = [
+            '200 East Colfax Avenue, Denver, Colorado 80203-1234',
+            ' 1 main street apartment # 5 ,springfield , illinois 62701 ',
+            "O'Hare Intl. Airport, Chicago, IL",
+            '20 North Court Street West',
+            '100 North Ave, Chicago, IL 60601',
+            'PO Box 12, West Point, New York',
+            ', 5 Main St,, Fort Worth, TX 76102-0001,',
+            '',
+        ]
+        expected = normalize_addresses(pd.Series(addresses)).tolist()
+
+        # A single address is normalized the same way without building a Series
+        with mock.patch.object(normalize, 'normalize_addresses', side_effect=AssertionError), \
+                mock.patch.object(pd, 'Series', side_effect=AssertionError):
+            self.assertEqual([normalize_address(address) for address in addresses], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
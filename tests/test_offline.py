@@ -0,0 +1,76 @@
+import os
+import shutil
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from usgeocoder import Geocoder, census_api
+from usgeocoder.offline import LocalReverseGeocoder, tract_name
+
+from .mock_census import MockCensusServer
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+ROOT = Path(os.getcwd())
+
+
+def grid_boundaries():
+    """ Two counties of two blocks each, as unit squares side by side. """
+    return pd.DataFrame({
+        'geometry': [shapely.box(x, 0, x + 1, 1) for x in range(4)],
+        'State': ['Colorado'] * 4,
+        'County': ['Denver', 'Denver', 'Adams', 'Adams'],
+        'Census Block': ['1000', '1001', '2000', '2001'],
+        'Census Tract': ['31.02', '31.02', '85', '85']
+    })
+
+
+@unittest.skipIf(shapely is None, 'shapely is not installed')
+class TestLocalReverseGeocoder(unittest.TestCase):
+
+    def test_reverse(self):
+        backend = LocalReverseGeocoder(grid_boundaries())
+        located, failed = backend.reverse([(0.5, 0.5), (2.5, 0.5), (3.5, 0.25), (10.0, 10.0)])
+
+        self.assertEqual(list(located.columns), census_api.REVERSE_COLUMNS + census_api.STATUS_COLUMNS)
+        blocks = dict(zip(located['Coordinates'], located['Census Block']))
+        self.assertEqual(blocks, {(0.5, 0.5): '1000', (2.5, 0.5): '2000', (3.5, 0.25): '2001'})
+        self.assertEqual(failed['Coordinates'].tolist(), [(10.0, 10.0)])
+        self.assertEqual(failed['Status'].tolist(), ['no_match'])
+        self.assertTrue(failed['State'].isna().all())
+
+    def test_tract_name(self):
+        self.assertEqual(tract_name('003102'), '31.02')
+        self.assertEqual(tract_name('008500'), '85')
+
+
+@unittest.skipIf(shapely is None, 'shapely is not installed')
+class TestGeocoderLocalReverse(unittest.TestCase):
+
+    def tearDown(self):
+        if os.path.exists(ROOT / 'geocoder'):
+            shutil.rmtree(ROOT / 'geocoder')
+
+    def test_process(self):
+        data = pd.DataFrame({'Coordinates': [(0.5, 0.5), (1.5, 0.5), (0.5, 0.5)]})
+        with MockCensusServer() as server:
+            base_url = census_api.BASE_URL
+            census_api.BASE_URL = server.url
+            try:
+                geo = Geocoder()
+                test = geo.process(data=data, forward=False, reverse_backend=LocalReverseGeocoder(grid_boundaries()))
+            finally:
+                census_api.BASE_URL = base_url
+
+        # Results are merged and cached without sending any request
+        self.assertEqual(sum(server.counts.values()), 0)
+        self.assertEqual(test['Census Block'].tolist(), ['1000', '1001', '1000'])
+        self.assertEqual(geo.store.count('coordinates', located=True), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
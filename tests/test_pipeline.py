@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from pathlib import Path
+
+from usgeocoder import census_api, geocode_file
+from usgeocoder.cli import main
+
+from .mock_census import MockCensusServer
+
+ROOT = Path(__file__).parent.parent
+
+
+class TestPipeline(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.counts.clear()
+        self.directory = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.directory, 'geocoder.db')
+        self.output_path = os.path.join(self.directory, 'output.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_geocode_file(self):
+        rows = geocode_file(ROOT / 'state_capitals.csv', self.output_path, chunk_size=20, store_path=self.store_path)
+        output = pd.read_csv(self.output_path)
+
+        # Every chunk is appended, and chunks are uploaded separately
+        self.assertEqual(rows, 56)
+        self.assertEqual(len(output), 56)
+        self.assertEqual(self.server.count('locations/addressbatch'), 3)
+        self.assertFalse(output['Census Tract'].isna().any())
+
+    def test_geocode_cache_misses(self):
+        geocode_file(ROOT / 'state_capitals.csv', self.output_path, chunk_size=20, store_path=self.store_path)
+        self.server.counts.clear()
+
+        # A second run, also from the command line, finds every address and coordinate in the store
+        main([str(ROOT / 'state_capitals.csv'), self.output_path, '--store', self.store_path])
+        self.assertEqual(sum(self.server.counts.values()), 0)
+        self.assertEqual(len(pd.read_csv(self.output_path)), 56)
+
+
+if __name__ == '__main__':
+    unittest.main()
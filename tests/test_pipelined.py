@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from usgeocoder import census_api, configure_session, pipelined_geocode, ResultStore, session_stats
+from usgeocoder.session import get_session
+from usgeocoder.metrics import enable_metrics, disable_metrics
+
+from .mock_census import MockCensusServer, locate
+
+
+class TestPipelined(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.counts.clear()
+        self.directory = tempfile.mkdtemp()
+        self.store = ResultStore(os.path.join(self.directory, 'geocoder.db'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_pipelined_geocode(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(40)]
+        addresses.append('1 Nowhere Rd, Springfield, IL 62701')
+
+        # Record when each request finishes to check that the stages overlap
+        finished = []
+        metrics = enable_metrics()
+        metrics.add_hook(lambda event: event['event'] == 'request'
+                         and finished.append((event['endpoint'], time.monotonic())))
+        self.server.latency = 0.01
+        try:
+            coordinates = pipelined_geocode(addresses, self.store, forward_threads=2, reverse_threads=2,
+                                            queue_size=4, checkpoint_size=10)
+        finally:
+            self.server.latency = 0.0
+            disable_metrics()
+
+        self.assertEqual(sorted(coordinates), sorted(locate(address) for address in addresses[:40]))
+        self.assertEqual(self.store.count('addresses', located=True), 40)
+        self.assertEqual(self.store.count('addresses', located=False), 1)
+        self.assertEqual(self.store.count('coordinates', located=True), 40)
+
+        forward = [t for endpoint, t in finished if endpoint == 'locations/onelineaddress']
+        reverse = [t for endpoint, t in finished if endpoint == 'geographies/coordinates']
+        self.assertLess(min(reverse), max(forward))
+
+    def test_cached_coordinates_skipped(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(10)]
+        pipelined_geocode(addresses, self.store, engine='batch', forward_threads=1)
+        self.server.counts.clear()
+
+        # Coordinates reverse geocoded before are not requested again
+        coordinates = pipelined_geocode(addresses + ['10 Main St, Springfield, IL 62701'], self.store)
+        self.assertEqual(coordinates, [locate('10 Main St, Springfield, IL 62701')])
+        self.assertEqual(self.server.count('geographies/coordinates'), 1)
+
+    def test_pool_sized_for_both_stages(self):
+        configure_session(pool_maxsize=2)
+        session = get_session()
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(10)]
+        try:
+            pipelined_geocode(addresses, self.store, forward_threads=3, reverse_threads=3)
+
+            # The pool is grown once for both stages, keeping the session they share and its statistics
+            self.assertIs(get_session(), session)
+            self.assertEqual(session.get_adapter(census_api.BASE_URL)._pool_maxsize, 6)
+            self.assertEqual(session_stats()['requests'], 20)
+        finally:
+            configure_session()
+
+    def test_reverse_stage_error(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(20)]
+        with mock.patch.object(self.store, 'missing', side_effect=RuntimeError('store failed')):
+            with self.assertRaisesRegex(RuntimeError, 'store failed'):
+                pipelined_geocode(addresses, self.store, queue_size=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+
+from usgeocoder import Profiler, ProfileReport
+
+
+class RecordingTracer:
+    """ A tracer with the `start_as_current_span` method of OpenTelemetry that records its spans. """
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        span = RecordingSpan(name, attributes)
+        self.spans.append(span)
+        yield span
+
+
+class RecordingSpan:
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes or {})
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = Profiler()
+
+    def tearDown(self):
+        self.profiler.close()
+
+    def test_nested_phases(self):
+        with self.profiler.phase('outer'):
+            with self.profiler.phase('inner', rows=10):
+                data = bytearray(4 * 2 ** 20)
+                del data
+            with self.profiler.phase('sibling'):
+                pass
+
+        report = self.profiler.report
+        self.assertEqual([phase.name for phase in report], ['inner', 'sibling', 'outer'])
+        self.assertEqual(report['inner'].path, ('outer', 'inner'))
+        self.assertEqual(report['inner'].attributes, {'rows': 10})
+
+        # The peak of a nested phase counts towards the peak of the phase enclosing it
+        self.assertGreaterEqual(report['inner'].peak_memory, 4 * 2 ** 20)
+        self.assertLess(report['sibling'].peak_memory, 2 ** 20)
+        self.assertGreaterEqual(report['outer'].peak_memory, report['inner'].peak_memory)
+        self.assertGreaterEqual(report['outer'].wall, report['inner'].wall + report['sibling'].wall)
+
+    def test_phase_recorded_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.profiler.phase('failing'):
+                raise ValueError
+        self.assertEqual(len(self.profiler.report), 1)
+
+    def test_trace(self):
+        tracer = RecordingTracer()
+        profiler = Profiler(trace_memory=False, tracer=tracer)
+        with profiler.phase('forward.geocode', inputs=5):
+            pass
+
+        self.assertEqual(tracer.spans[0].name, 'forward.geocode')
+        self.assertEqual(tracer.spans[0].attributes['inputs'], 5)
+        self.assertIn('cpu_seconds', tracer.spans[0].attributes)
+        self.assertIsNone(profiler.report['forward.geocode'].peak_memory)
+
+        # The trace file has one complete event per phase
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.json')
+            profiler.report.save_trace(path)
+            with open(path) as f:
+                events = json.load(f)['traceEvents']
+        self.assertEqual([(event['name'], event['ph']) for event in events], [('forward.geocode', 'X')])
+
+    def test_round_trip(self):
+        with self.profiler.phase('process'):
+            with self.profiler.phase('merge'):
+                pass
+
+        report = ProfileReport.from_dict(json.loads(json.dumps(self.profiler.report.to_dict())))
+        self.assertEqual(report.to_dict(), self.profiler.report.to_dict())
+        self.assertEqual(report.to_frame()[['name', 'depth']].values.tolist(), [['process', 0], ['merge', 1]])
+        self.assertIn('  merge', report.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+
+from usgeocoder import batch_geocode, bulk_geocode, census_api
+from usgeocoder.rate import RateController, configure_rate_controller, get_rate_controller
+
+from .mock_census import MockCensusServer
+
+
+class TestRateController(unittest.TestCase):
+
+    def test_additive_increase(self):
+        controller = RateController(rate=1000, concurrency=4, max_rate=2000)
+        for _ in range(40):
+            controller.release(controller.acquire(), 'success')
+        self.assertGreater(controller.stats()['concurrency'], 4)
+        self.assertGreater(controller.rate, 1000)
+
+    def test_multiplicative_decrease(self):
+        controller = RateController(rate=100, concurrency=40, target_latency=10)
+        for outcome in ['throttled', 'timeout', 'error']:
+            controller.release(controller.acquire(), outcome)
+
+        # A burst of failures within the target latency only cuts the limits once
+        self.assertEqual(controller.stats()['concurrency'], 20)
+        self.assertEqual(controller.rate, 50)
+        self.assertEqual(controller.stats()['throttled'], 1)
+
+    def test_concurrency_limit(self):
+        controller = RateController(rate=1000, concurrency=2, max_concurrency=2)
+        peak = []
+
+        def request():
+            start = controller.acquire()
+            peak.append(controller.in_flight)
+            time.sleep(0.01)
+            controller.release(start)
+
+        threads = [threading.Thread(target=request) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(peak), 2)
+
+    def test_try_acquire(self):
+        controller = RateController(rate=1000, concurrency=1, max_concurrency=1)
+        start, wait = controller.try_acquire()
+        self.assertIsNotNone(start)
+
+        # The concurrency limit is reached until the request is released
+        self.assertEqual(controller.try_acquire(), (None, None))
+        controller.release(start)
+        time.sleep(0.01)
+        self.assertIsNotNone(controller.try_acquire()[0])
+
+        # Without tokens left, the wait until the next one is returned
+        controller = RateController(rate=1, min_rate=1)
+        controller.try_acquire()
+        start, wait = controller.try_acquire()
+        self.assertIsNone(start)
+        self.assertGreater(wait, 0.5)
+
+
+class TestRateControlledBatch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer(error_rate=0.3)
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        cls.retry_backoff = census_api.retry_backoff
+        census_api.BASE_URL = cls.server.url
+        census_api.retry_backoff = 0.01
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        census_api.retry_backoff = cls.retry_backoff
+        cls.server.stop()
+        configure_rate_controller()
+
+    def test_backoff_on_server_errors(self):
+        configure_rate_controller(rate=200, concurrency=20, target_latency=0.2)
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(50)]
+        located, failed = batch_geocode(addresses, direction='forward', n_threads=20)
+        self.assertEqual(len(located) + len(failed), 50)
+
+        stats = get_rate_controller().stats()
+        self.assertGreater(stats['throttled'], 0)
+        self.assertLess(stats['concurrency'], 20)
+
+    def test_bulk_geocode_paced(self):
+        controller = configure_rate_controller()
+        self.server.error_rate = 0.0
+        try:
+            bulk_geocode([f'{i} Main St, Springfield, IL 62701' for i in range(20)], chunk_size=5, n_threads=2)
+        finally:
+            self.server.error_rate = 0.3
+
+        # Each upload to the addressbatch endpoint is paced and reported like any other request
+        stats = controller.stats()
+        self.assertEqual(stats['success'] + stats['slow'], 4)
+        self.assertEqual(stats['in_flight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
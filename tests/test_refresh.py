@@ -0,0 +1,161 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import date
+from unittest import mock
+
+import pandas as pd
+
+from usgeocoder import census_api, GeocodeCache, RefreshScheduler, ResultStore
+
+from .mock_census import MockCensusServer, locate
+
+TODAY = date.today().strftime('%Y-%m-%d')
+
+
+def address_results(addresses, dates):
+    """ Return located results of addresses at the wrong coordinates, dated `dates`. """
+    return pd.DataFrame({'Address': addresses, 'Date': dates, 'Longitude': 0.0, 'Latitude': 0.0,
+                         'Coordinates': [(0.0, 0.0)] * len(addresses)})
+
+
+class TestRefresh(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.counts.clear()
+        self.directory = tempfile.mkdtemp()
+        self.store = ResultStore(os.path.join(self.directory, 'geocoder.db'))
+        self.addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(5)]
+        self.store.upsert('addresses', address_results(self.addresses, ['2001-01-01', '2000-01-01', '2002-01-01',
+                                                                        TODAY, TODAY]))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_stale(self):
+        self.assertEqual(self.store.stale('addresses', '2010-01-01'), self.addresses[1::-1] + self.addresses[2:3])
+        self.assertEqual(self.store.stale('addresses', '2010-01-01', limit=1), self.addresses[1:2])
+        self.assertEqual(self.store.stale('addresses', '2010-01-01', values=self.addresses[2:]), self.addresses[2:3])
+
+        # Results of another benchmark are stale whatever their date
+        with mock.patch.object(census_api, 'BENCHMARK', 'Public_AR_Census2030'):
+            self.assertEqual(len(self.store.stale('addresses', '1990-01-01')), 5)
+
+        # Addresses do not depend on the vintage, coordinates do
+        self.store.upsert('coordinates', pd.DataFrame({'Coordinates': [(-104.98, 39.74)], 'Date': [TODAY],
+                                                       'State': ['Colorado'], 'County': ['Denver'],
+                                                       'Census Block': ['1010'], 'Census Tract': ['31.02']}))
+        with mock.patch.object(census_api, 'VINTAGE', 'Census2030_Current'):
+            self.assertEqual(self.store.stale('addresses', '1990-01-01'), [])
+            self.assertEqual(self.store.stale('coordinates', '1990-01-01'), [(-104.98, 39.74)])
+
+    def test_run_once(self):
+        refresher = RefreshScheduler(self.store, batch_size=2)
+
+        # The oldest results are refreshed first, and the old values are replaced
+        self.assertEqual(refresher.run_once(), 2)
+        located = self.store.lookup('addresses', self.addresses[:3])
+        refreshed = located.set_index('Address').loc[self.addresses[:2]]
+        self.assertEqual(refreshed['Coordinates'].tolist(), [locate(address) for address in self.addresses[:2]])
+        self.assertEqual(refreshed['Date'].tolist(), [TODAY, TODAY])
+
+        self.assertEqual(refresher.run_once(), 1)
+        self.assertEqual(refresher.run_once(), 0)
+        self.assertEqual(refresher.stats(), {'batches': 2, 'refreshed': 3, 'deferred': 0})
+
+    def test_recent_first(self):
+        refresher = RefreshScheduler(self.store, batch_size=1)
+        refresher.touch('addresses', self.addresses[2:])
+
+        # The recently requested stale address comes before older ones, and fresh ones are not requested
+        refresher.run_once()
+        located = self.store.lookup('addresses', self.addresses[2:3])
+        self.assertEqual(located['Coordinates'][0], locate(self.addresses[2]))
+        self.assertEqual(self.store.stale('addresses', '2010-01-01'), self.addresses[1::-1])
+
+    def test_transient_failure(self):
+        refresher = RefreshScheduler(self.store, batch_size=1, retry_delay=60)
+        self.server.error_rate = 1.0
+        try:
+            with mock.patch.object(census_api, 'retry_backoff', 0.0):
+                refresher.run_once()
+        finally:
+            self.server.error_rate = 0.0
+
+        # The old result is still served, and the address is skipped until its retry delay has passed
+        located = self.store.lookup('addresses', self.addresses[1:2])
+        self.assertEqual(located['Coordinates'][0], (0.0, 0.0))
+        self.assertEqual(refresher.stats()['deferred'], 1)
+        refresher.run_once()
+        self.assertEqual(self.store.stale('addresses', '2010-01-01'), self.addresses[1:2] + self.addresses[2:3])
+
+    def test_error_responses_deferred(self):
+        refresher = RefreshScheduler(self.store, batch_size=3, retry_delay=60)
+        failed_df = pd.DataFrame({'Address': self.addresses[:3], 'Date': TODAY,
+                                  'Status': ['http_error', 'decode_error', 'no_match'], 'Attempts': 1})
+        failed_df = failed_df.reindex(columns=census_api.FORWARD_COLUMNS + census_api.STATUS_COLUMNS)
+        with mock.patch('usgeocoder.refresh.batch_geocode', return_value=(failed_df.iloc[:0], failed_df)):
+            self.assertEqual(refresher.run_once(), 3)
+
+        # Error responses keep the old located results, only the definitive no match replaces its result
+        located = self.store.lookup('addresses', self.addresses[:3])
+        self.assertEqual(located['Address'].tolist(), self.addresses[:2])
+        self.assertEqual(located['Coordinates'].tolist(), [(0.0, 0.0)] * 2)
+        self.assertEqual(refresher.stats(), {'batches': 1, 'refreshed': 1, 'deferred': 2})
+
+    def test_background(self):
+        with RefreshScheduler(self.store, batch_size=1, interval=0.01) as refresher:
+            deadline = time.monotonic() + 10
+            while self.store.stale('addresses', '2010-01-01') and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(refresher.running)
+        self.assertFalse(refresher.running)
+        self.assertEqual(self.store.stale('addresses', '2010-01-01'), [])
+
+    def test_cache_touch(self):
+        refresher = RefreshScheduler(self.store, batch_size=1)
+        cache = GeocodeCache(store=self.store, refresher=refresher, normalize=False)
+        self.assertEqual(cache.geocode_address(self.addresses[2])['Coordinates'], (0.0, 0.0))
+
+        refresher.run_once()
+        self.assertEqual(self.store.lookup('addresses', self.addresses[2:3])['Coordinates'][0],
+                         locate(self.addresses[2]))
+
+    def test_store_without_release_columns(self):
+        # Stores created by earlier versions gain the columns, and their results are only stale by date
+        path = os.path.join(self.directory, 'old.db')
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE addresses (Key TEXT PRIMARY KEY, "Address" TEXT, "Date" TEXT, '
+                           '"Longitude" REAL, "Latitude" REAL, "Status" TEXT, "Attempts" INTEGER)')
+        connection.execute("INSERT INTO addresses VALUES ('1 main st', '1 Main St', ?, 1.0, 2.0, 'located', NULL)",
+                           [TODAY])
+        connection.commit()
+        connection.close()
+
+        store = ResultStore(path)
+        try:
+            with mock.patch.object(census_api, 'BENCHMARK', 'Public_AR_Census2030'):
+                self.assertEqual(store.stale('addresses', '2010-01-01'), [])
+            self.assertEqual(store.count('addresses'), 1)
+        finally:
+            store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+import pandas as pd
+
+from usgeocoder import compact_results, concat_results, expand_results
+
+
+class TestCompactResults(unittest.TestCase):
+
+    def setUp(self):
+        self.coordinates = pd.DataFrame({'Coordinates': [(-104.98, 39.74), (-105.0, 39.7)],
+                                         'Date': ['2024-01-01', '2024-02-01'], 'State': ['Colorado', 'Colorado'],
+                                         'County': ['Denver', 'Adams'], 'Census Block': ['1010', '2000'],
+                                         'Census Tract': ['31.02', '85.13']})
+
+    def test_round_trip(self):
+        compact = compact_results(self.coordinates)
+        self.assertEqual(list(compact.columns), ['Longitude', 'Latitude', 'Date', 'State', 'County', 'Census Block',
+                                                 'Census Tract'])
+        self.assertEqual(str(compact['Date'].dtype), 'datetime64[s]')
+        self.assertIsInstance(compact['State'].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(expand_results(compact), self.coordinates)
+
+    def test_failed_addresses(self):
+        failed = pd.DataFrame({'Address': ['1 Nowhere Rd'], 'Date': ['2024-01-01'], 'Longitude': [None],
+                               'Latitude': [None], 'Coordinates': [None], 'Status': ['no_match'], 'Attempts': [1]})
+        compact = compact_results(failed)
+        self.assertEqual(list(compact.columns), ['Address', 'Date', 'Longitude', 'Latitude', 'Status', 'Attempts'])
+        self.assertIsNone(expand_results(compact)['Coordinates'][0])
+
+    def test_concat_keeps_categories(self):
+        first = compact_results(self.coordinates)
+        second = compact_results(self.coordinates.assign(State=['Ohio', 'Iowa']))
+        df = concat_results([first, second])
+        self.assertIsInstance(df['State'].dtype, pd.CategoricalDtype)
+        self.assertEqual(df['State'].tolist(), ['Colorado', 'Colorado', 'Ohio', 'Iowa'])
+
+
+if __name__ == '__main__':
+    unittest.main()
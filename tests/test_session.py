@@ -0,0 +1,61 @@
+import unittest
+
+from usgeocoder import batch_geocode, census_api, configure_session, session_stats, close_session
+from usgeocoder.session import get_session, ensure_pool_size
+
+from .mock_census import MockCensusServer
+
+
+class TestSession(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+        close_session()
+
+    def setUp(self):
+        configure_session(pool_maxsize=4)
+
+    def test_connection_reuse(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(40)]
+        located, failed = batch_geocode(addresses, direction='forward', n_threads=4)
+        self.assertEqual(len(located), 40)
+
+        # Four threads need at most four connections, which are reused for the remaining requests
+        stats = session_stats()
+        self.assertEqual(stats['requests'], 40)
+        self.assertLessEqual(stats['connections'], 4)
+        self.assertEqual(stats['reused'], stats['requests'] - stats['connections'])
+
+    def test_ensure_pool_size(self):
+        session = get_session()
+        ensure_pool_size(2)
+        self.assertIs(get_session(), session)
+
+        # Growing the pool keeps the session, its statistics, and its connections
+        located, failed = batch_geocode([f'{i} Main St, Springfield, IL 62701' for i in range(8)],
+                                        direction='forward', n_threads=4)
+        stats = session_stats()
+        ensure_pool_size(16)
+        self.assertIs(get_session(), session)
+        self.assertEqual(session_stats(), stats)
+        adapter = session.get_adapter(census_api.BASE_URL)
+        self.assertEqual(adapter._pool_maxsize, 16)
+        pools = adapter.poolmanager.pools
+        self.assertTrue(all(pools[key].pool.maxsize == 16 for key in pools.keys()))
+
+        # Requests reuse the idle connections before opening new ones
+        batch_geocode([f'{i} Oak St, Springfield, IL 62701' for i in range(8)], direction='forward', n_threads=1)
+        self.assertEqual(session_stats()['connections'], stats['connections'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from usgeocoder import census_api, sharded_geocode, ResultStore
+from usgeocoder.metrics import disable_metrics, enable_metrics
+from usgeocoder.rate import RateController, configure_rate_controller
+from usgeocoder.sharded import partition, shard_rate_settings
+
+from .mock_census import MockCensusServer, locate
+
+
+class TestSharded(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCensusServer()
+        cls.server.start()
+        cls.base_url = census_api.BASE_URL
+        census_api.BASE_URL = cls.server.url
+
+    @classmethod
+    def tearDownClass(cls):
+        census_api.BASE_URL = cls.base_url
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.counts.clear()
+        self.directory = tempfile.mkdtemp()
+        self.store = ResultStore(os.path.join(self.directory, 'geocoder.db'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_partition(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(100)]
+        shards = partition(addresses + addresses[:10], 'forward', 4, self.store)
+
+        # Every unique address is in exactly one shard, and the same shard in every run
+        self.assertEqual(sorted(sum(shards, [])), sorted(addresses))
+        shards_reversed = partition(reversed(addresses), 'forward', 4, self.store)
+        self.assertEqual([set(shard) for shard in shards], [set(shard) for shard in shards_reversed])
+
+    def test_sharded_geocode(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(40)]
+        addresses.append('1 Nowhere Rd, Springfield, IL 62701')
+        n_geocoded = sharded_geocode(addresses, self.store, direction='forward', n_workers=2)
+
+        # Results of every worker are merged into the store
+        self.assertEqual(n_geocoded, 41)
+        self.assertEqual(self.server.count('locations/onelineaddress'), 41)
+        self.assertEqual(self.store.count('addresses', located=True), 40)
+        self.assertEqual(self.store.count('addresses', located=False), 1)
+        located = self.store.lookup('addresses', addresses[:1])
+        self.assertEqual(located['Coordinates'][0], locate(addresses[0]))
+
+    def test_shard_rate_settings(self):
+        controller = RateController(rate=100, concurrency=10, max_rate=200, max_concurrency=20)
+        settings = shard_rate_settings(controller, 4)
+
+        # Together the shards keep to the limits of the controller
+        self.assertEqual((settings['rate'], settings['max_rate'], settings['min_rate']), (25, 50, 0.25))
+        self.assertEqual((settings['concurrency'], settings['max_concurrency'], settings['min_concurrency']), (2, 5, 1))
+        self.assertEqual(RateController(**settings).stats()['rate'], 25)
+
+    def test_sharded_limits_and_metrics(self):
+        addresses = [f'{i} Main St, Springfield, IL 62701' for i in range(20)]
+        configure_rate_controller(rate=500, concurrency=2, max_rate=500, max_concurrency=2, min_rate=500)
+        metrics = enable_metrics()
+        self.server.latency = 0.02
+        try:
+            sharded_geocode(addresses, self.store, direction='forward', n_workers=2, n_threads=4)
+        finally:
+            self.server.latency = 0.0
+            disable_metrics()
+            configure_rate_controller()
+
+        # Each worker keeps its share of the concurrency limit, and reports its metrics to this process
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['requests'], 20)
+        self.assertEqual(snapshot['results'], {('forward', 'located'): 20})
+        self.assertEqual(snapshot['max_in_flight'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from usgeocoder import Geocoder, ResultStore, census_api
+from usgeocoder.index import key_hashes
+
+ROOT = Path(os.getcwd())
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = ResultStore(Path(self.directory) / 'geocoder.db')
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_upsert_and_lookup(self):
+        located = pd.DataFrame({'Address': ['1 Main St'], 'Date': ['2024-01-01'], 'Longitude': [-104.98],
+                                'Latitude': [39.74], 'Coordinates': [(-104.98, 39.74)]})
+        failed = pd.DataFrame({'Address': ['1 Nowhere Rd'], 'Date': ['2024-01-01'], 'Longitude': [None],
+                               'Latitude': [None], 'Coordinates': [None], 'Status': ['timeout'], 'Attempts': [4]})
+        self.store.upsert('addresses', located)
+        self.store.upsert('addresses', failed)
+
+        self.assertEqual(self.store.seen('addresses', ['1 Main St', '1 Nowhere Rd', '2 Main St']),
+                         {'1 Main St', '1 Nowhere Rd'})
+        row = self.store.lookup('addresses', ['1 Main St']).iloc[0]
+        self.assertEqual(row['Coordinates'], (-104.98, 39.74))
+        self.assertEqual(self.store.load('addresses', located=False)['Status'].tolist(), ['timeout'])
+
+        # A later result for the same key replaces the earlier one
+        located['Address'] = '1 Nowhere Rd'
+        self.store.upsert('addresses', located)
+        self.assertEqual(self.store.count('addresses', located=True), 2)
+        self.assertEqual(self.store.count('addresses', located=False), 0)
+
+    def test_upsert_without_status(self):
+        # Failed results without a Status column are stored as failed, not as located results without a location
+        df = pd.DataFrame({'Address': ['1 Main St', '1 Nowhere Rd'], 'Date': ['2024-01-01'] * 2,
+                           'Longitude': [-104.98, None], 'Latitude': [39.74, None],
+                           'Coordinates': [(-104.98, 39.74), None]})
+        self.store.upsert('addresses', df)
+        self.assertEqual(self.store.count('addresses', located=True), 1)
+        self.assertEqual(self.store.load('addresses', located=False)['Status'].tolist(), ['no_match'])
+
+        self.store.save_results('reverse', pd.DataFrame(columns=census_api.REVERSE_COLUMNS),
+                                pd.DataFrame({'Coordinates': [(-104.98, 39.74)], 'Date': ['2024-01-01'],
+                                              'State': [None], 'County': [None], 'Census Block': [None],
+                                              'Census Tract': [None]}))
+        self.assertEqual(self.store.count('coordinates', located=True), 0)
+        self.assertEqual(self.store.count('coordinates', located=False), 1)
+
+    def test_normalize_address_keys(self):
+        df = pd.DataFrame({'Address': ['1 Main Street, Springfield, IL', '1 MAIN ST, SPRINGFIELD, IL',
+                                       '2 North Ave, Springfield, IL'],
+                           'Date': ['2024-01-02', '2024-01-01', '2024-01-01'], 'Longitude': [None, -89.6, -89.7],
+                           'Latitude': [None, 39.8, 39.9], 'Coordinates': [None, (-89.6, 39.8), (-89.7, 39.9)],
+                           'Status': ['no_match', 'located', 'located']})
+        self.store.upsert('addresses', df)
+        self.assertEqual(self.store.normalize_address_keys(), 2)
+
+        # Results are found by their canonical address, and the located result is kept over a newer failure
+        located = self.store.lookup('addresses', ['1 MAIN ST, SPRINGFIELD, IL', '2 NORTH AVE, SPRINGFIELD, IL'])
+        self.assertEqual(located['Coordinates'].tolist(), [(-89.6, 39.8), (-89.7, 39.9)])
+        self.assertEqual(self.store.count('addresses'), 2)
+        self.assertEqual(self.store.missing('addresses', ['2 North Ave, Springfield, IL']),
+                         ['2 North Ave, Springfield, IL'])
+
+        # The store is only re-keyed once per normalization version
+        self.store.upsert('addresses', df[:1])
+        self.assertEqual(self.store.normalize_address_keys(), 0)
+        self.assertEqual(self.store.count('addresses'), 3)
+
+    def test_coordinates_round_trip(self):
+        df = pd.DataFrame({'Coordinates': [(-104.98, 39.74)], 'Date': ['2024-01-01'], 'State': ['Colorado'],
+                           'County': ['Denver'], 'Census Block': ['1010'], 'Census Tract': ['31.02']})
+        self.store.upsert('coordinates', df)
+        self.assertEqual(self.store.seen('coordinates', [(-104.98, 39.74)]), {(-104.98, 39.74)})
+        pd.testing.assert_frame_equal(self.store.load('coordinates'), df)
+
+    def test_load_columns(self):
+        df = pd.DataFrame({'Coordinates': [(-104.98, 39.74)], 'Date': ['2024-01-01'], 'State': ['Colorado'],
+                           'County': ['Denver'], 'Census Block': ['1010'], 'Census Tract': ['31.02']})
+        self.store.upsert('coordinates', df)
+
+        # Only the requested columns are returned, in the requested order
+        pd.testing.assert_frame_equal(self.store.load('coordinates', columns=['State', 'Coordinates']),
+                                      df[['State', 'Coordinates']])
+        pd.testing.assert_frame_equal(self.store.lookup('coordinates', [(-104.98, 39.74)], columns=['Date']),
+                                      df[['Date']])
+
+    def test_coordinate_grid(self):
+        df = pd.DataFrame({'Coordinates': [(-104.98, 39.74)], 'Date': ['2024-01-01'], 'State': ['Colorado'],
+                           'County': ['Denver'], 'Census Block': ['1010'], 'Census Tract': ['31.02']})
+        self.store.upsert('coordinates', df)
+
+        # Points in the same grid cell share a result, and strings read back from CSV find it too
+        nearby = (-104.98 + 1e-8, 39.74 - 1e-8)
+        self.assertEqual(self.store.seen('coordinates', [nearby, '(-104.98, 39.74)', (-104.97, 39.74)]),
+                         {nearby, '(-104.98, 39.74)'})
+        self.assertEqual(self.store.missing('coordinates', [(-104.97, 39.74), nearby, (-104.97 + 1e-8, 39.74)]),
+                         [(-104.97, 39.74)])
+
+        # Reopening the store with a coarser grid rebuilds its keys
+        self.store.close()
+        store = ResultStore(Path(self.directory) / 'geocoder.db', grid=0.1)
+        self.assertEqual(store.seen('coordinates', [(-104.99, 39.71)]), {(-104.99, 39.71)})
+        store.close()
+
+    def test_key_index(self):
+        df = pd.DataFrame({'Address': [f'{i} Main St' for i in range(10)], 'Date': '2024-01-01', 'Longitude': 1.0,
+                           'Latitude': 2.0, 'Coordinates': [(1.0, 2.0)] * 10})
+        self.store.upsert('addresses', df)
+        self.assertEqual(self.store.missing('addresses', ['1 Main St', '10 Main St']), ['10 Main St'])
+
+        # Writes through this store keep the index up to date, and deleted keys are removed from it
+        self.store.upsert('addresses', df.assign(Address='10 Main St').head(1))
+        self.store.delete('addresses', ['1 Main St'])
+        self.assertEqual(self.store.missing('addresses', ['1 Main St', '10 Main St']), ['1 Main St'])
+
+        # Writes from another store are found in the database, and deletes make this store rebuild its index
+        other = ResultStore(Path(self.directory) / 'geocoder.db')
+        other.upsert('addresses', df.assign(Address='11 Main St').head(1))
+        other.delete('addresses', ['2 Main St'])
+        other.close()
+        self.assertEqual(self.store.missing('addresses', ['2 Main St', '11 Main St']), ['2 Main St'])
+
+        # A saved index is reloaded by a new store, and ignored once the table has changed
+        self.store.save_index()
+        store = ResultStore(Path(self.directory) / 'geocoder.db')
+        self.assertEqual(len(store._index('addresses')), 10)
+        self.store.delete('addresses', ['3 Main St'])
+        store = ResultStore(Path(self.directory) / 'geocoder.db')
+        self.assertEqual(store.missing('addresses', ['3 Main St', '4 Main St']), ['3 Main St'])
+        store.close()
+
+        # A row removed behind the index, without a version change, is confirmed missing in the database
+        connection = self.store._connection()
+        with connection:
+            connection.execute("DELETE FROM addresses WHERE Key = '4 Main St'")
+        self.assertTrue(self.store._index('addresses').contains(key_hashes(['4 Main St']))[0])
+        self.assertEqual(self.store.missing('addresses', ['4 Main St', '5 Main St']), ['4 Main St'])
+        self.assertEqual(self.store.seen('addresses', ['4 Main St', '5 Main St']), {'5 Main St'})
+
+    def test_concurrent_writers(self):
+        def write(worker):
+            store = ResultStore(Path(self.directory) / 'geocoder.db')
+            for i in range(20):
+                df = pd.DataFrame({'Address': [f'{worker}-{i}'], 'Date': ['2024-01-01'], 'Longitude': [1.0],
+                                   'Latitude': [2.0], 'Coordinates': [(1.0, 2.0)]})
+                store.upsert('addresses', df)
+            store.close()
+
+        threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.store.count('addresses'), 80)
+
+
+class TestGeocoderStore(unittest.TestCase):
+
+    def tearDown(self):
+        if os.path.exists(ROOT / 'geocoder'):
+            shutil.rmtree(ROOT / 'geocoder')
+
+    def test_import_csv(self):
+        # Results saved by earlier versions, with coordinates written to CSV as strings
+        (ROOT / 'geocoder').mkdir()
+        pd.DataFrame({'Address': ['1 Main Street'], 'Date': ['2024-01-01'], 'Longitude': [-104.98],
+                      'Latitude': [39.74], 'Coordinates': ['(-104.98, 39.74)']}
+                     ).to_csv(ROOT / 'geocoder' / 'located_addresses.csv', index=False)
+        pd.DataFrame({'Coordinates': ['(-104.98, 39.74)'], 'Date': ['2024-01-01'], 'State': ['Colorado'],
+                      'County': ['Denver'], 'Census Block': ['1010'], 'Census Tract': ['31.02']}
+                     ).to_csv(ROOT / 'geocoder' / 'located_coordinates.csv', index=False)
+
+        geo = Geocoder()
+        self.assertEqual(geo.located_addresses['Coordinates'].tolist(), [(-104.98, 39.74)])
+        self.assertEqual(geo.store.seen('addresses', ['1 MAIN ST']), {'1 MAIN ST'})
+        self.assertEqual(geo.store.seen('coordinates', [(-104.98, 39.74)]), {(-104.98, 39.74)})
+
+        # Importing again does not duplicate results
+        geo = Geocoder()
+        self.assertEqual(geo.store.count('addresses'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,59 @@
-from .geocoder import Geocoder
-from .census_api import geocode_address, geocode_coordinates, batch_geocode
-from .utils import concatenate_address, concatenate_coordinates, create_address_list, create_coordinates_list
+import importlib
+
+# Public names and the module they are defined in. Modules are only imported when one of their names is first used,
+# so `from usgeocoder import geocode_address` does not import pandas or numpy.
+_EXPORTS = {
+    'Geocoder': 'geocoder',
+    'geocode_address': 'census_api',
+    'geocode_coordinates': 'census_api',
+    'batch_geocode': 'census_api',
+    'bulk_geocode': 'census_api',
+    'iter_geocode': 'census_api',
+    'geocode_address_async': 'census_async',
+    'geocode_coordinates_async': 'census_async',
+    'batch_geocode_async': 'census_async',
+    'concatenate_address': 'utils',
+    'concatenate_coordinates': 'utils',
+    'create_address_list': 'utils',
+    'create_coordinates_list': 'utils',
+    'split_address': 'utils',
+    'parse_coordinates': 'utils',
+    'configure_session': 'session',
+    'session_stats': 'session',
+    'close_session': 'session',
+    'RateController': 'rate',
+    'configure_rate_controller': 'rate',
+    'get_rate_controller': 'rate',
+    'RequestMetrics': 'metrics',
+    'enable_metrics': 'metrics',
+    'disable_metrics': 'metrics',
+    'get_metrics': 'metrics',
+    'Profiler': 'profiling',
+    'ProfileReport': 'profiling',
+    'ResultStore': 'store',
+    'compact_results': 'schema',
+    'expand_results': 'schema',
+    'concat_results': 'schema',
+    'normalize_address': 'normalize',
+    'normalize_addresses': 'normalize',
+    'geocode_file': 'pipeline',
+    'sharded_geocode': 'sharded',
+    'pipelined_geocode': 'pipelined',
+    'LocalReverseGeocoder': 'offline',
+    'GeocodeCache': 'cache',
+    'RefreshScheduler': 'refresh',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
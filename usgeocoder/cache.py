@@ -0,0 +1,284 @@
+import threading
+import pandas as pd
+from collections import OrderedDict
+from time import monotonic
+
+from . import census_api
+from .census_api import BENCHMARK, VINTAGE
+from .normalize import normalize_address
+from .store import COORDINATE_GRID, address_key, coordinates_key
+
+# Default limits of `GeocodeCache`
+CACHE_SIZE = 100000
+HIT_TTL = 30 * 24 * 3600.0
+MISS_TTL = 24 * 3600.0
+
+# Marks a cached lookup that did not locate a result
+_MISS = object()
+
+
+class GeocodeCache:
+    """
+    A thread-safe, in-memory cache in front of `geocode_address` and `geocode_coordinates` for single lookups.
+
+    Results are kept in least recently used (LRU) order, and the least recently used result is evicted once the
+    cache holds `maxsize` results. Located results expire after `ttl` seconds. Addresses and coordinates that the
+    Census Geocoder did not match are cached as misses for `miss_ttl` seconds, so repeated lookups of an unknown
+    address do not reach the service either. Timeouts, connection errors, and throttling are never cached.
+
+    Addresses are keyed by their canonical form from `normalize_address`, and coordinates by their grid cell, the
+    same keys as the `Geocoder` result store. Concurrent lookups of the same uncached key share a single request.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of cached results, including misses. Default is `CACHE_SIZE`.
+    ttl : float, optional
+        Seconds a located result is kept. Default is `HIT_TTL`, 30 days.
+    miss_ttl : float, optional
+        Seconds a result that was not matched is kept. Default is `MISS_TTL`, 1 day.
+    store : ResultStore, optional
+        Result store to read through to on a cache miss, such as `Geocoder.store`. Results found in the store are
+        cached without a request, and new located and unmatched results are saved to it. Default is None.
+    normalize : bool, optional
+        Key addresses by their canonical form. Should match the `normalize` option of the `Geocoder` that owns
+        `store`. Default is True.
+    grid : float, optional
+        Spacing in degrees of the grid coordinates are snapped to for their keys. Default is the grid of `store`,
+        or `COORDINATE_GRID`.
+    refresher : RefreshScheduler, optional
+        Scheduler refreshing stale results of `store` in the background. Results read from the store are reported
+        to it, so the stale ones among them are refreshed first. Default is None.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=HIT_TTL, miss_ttl=MISS_TTL, store=None, normalize=True, grid=None,
+                 refresher=None):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.store = store
+        self.normalize = normalize
+        if grid is None:
+            grid = COORDINATE_GRID if store is None else store.grid
+        self.grid = grid
+        self.refresher = refresher
+
+        # Cached results by key as (expiry time, response), in least recently used order
+        self._results = OrderedDict()
+        # Keys being requested, with an event set once their result is cached
+        self._pending = {}
+        self._counts = {'hits': 0, 'misses': 0, 'store_hits': 0, 'requests': 0, 'evictions': 0, 'expirations': 0}
+        self._lock = threading.Lock()
+
+    def geocode_address(self, address, benchmark=BENCHMARK):
+        """
+        Return the cached forward geocoding result of an address, requesting it with `geocode_address` if needed.
+
+        Parameters
+        ----------
+        address : str
+            The address string to geocode.
+        benchmark : str, optional
+            The benchmark string for the geocoding request. Default value is specified by `BENCHMARK`.
+
+        Returns
+        -------
+        dict or None
+            A result with the same keys as `geocode_address`, with 'Address' set to the requested address,
+            or None if the address could not be geocoded.
+        """
+
+        key = ('address', benchmark, normalize_address(address) if self.normalize else address_key(address))
+
+        def fetch():
+            return self._fetch_address(key[2], address, benchmark)
+
+        response = self._get(key, fetch)
+        if response is not None:
+            response = dict(response, Address=address)
+        return response
+
+    def geocode_coordinates(self, longitude_latitude, benchmark=BENCHMARK, vintage=VINTAGE):
+        """
+        Return the cached reverse geocoding result of coordinates, requesting it with `geocode_coordinates` if needed.
+
+        Parameters
+        ----------
+        longitude_latitude : tuple of (float, float)
+            A tuple of (longitude, latitude) to geocode.
+        benchmark : str, optional
+            The benchmark string for the geocoding request. Default value is specified by `BENCHMARK`.
+        vintage : str, optional
+            The vintage string for the geocoding request. Default value is specified by `VINTAGE`.
+
+        Returns
+        -------
+        dict or None
+            A result with the same keys as `geocode_coordinates`, with 'Coordinates' set to the requested
+            coordinates, or None if the coordinates could not be geocoded.
+        """
+
+        key = ('coordinates', benchmark, vintage, coordinates_key(longitude_latitude, self.grid))
+
+        def fetch():
+            return self._fetch_coordinates(longitude_latitude, benchmark, vintage)
+
+        response = self._get(key, fetch)
+        if response is not None:
+            response = dict(response, Coordinates=tuple(longitude_latitude))
+        return response
+
+    def _get(self, key, fetch):
+        """ Return the cached response of a key, calling `fetch` once for concurrent lookups of an uncached key. """
+        while True:
+            with self._lock:
+                entry = self._results.get(key)
+                if entry is not None:
+                    if entry[0] > monotonic():
+                        self._results.move_to_end(key)
+                        self._counts['hits'] += 1
+                        return None if entry[1] is _MISS else entry[1]
+                    del self._results[key]
+                    self._counts['expirations'] += 1
+
+                # Wait for another thread requesting the same key, then look again
+                event = self._pending.get(key)
+                if event is None:
+                    self._counts['misses'] += 1
+                    event = self._pending[key] = threading.Event()
+                    break
+            event.wait()
+
+        try:
+            response, cache = fetch()
+            if cache:
+                self._put(key, response)
+            return None if response is _MISS else response
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+
+    def _put(self, key, response):
+        """ Cache a response, evicting the least recently used results beyond `maxsize`. """
+        ttl = self.miss_ttl if response is _MISS else self.ttl
+        with self._lock:
+            self._results[key] = (monotonic() + ttl, response)
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+                self._counts['evictions'] += 1
+
+    def _fetch_address(self, store_key, address, benchmark):
+        """ Look up an address in the result store, or request it. Returns (response or _MISS, cacheable). """
+        # The store only holds results for the default benchmark
+        use_store = self.store is not None and benchmark == BENCHMARK
+        if use_store:
+            stored = self._lookup('addresses', store_key)
+            if stored is not None:
+                return stored, True
+
+        def attempt(timeout):
+            return census_api._attempt_address(address, benchmark=benchmark, timeout=timeout)
+
+        status, response, error = self._request(attempt, f'address {address}', 'forward')
+        if use_store and status in ('located', 'no_match'):
+            self._save('addresses', dict(response, Address=store_key, Status=status))
+        return self._result(status, response)
+
+    def _fetch_coordinates(self, longitude_latitude, benchmark, vintage):
+        """ Look up coordinates in the result store, or request them. Returns (response or _MISS, cacheable). """
+        use_store = self.store is not None and (benchmark, vintage) == (BENCHMARK, VINTAGE)
+        if use_store:
+            stored = self._lookup('coordinates', longitude_latitude)
+            if stored is not None:
+                return stored, True
+
+        def attempt(timeout):
+            return census_api._attempt_coordinates(longitude_latitude, benchmark=benchmark, vintage=vintage,
+                                                   timeout=timeout)
+
+        label = f'coordinates ({longitude_latitude[0]}, {longitude_latitude[1]})'
+        status, response, error = self._request(attempt, label, 'reverse')
+        if use_store and status in ('located', 'no_match'):
+            self._save('coordinates', dict(response, Status=status))
+        return self._result(status, response)
+
+    def _request(self, attempt, label, direction):
+        """ Send a request with the escalating timeouts of `census_api`, logging why it failed. """
+        with self._lock:
+            self._counts['requests'] += 1
+        status, response, error = census_api._request_status(attempt, direction)
+        if status != 'located':
+            census_api._log_failure(label, status, error)
+        return status, response, error
+
+    @staticmethod
+    def _result(status, response):
+        """ Return the response to cache for a request status, and whether it may be cached at all. """
+        if status == 'located':
+            return response, True
+        return _MISS, status == 'no_match'
+
+    def _lookup(self, table, value):
+        """ Return the stored result of an address or coordinates as a response, _MISS, or None if not stored. """
+        located = self.store.lookup(table, [value])
+        if not located.empty:
+            self._count_store_hit(table, value)
+            return located.iloc[0].to_dict()
+
+        failed = self.store.lookup(table, [value], located=False)
+        if not failed.empty and failed['Status'].iloc[0] == 'no_match':
+            self._count_store_hit(table, value)
+            return _MISS
+        return None
+
+    def _count_store_hit(self, table, value):
+        """ Count a miss answered from the result store, and report the value to the refresher. """
+        with self._lock:
+            self._counts['store_hits'] += 1
+        if self.refresher is not None:
+            self.refresher.touch(table, [value])
+
+    def _save(self, table, response):
+        """ Save a new result to the result store. """
+        self.store.upsert(table, pd.DataFrame([response]))
+
+    def stats(self):
+        """
+        Report how the cache has been used.
+
+        Returns
+        -------
+        dict
+            A dictionary with the following keys:
+            - size : int
+                Number of cached results, including misses.
+            - hits : int
+                Number of lookups answered from memory.
+            - misses : int
+                Number of lookups not answered from memory.
+            - store_hits : int
+                Number of misses answered from the result store without a request.
+            - requests : int
+                Number of misses sent to the Census Geocoder.
+            - evictions : int
+                Number of results evicted to stay within `maxsize`.
+            - expirations : int
+                Number of results dropped after their TTL.
+        """
+
+        with self._lock:
+            return {'size': len(self._results), **self._counts}
+
+    def clear(self):
+        """ Remove every cached result. The counters in `stats` are kept. """
+        with self._lock:
+            self._results.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
@@ -1,14 +1,349 @@
-import pandas as pd
+import csv
+import heapq
+import io
+import logging
+import random
+# pandas is imported by the batch functions that build DataFrames, so single requests can be made without it
 import requests
 from datetime import date
-from time import sleep
-from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, perf_counter, sleep
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
+from .metrics import endpoint_name, get_metrics
+from .rate import get_rate_controller
+from .session import ensure_pool_size, get_session, request_timeout
+from .utils import split_address
+
+BASE_URL = 'https://geocoding.geo.census.gov/geocoder'
 BENCHMARK = 'Public_AR_Current'
 VINTAGE = 'Current_Current'
 
-sleep_delay = 0.1
+# The Census batch endpoints accept at most 10,000 records per upload
+BATCH_SIZE = 10000
+
+# Requests are paced by the shared rate controller, so no fixed delay is added after each request by default
+sleep_delay = 0
 timeouts = [0.5, 1, 2, 5]
+batch_timeouts = [300, 600]
+
+# Base delay in seconds before a deferred retry in batch mode, doubled for each further attempt
+retry_backoff = 1.0
+
+FORWARD_COLUMNS = ['Address', 'Date', 'Longitude', 'Latitude', 'Coordinates']
+REVERSE_COLUMNS = ['Coordinates', 'Date', 'State', 'County', 'Census Block', 'Census Tract']
+COMBINED_COLUMNS = FORWARD_COLUMNS + REVERSE_COLUMNS[2:]
+STATUS_COLUMNS = ['Status', 'Attempts']
+
+# Failure classes that are worth retrying later: the request may succeed once the service recovers
+RETRY_STATUSES = ('timeout', 'connection_error', 'throttled')
+
+# Marks the end of the input of `iter_geocode`
+_EXHAUSTED = object()
+
+logger = logging.getLogger(__name__)
+
+
+def _get(url, params, timeout):
+    """ Send a GET request through the shared session, paced by the shared rate controller. See `_send`. """
+    return _send('get', url, timeout, params=params)
+
+
+def _send(method, url, timeout, **kwargs):
+    """
+    Send a request through the shared session, paced by the shared rate controller.
+
+    The outcome of each request is reported back to the rate controller so it can raise its limits while the
+    Census service is healthy and back off on timeouts, connection errors, throttling, and server errors.
+    If metrics are enabled, the request is also recorded in the shared `RequestMetrics`.
+    """
+
+    controller = get_rate_controller()
+    start = controller.acquire()
+    outcome = 'error'
+    request = _MetricsRecord(url)
+    try:
+        response = get_session().request(method, url, timeout=request_timeout(timeout), **kwargs)
+        request.response(response)
+        if response.status_code == 429 or response.status_code >= 500:
+            outcome = 'throttled'
+        else:
+            outcome = 'success'
+        return response
+    except requests.exceptions.Timeout:
+        outcome = 'timeout'
+        request.error = 'timeout'
+        raise
+    finally:
+        controller.release(start, outcome)
+        request.finish()
+
+
+class _MetricsRecord:
+    """ Time one request for the shared `RequestMetrics`. Does nothing when metrics are disabled. """
+
+    __slots__ = ('metrics', 'url', 'start', 'status_code', 'error', 'n_bytes')
+
+    def __init__(self, url):
+        self.metrics = get_metrics()
+        if self.metrics is None:
+            return
+        self.url = url
+        self.status_code = None
+        self.error = None
+        self.n_bytes = 0
+        self.metrics.request_started()
+        self.start = perf_counter()
+
+    def response(self, response):
+        self.received(response.status_code, len(response.content))
+
+    def received(self, status_code, n_bytes):
+        if self.metrics is not None:
+            self.status_code = status_code
+            self.n_bytes = n_bytes
+
+    def finish(self):
+        if self.metrics is not None:
+            self.metrics.request_finished(endpoint_name(self.url), perf_counter() - self.start, self.status_code,
+                                          self.error, self.n_bytes)
+
+
+def _attempt(url, params, timeout):
+    """
+    Send a single request to the Census Geocoder and classify the outcome.
+
+    Returns
+    -------
+    tuple of (str, dict or None, str or None)
+        The status, the decoded response if the status is 'ok', and an error message for request failures.
+        The status is one of 'ok', 'timeout', 'connection_error', 'throttled' (HTTP 429 or 5xx),
+        'http_error' (any other HTTP error), or 'decode_error'.
+    """
+
+    try:
+        response = _get(url, params=params, timeout=timeout)
+    except requests.exceptions.Timeout:
+        return 'timeout', None, None
+    except requests.exceptions.RequestException as e:
+        return 'connection_error', None, str(e)
+
+    return _response_status(response.status_code, response.json)
+
+
+def _response_status(status_code, decode):
+    """
+    Classify a response of the Census Geocoder by its HTTP status code and decoded body.
+
+    Parameters
+    ----------
+    status_code : int
+        HTTP status code of the response.
+    decode : callable
+        Returns the decoded JSON body, or raises ValueError if it is not valid JSON.
+
+    Returns
+    -------
+    tuple of (str, dict or None, str or None)
+        The status, decoded response, and error message, as returned by `_attempt`.
+    """
+
+    if status_code == 429 or status_code >= 500:
+        return 'throttled', None, f'HTTP {status_code}'
+    elif status_code >= 400:
+        return 'http_error', None, f'HTTP {status_code}'
+
+    try:
+        data = decode()
+    except ValueError:
+        return 'decode_error', None, None
+
+    if not isinstance(data, dict) or 'result' not in data:
+        return 'decode_error', None, None
+
+    return 'ok', data, None
+
+
+def _address_response(address, today, match=None, geographies=False):
+    """
+    Construct a forward geocode response from the first address match, or a failed response if there is no match.
+    With `geographies`, the response also contains the census geographies of the match.
+    """
+
+    response = {column: None for column in (COMBINED_COLUMNS if geographies else FORWARD_COLUMNS)}
+    response['Address'] = address
+    response['Date'] = today
+    if match is None:
+        return response
+
+    longitude = match['coordinates']['x']
+    latitude = match['coordinates']['y']
+    response['Longitude'] = longitude
+    response['Latitude'] = latitude
+    response['Coordinates'] = (longitude, latitude)
+
+    # Geographies can be missing for a matched address, in which case only the coordinates are returned
+    if geographies:
+        try:
+            response.update(_geographies(match['geographies']))
+        except (KeyError, IndexError, TypeError):
+            pass
+
+    return response
+
+
+def _coordinates_response(longitude, latitude, today, geographies=None):
+    """ Construct a reverse geocode response from the response geographies, or a failed response if there are none. """
+    response = {column: None for column in REVERSE_COLUMNS}
+    response['Coordinates'] = (longitude, latitude)
+    response['Date'] = today
+    if geographies:
+        response.update(_geographies(geographies))
+
+    return response
+
+
+def _geographies(geographies):
+    """ Extract the State, County, Census Block, and Census Tract names from the response geographies. """
+    return {
+        'State': geographies['States'][0]['BASENAME'],
+        'County': geographies['Counties'][0]['BASENAME'],
+        'Census Block': geographies['2020 Census Blocks'][0]['BASENAME'],
+        'Census Tract': geographies['Census Tracts'][0]['BASENAME']
+    }
+
+
+def _parse_address(address, data, today, geographies=False):
+    """ Return the status and response for a decoded onelineaddress response. """
+    matches = data['result'].get('addressMatches')
+    if not matches:
+        return 'no_match', _address_response(address, today, geographies=geographies)
+
+    try:
+        response = _address_response(address, today, matches[0], geographies=geographies)
+    except (KeyError, IndexError, TypeError):
+        return 'decode_error', _address_response(address, today, geographies=geographies)
+
+    return 'located', response
+
+
+def _parse_coordinates(longitude, latitude, data, today):
+    """ Return the status and response for a decoded geographies/coordinates response. """
+    geographies = data['result'].get('geographies')
+    try:
+        response = _coordinates_response(longitude, latitude, today, geographies)
+    except (KeyError, IndexError, TypeError):
+        return 'decode_error', _coordinates_response(longitude, latitude, today)
+
+    if not geographies:
+        return 'no_match', response
+
+    return 'located', response
+
+
+def _attempt_address(address, benchmark=BENCHMARK, timeout=timeouts[0]):
+    """ Make a single forward geocoding attempt and return (status, response, error). """
+    geocode_params = {
+        'benchmark': benchmark,
+        'format': 'json',
+        'address': address
+    }
+
+    today = date.today().strftime('%Y-%m-%d')
+    status, data, error = _attempt(f'{BASE_URL}/locations/onelineaddress', geocode_params, timeout)
+    if status != 'ok':
+        return status, _address_response(address, today), error
+
+    status, response = _parse_address(address, data, today)
+    return status, response, None
+
+
+def _attempt_coordinates(longitude_latitude, benchmark=BENCHMARK, vintage=VINTAGE, timeout=timeouts[0]):
+    """ Make a single reverse geocoding attempt and return (status, response, error). """
+    longitude = longitude_latitude[0]
+    latitude = longitude_latitude[1]
+    geocode_params = {
+        'benchmark': benchmark,
+        'vintage': vintage,
+        'format': 'json',
+        'x': longitude,
+        'y': latitude
+    }
+
+    today = date.today().strftime('%Y-%m-%d')
+    status, data, error = _attempt(f'{BASE_URL}/geographies/coordinates', geocode_params, timeout)
+    if status != 'ok':
+        return status, _coordinates_response(longitude, latitude, today), error
+
+    status, response = _parse_coordinates(longitude, latitude, data, today)
+    return status, response, None
+
+
+def _attempt_address_geographies(address, benchmark=BENCHMARK, vintage=VINTAGE, timeout=timeouts[0]):
+    """ Make a single combined geocoding attempt and return (status, response, error). """
+    geocode_params = {
+        'benchmark': benchmark,
+        'vintage': vintage,
+        'format': 'json',
+        'address': address
+    }
+
+    today = date.today().strftime('%Y-%m-%d')
+    status, data, error = _attempt(f'{BASE_URL}/geographies/onelineaddress', geocode_params, timeout)
+    if status != 'ok':
+        return status, _address_response(address, today, geographies=True), error
+
+    status, response = _parse_address(address, data, today, geographies=True)
+    return status, response, None
+
+
+def _log_failure(label, status, error, log=logger):
+    """ Log why a single geocoding request failed: inputs without a match at INFO, request failures at WARNING. """
+    if status == 'no_match':
+        log.info('%s%s did not match any records.', label[0].upper(), label[1:])
+    elif status == 'decode_error':
+        log.warning('Decoding JSON has failed for %s', label)
+    elif status == 'timeout':
+        log.warning('All attempts failed for %s', label)
+    else:
+        log.warning('Request exception occurred for %s: %s', label, error)
+
+
+def _retry_delay(attempts):
+    """ Return the seconds to wait before retrying a deferred input, with exponential backoff and jitter. """
+    delay = retry_backoff * 2 ** (attempts - 1)
+    return delay + random.uniform(0, delay)
+
+
+def _request_status(attempt, direction='forward'):
+    """ Run a geocoding attempt with each of the escalating `timeouts` until it does not time out. """
+    metrics = get_metrics()
+    for rung, t in enumerate(timeouts):
+        status, response, error = attempt(t)
+        if metrics is not None:
+            metrics.record_attempt(rung, t, status)
+        sleep(sleep_delay)
+        if status != 'timeout':
+            break
+
+    if metrics is not None:
+        metrics.record_result(direction, status)
+    return status, response, error
+
+
+def _request_with_timeouts(attempt, label, batch, direction='forward'):
+    """
+    Run a geocoding attempt with each of the escalating `timeouts` until it does not time out.
+
+    Returns the response if the request located a result or `batch` is True, otherwise logs the failure and
+    returns None.
+    """
+
+    status, response, error = _request_status(attempt, direction)
+    if status == 'located' or batch:
+        return response
+
+    _log_failure(label, status, error)
+    return None
 
 
 def geocode_address(address, benchmark=BENCHMARK, batch=False):
@@ -38,93 +373,10 @@ def geocode_address(address, benchmark=BENCHMARK, batch=False):
             Latitude of the geocoded address, or None if geocoding was unsuccessful.
     """
 
-    base_geocode_url = 'https://geocoding.geo.census.gov/geocoder/locations/onelineaddress'
-    geocode_params = {
-        'benchmark': benchmark,
-        'format': 'json',
-        'address': address
-    }
-
-    today = date.today().strftime('%Y-%m-%d')
-
-    def successful_response(requested_address, response_coordinates):
-        """ Construct and return a successful geocode response. """
-        longitude = response_coordinates['x']
-        latitude = response_coordinates['y']
-        longitude_latitude = (longitude, latitude)
-        response = {
-            'Address': requested_address,
-            'Date': today,
-            'Longitude': longitude,
-            'Latitude': latitude,
-            'Coordinates': longitude_latitude
-        }
-
-        return response
-
-    def failed_response(requested_address):
-        """ Construct and return a failed geocode response. """
-        response = {
-            'Address': requested_address,
-            'Date': today,
-            'Longitude': None,
-            'Latitude': None,
-            'Coordinates': None
-        }
-
-        return response
-
-    for t in timeouts:
-        # Try request for address geocode
-        try:
-            geocode_req = requests.get(base_geocode_url, params=geocode_params, timeout=t)
-            geocode_data = geocode_req.json()
-
-            # If the request was successful but didn't match an address
-            if 'result' in geocode_data and not geocode_data['result']['addressMatches']:
-                sleep(sleep_delay)
-                if batch:
-                    return failed_response(address)
-                else:
-                    print(f'Address {address} did not match any records.')
-                    return None
-
-            # If the request was successful and matched an address return first match
-            elif 'result' in geocode_data and geocode_data['result']['addressMatches']:
-                coordinates = geocode_data['result']['addressMatches'][0]['coordinates']
-                sleep(sleep_delay)
-                return successful_response(address, coordinates)
-
-        # Handle JSON decoding error
-        except ValueError:
-            sleep(sleep_delay)
-            if batch:
-                return failed_response(address)
-            else:
-                print('Decoding JSON has failed for address: ' + address)
-                return None
-
-        # Handle request timeout
-        except requests.exceptions.Timeout:
-            if t == timeouts[-1]:
-                sleep(sleep_delay)
-                if batch:
-                    return failed_response(address)
-                else:
-                    print(f'All attempts failed for address: {address}')
-                    return None
-
-            sleep(sleep_delay)
-            continue
+    def attempt(timeout):
+        return _attempt_address(address, benchmark=benchmark, timeout=timeout)
 
-        # Handle any other unforeseen requests-related exceptions
-        except requests.exceptions.RequestException as e:
-            sleep(sleep_delay)
-            if batch:
-                return failed_response(address)
-            else:
-                print(f'Request exception occurred for address {address}: {e}')
-                return None
+    return _request_with_timeouts(attempt, f'address {address}', batch)
 
 
 def geocode_coordinates(longitude_latitude, benchmark=BENCHMARK, vintage=VINTAGE, batch=False):
@@ -160,187 +412,470 @@ def geocode_coordinates(longitude_latitude, benchmark=BENCHMARK, vintage=VINTAGE
             The census tract of the coordinates, or None if geocoding was unsuccessful.
     """
 
-    longitude = longitude_latitude[0]
-    latitude = longitude_latitude[1]
+    def attempt(timeout):
+        return _attempt_coordinates(longitude_latitude, benchmark=benchmark, vintage=vintage, timeout=timeout)
 
-    base_geocode_url = 'https://geocoding.geo.census.gov/geocoder/geographies/coordinates'
-    geocode_params = {
-        'benchmark': benchmark,
-        'vintage': vintage,
-        'format': 'json',
-        'x': longitude,
-        'y': latitude
-    }
+    label = f'coordinates ({longitude_latitude[0]}, {longitude_latitude[1]})'
+    return _request_with_timeouts(attempt, label, batch, 'reverse')
 
-    today = date.today().strftime('%Y-%m-%d')
 
-    def successful_response(requested_longitude, requested_latitude, response_geographies):
-        """ Construct and return a successful geocode response. """
-        response = {
-            'Coordinates': (requested_longitude, requested_latitude),
-            'Date': today,
-            'State': response_geographies['States'][0]['BASENAME'],
-            'County': response_geographies['Counties'][0]['BASENAME'],
-            'Census Block': response_geographies['2020 Census Blocks'][0]['BASENAME'],
-            'Census Tract': response_geographies['Census Tracts'][0]['BASENAME']
-        }
+def geocode_address_geographies(address, benchmark=BENCHMARK, vintage=VINTAGE, batch=False):
+    """
+    Request coordinates and geographical information for a given address with a single request to the
+    U.S. Census Geocoder.
 
-        return response
+    This combines `geocode_address` and `geocode_coordinates` by using the `geographies/onelineaddress`
+    endpoint, which returns the matched coordinates together with the State, County, Tract, and Block layers.
 
-    def failed_response(req_longitude, req_latitude):
-        """Construct and return a failed geocode response."""
-        response = {
-            'Coordinates': (req_longitude, req_latitude),
-            'Date': today,
-            'State': None,
-            'County': None,
-            'Census Block': None,
-            'Census Tract': None
-        }
+    Parameters
+    ----------
+    address : str
+        The address string to geocode.
+    benchmark : str, optional
+        The benchmark string for the geocoding request. Default value is specified by `BENCHMARK`.
+    vintage : str, optional
+        The vintage string for the geocoding request. Default value is specified by `VINTAGE`.
+    batch : bool, optional
+        Whether or not the function is being used in a batch process. Default value is False.
 
-        return response
+    Returns
+    -------
+    dict
+        A dictionary with the geocoding result, containing the keys of both `geocode_address` and
+        `geocode_coordinates`: Address, Date, Longitude, Latitude, Coordinates, State, County, Census Block,
+        and Census Tract. Values are None if geocoding was unsuccessful.
+    """
 
-    for t in timeouts:
-        try:
-            geocode_req = requests.get(base_geocode_url, params=geocode_params, timeout=t)
-            geocode_data = geocode_req.json()
-
-            # If the request was successful but didn't match an address
-            if 'result' in geocode_data and len(geocode_data['result']['geographies']) == 0:
-                sleep(sleep_delay)
-                if batch:
-                    print(failed_response(longitude, latitude))
-                    return failed_response(longitude, latitude)
-                else:
-                    print(f'Coordinates ({longitude}, {latitude}) did not match any records.')
-                    return None
+    def attempt(timeout):
+        return _attempt_address_geographies(address, benchmark=benchmark, vintage=vintage, timeout=timeout)
 
-            # If the request was successful and contains the 'result' key
-            elif 'result' in geocode_data:
-                geographies = geocode_data['result']['geographies']
-                return successful_response(longitude, latitude, geographies)
+    return _request_with_timeouts(attempt, f'address {address}', batch, 'combined')
 
-        # Handle JSON decoding error
-        except ValueError:
-            sleep(sleep_delay)
-            if batch:
-                print(failed_response(longitude, latitude))
-                return failed_response(longitude, latitude)
-            else:
-                print(f'Decoding JSON has failed for coordinates: ({longitude}, {latitude})')
-                return None
 
-        # Handle request timeout
-        except requests.exceptions.Timeout:
-            if t == timeouts[-1]:
-                sleep(sleep_delay)
-                if batch:
-                    print(failed_response(longitude, latitude))
-                    return failed_response(longitude, latitude)
-                else:
-                    print(f'All attempts failed for coordinates: ({longitude}, {latitude})')
-                    sleep(sleep_delay)
-                return None
+# Geocoding attempt function and output columns of each batch direction
+DIRECTIONS = {
+    'forward': (_attempt_address, FORWARD_COLUMNS),
+    'reverse': (_attempt_coordinates, REVERSE_COLUMNS),
+    'combined': (_attempt_address_geographies, COMBINED_COLUMNS)
+}
 
-            sleep(sleep_delay)
-            continue
 
-        # Handle any other unforeseen requests-related exceptions
-        except requests.exceptions.RequestException as e:
-            sleep(sleep_delay)
-            if batch:
-                print(failed_response(longitude, latitude))
-                return failed_response(longitude, latitude)
-            else:
-                print(f'Request exception occurred for coordinates ({longitude}, {latitude}): {e}')
-                return None
+def iter_geocode(data, direction='forward', n_threads=None, max_attempts=None, max_in_flight=None):
+    """
+    Geocode a stream of inputs and yield each result as soon as it completes.
+
+    Inputs are read lazily from `data`, and at most `max_in_flight` of them are submitted at a time, so memory does
+    not grow with the size of the input. Results are yielded in completion order, not input order. Inputs that time
+    out, hit a connection error, or are throttled by the Census service are put in a deferred retry queue instead of
+    holding a thread. Once their backoff delay has passed, retries are submitted ahead of new inputs, each with the
+    next of the escalating `timeouts`.
+
+    Closing the generator early, for example by breaking out of the loop consuming it, cancels queued requests and
+    waits for those in flight to finish.
+
+    Parameters
+    ----------
+    data : iterable of str or tuple
+        Addresses (for forward or combined geocoding) or coordinates (for reverse geocoding) to be geocoded.
+        Duplicates are not removed, so each occurrence is requested.
+    direction : str, optional
+        Direction of geocoding: 'forward', 'reverse', or 'combined'. See `batch_geocode`. Default is 'forward'.
+    n_threads : int, optional
+        Maximum number of threads to be used for parallel processing. Default is the `max_concurrency` of the
+        shared rate controller.
+    max_attempts : int, optional
+        Maximum number of attempts per input. Default is the number of `timeouts`.
+    max_in_flight : int, optional
+        Maximum number of inputs submitted and not yet yielded, excluding deferred retries.
+        Default is twice `n_threads`.
+
+    Yields
+    ------
+    dict
+        A result with the same keys as a row of `batch_geocode`, including 'Status' and 'Attempts'.
+        'Status' is 'located' for successful results.
+
+    Raises
+    ------
+    ValueError
+        If the `direction` parameter is not 'forward', 'reverse', or 'combined'.
+    """
+
+    # Raise error if invalid direction
+    if direction not in DIRECTIONS:
+        raise ValueError('direction must be "forward", "reverse", or "combined"')
 
+    request = DIRECTIONS[direction][0]
 
-def batch_geocode(data, direction='forward', n_threads=1):
+    if max_attempts is None:
+        max_attempts = len(timeouts)
+
+    # Use enough threads for the rate controller to reach its maximum concurrency
+    if n_threads is None:
+        n_threads = get_rate_controller().max_concurrency
+    if max_in_flight is None:
+        max_in_flight = 2 * n_threads
+
+    # Size the shared connection pool so every thread can keep a connection alive
+    ensure_pool_size(n_threads)
+
+    metrics = get_metrics()
+
+    # Wrapper function to make one attempt, with the timeout escalating on each retry
+    def batch_request(batch_data, attempts):
+        rung = min(attempts, len(timeouts) - 1)
+        status, response, _ = request(batch_data, timeout=timeouts[rung])
+        if metrics is not None:
+            metrics.record_attempt(rung, timeouts[rung], status)
+        sleep(sleep_delay)
+        return batch_data, attempts + 1, status, response
+
+    pending = iter(data)
+    exhausted = False
+
+    # Deferred retries as a heap of (ready time, sequence number, input, attempts)
+    retry_queue = []
+    sequence = 0
+
+    # Use ThreadPoolExecutor to execute geocoding requests in parallel
+    executor = ThreadPoolExecutor(max_workers=n_threads)
+    futures = set()
+    try:
+        while True:
+            # Fill free slots with retries that are due first, then with new inputs
+            while len(futures) < max_in_flight and retry_queue and retry_queue[0][0] <= monotonic():
+                _, _, item, attempts = heapq.heappop(retry_queue)
+                futures.add(executor.submit(batch_request, item, attempts))
+            while len(futures) < max_in_flight and not exhausted:
+                item = next(pending, _EXHAUSTED)
+                if item is _EXHAUSTED:
+                    exhausted = True
+                else:
+                    futures.add(executor.submit(batch_request, item, 0))
+
+            if not futures:
+                if not retry_queue:
+                    break
+                sleep(max(retry_queue[0][0] - monotonic(), 0))
+                continue
+
+            timeout = max(retry_queue[0][0] - monotonic(), 0) if retry_queue else None
+            done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                item, attempts, status, response = future.result()
+
+                # Defer transient failures with exponential backoff and jitter
+                if status in RETRY_STATUSES and attempts < max_attempts:
+                    heapq.heappush(retry_queue, (monotonic() + _retry_delay(attempts), sequence, item, attempts))
+                    sequence += 1
+                    continue
+
+                response['Status'] = status
+                response['Attempts'] = attempts
+                if metrics is not None:
+                    metrics.record_result(direction, status)
+                yield response
+
+    # Cancel queued requests when the generator is closed or interrupted instead of waiting for them
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def batch_geocode(data, direction='forward', n_threads=None, max_attempts=None, checkpoint=None,
+                  checkpoint_size=1000, checkpoint_interval=30.0):
     """
-    Batch geocoding function that supports both forward and reverse geocoding.
+    Batch geocoding function that supports forward, reverse, and combined geocoding.
+
+    Each input gets a single attempt at first. Inputs that time out, hit a connection error, or are throttled by the
+    Census service are put in a deferred retry queue instead of holding a thread, and are retried with exponential
+    backoff and jitter. Each retry uses the next of the escalating `timeouts`. Use `iter_geocode` to consume results
+    while the batch is still running.
 
     Parameters
     ----------
-    data : list or set of str or tuple
-        A collection of addresses (for forward geocoding) or coordinates (for reverse geocoding) to be geocoded.
+    data : iterable of str or tuple
+        A collection of addresses (for forward or combined geocoding) or coordinates (for reverse geocoding)
+        to be geocoded.
     direction : str, optional
         Direction of geocoding:
         - 'forward' for addresses.
         - 'reverse' for coordinates.
+        - 'combined' for addresses, returning both coordinates and geographies from a single request.
         Default is 'forward'.
     n_threads : int, optional
-        Number of threads to be used for parallel processing. Default is 1.
+        Maximum number of threads to be used for parallel processing. Within this maximum, the number of requests
+        in flight and the request rate are set by the shared rate controller, which adapts them to how the Census
+        service responds. Default is the `max_concurrency` of the shared rate controller.
+    max_attempts : int, optional
+        Maximum number of attempts per input. Default is the number of `timeouts`.
+    checkpoint : callable, optional
+        Called as `checkpoint(located_df, failed_df)` with the results completed since the previous call, every
+        `checkpoint_size` results or `checkpoint_interval` seconds, and once more when the run ends or is
+        interrupted. Use it to persist results during long runs so at most one checkpoint of work is lost.
+    checkpoint_size : int, optional
+        Number of results between checkpoints. Default is 1000.
+    checkpoint_interval : float, optional
+        Maximum number of seconds between checkpoints. Default is 30.
 
     Returns
     -------
     located_df : pd.DataFrame
         DataFrame with successfully geocoded data. Columns vary based on `direction`:
         - 'forward': ['Address', 'Date', 'Longitude', 'Latitude', 'Coordinates']
-        - 'reverse': ['Coordinates', 'Date', 'State', 'County', 'Urban Area', 'Census Block', 'Census Tract']
+        - 'reverse': ['Coordinates', 'Date', 'State', 'County', 'Census Block', 'Census Tract']
+        - 'combined': ['Address', 'Date', 'Longitude', 'Latitude', 'Coordinates', 'State', 'County',
+                       'Census Block', 'Census Tract']
+        followed by 'Status' and 'Attempts'.
     failed_df : pd.DataFrame
         DataFrame with data that couldn't be geocoded. Columns are consistent with `located_df`.
+        'Status' records the failure class: 'no_match', 'timeout', 'connection_error', 'throttled',
+        'http_error', or 'decode_error'. 'Attempts' records the number of requests made.
 
     Raises
     ------
     ValueError
-        If the `direction` parameter is neither 'forward' nor 'reverse'.
-
-    Notes
-    -----
-    If `n_threads` is set higher than 100, a warning will be displayed with a recommendation to set `n_threads` to 100
-    to avoid potential rate limits.
+        If the `direction` parameter is not 'forward', 'reverse', or 'combined'.
     """
 
-    # Raise error if invalid direction
-    if direction not in ['forward', 'reverse']:
-        raise ValueError('direction must be either "forward" or "reverse"')
-
-    # Show warning if n_threads is set very high and ask user if they want to set n_threads to 100
-    if n_threads > 100:
-        print('WARNING: n_threads is set very high and you may experience rate limits.')
-        print('Would you like to set n_threads to the recommended max of 100? (y/n)')
-        response = input()
-        if response == 'y':
-            n_threads = 100
-        else:
-            print('If this process fails, try reducing n_threads to 100 or less.')
-
-    # Convert data to set to remove duplicates
-    data = set(data)
+    import pandas as pd
 
-    # Define columns for the output DataFrames based on direction
-    forward_cols = ['Address', 'Date', 'Longitude', 'Latitude', 'Coordinates']
-    reverse_cols = ['Coordinates', 'Date', 'State', 'County', 'Urban Area', 'Census Block', 'Census Tract']
-
-    # Select geocoding function based on direction
-    located_df = pd.DataFrame()
-    if direction == 'forward':
-        request = geocode_address
-        output_cols = forward_cols
-
-    elif direction == 'reverse':
-        request = geocode_coordinates
-        output_cols = reverse_cols
+    # Raise error if invalid direction
+    if direction not in DIRECTIONS:
+        raise ValueError('direction must be "forward", "reverse", or "combined"')
 
-    # Wrapper function to set geocoding requests to batch mode
-    def batch_request(batch_data):
-        return request(batch_data, batch=True)
+    output_cols = DIRECTIONS[direction][1] + STATUS_COLUMNS
 
     # Initialize empty lists to hold results
     located_results = []
     failed_results = []
 
-    # Use ThreadPoolExecutor to execute geocoding requests in parallel
-    with ThreadPoolExecutor(max_workers=n_threads) as executor:
-        for result in executor.map(batch_request, data):
-            if result[next(reversed(result.keys()))] is not None:
-                located_results.append(result)
+    # Results completed since the last checkpoint, as positions in the result lists
+    last_checkpoint = {'located': 0, 'failed': 0, 'time': monotonic()}
+
+    def flush():
+        if checkpoint is None:
+            return None
+        located = located_results[last_checkpoint['located']:]
+        failed = failed_results[last_checkpoint['failed']:]
+        last_checkpoint.update(located=len(located_results), failed=len(failed_results), time=monotonic())
+        if located or failed:
+            checkpoint(pd.DataFrame(located, columns=output_cols), pd.DataFrame(failed, columns=output_cols))
+
+    # Convert data to set to remove duplicates, and collect results as they complete
+    try:
+        for response in iter_geocode(set(data), direction, n_threads=n_threads, max_attempts=max_attempts):
+            if response['Status'] == 'located':
+                located_results.append(response)
             else:
-                failed_results.append(result)
+                failed_results.append(response)
+
+            # Checkpoint every checkpoint_size results or checkpoint_interval seconds
+            n_unsaved = len(located_results) - last_checkpoint['located']
+            n_unsaved += len(failed_results) - last_checkpoint['failed']
+            if n_unsaved >= checkpoint_size or monotonic() - last_checkpoint['time'] >= checkpoint_interval:
+                flush()
+
+    # Save what has completed, also when interrupted
+    finally:
+        flush()
 
     # Convert lists to DataFrames
     located_df = pd.DataFrame(located_results, columns=output_cols)
     failed_df = pd.DataFrame(failed_results, columns=output_cols)
 
     return located_df, failed_df
+
+
+def geocode_address_batch(addresses, benchmark=BENCHMARK):
+    """
+    Request geocoding information for a chunk of addresses with one upload to the U.S. Census batch geocoder.
+
+    Parameters
+    ----------
+    addresses : list of str
+        The address strings to geocode. At most `BATCH_SIZE` addresses are accepted per request.
+    benchmark : str, optional
+        The benchmark string for the geocoding request. Default value is specified by `BENCHMARK`.
+
+    Returns
+    -------
+    located_df : pd.DataFrame
+        DataFrame with successfully geocoded addresses, with columns
+        ['Address', 'Date', 'Longitude', 'Latitude', 'Coordinates', 'Status', 'Attempts'].
+    failed_df : pd.DataFrame
+        DataFrame with addresses that couldn't be geocoded. Columns are consistent with `located_df`.
+        'Status' is 'no_match' for addresses the Census Geocoder did not match, or the failure class of the upload.
+
+    Raises
+    ------
+    ValueError
+        If more than `BATCH_SIZE` addresses are provided.
+    """
+
+    import pandas as pd
+
+    addresses = list(addresses)
+    if len(addresses) > BATCH_SIZE:
+        raise ValueError(f'The Census batch geocoder accepts at most {BATCH_SIZE:,} addresses per request.')
+
+    base_geocode_url = f'{BASE_URL}/locations/addressbatch'
+    geocode_params = {
+        'benchmark': benchmark
+    }
+
+    today = date.today().strftime('%Y-%m-%d')
+
+    # Build the upload file with the row number as the unique ID: id, street, city, state, zip
+    upload = io.StringIO()
+    writer = csv.writer(upload)
+    for i, address in enumerate(addresses):
+        writer.writerow([i, *split_address(address)])
+    address_file = {'addressFile': ('addresses.csv', upload.getvalue(), 'text/csv')}
+
+    metrics = get_metrics()
+    response_text = None
+    status = 'timeout'
+    attempts = 0
+    for rung, t in enumerate(batch_timeouts):
+        attempts += 1
+        try:
+            geocode_req = _send('post', base_geocode_url, t, data=geocode_params, files=address_file)
+            if geocode_req.status_code == 429 or geocode_req.status_code >= 500:
+                status = 'throttled'
+                sleep(retry_backoff * 2 ** (attempts - 1))
+                continue
+            geocode_req.raise_for_status()
+            response_text = geocode_req.text
+            status = 'no_match'
+            break
+
+        # Handle request timeout
+        except requests.exceptions.Timeout:
+            status = 'timeout'
+            sleep(sleep_delay)
+            continue
+
+        # Handle any other unforeseen requests-related exceptions
+        except requests.exceptions.RequestException as e:
+            status = 'http_error' if isinstance(e, requests.exceptions.HTTPError) else 'connection_error'
+            logger.warning('Request exception occurred for a batch of %s addresses: %s', f'{len(addresses):,}', e)
+            break
+
+        finally:
+            if metrics is not None:
+                metrics.record_attempt(rung, t, 'ok' if response_text is not None else status)
+
+    # Parse the response rows: id, input address, match, match type, matched address, "lon,lat", tiger id, side
+    located_results = []
+    matched_ids = set()
+    if response_text is not None:
+        for row in csv.reader(io.StringIO(response_text)):
+            if len(row) < 6 or row[2] != 'Match' or not row[5]:
+                continue
+            try:
+                i = int(row[0])
+                longitude, latitude = (float(value) for value in row[5].split(','))
+            except ValueError:
+                continue
+            if i in matched_ids or not 0 <= i < len(addresses):
+                continue
+            matched_ids.add(i)
+            located_results.append({
+                'Address': addresses[i],
+                'Date': today,
+                'Longitude': longitude,
+                'Latitude': latitude,
+                'Coordinates': (longitude, latitude),
+                'Status': 'located',
+                'Attempts': attempts
+            })
+
+    # Any address without a match in the response failed, including ones lost to a failed request
+    failed_results = [
+        {'Address': address, 'Date': today, 'Longitude': None, 'Latitude': None, 'Coordinates': None,
+         'Status': status, 'Attempts': attempts}
+        for i, address in enumerate(addresses) if i not in matched_ids
+    ]
+
+    if metrics is not None:
+        for result_status, count in (('located', len(located_results)), (status, len(failed_results))):
+            if count:
+                metrics.record_result('forward', result_status, count)
+
+    located_df = pd.DataFrame(located_results, columns=FORWARD_COLUMNS + STATUS_COLUMNS)
+    failed_df = pd.DataFrame(failed_results, columns=FORWARD_COLUMNS + STATUS_COLUMNS)
+
+    return located_df, failed_df
+
+
+def bulk_geocode(data, chunk_size=BATCH_SIZE, n_threads=4, benchmark=BENCHMARK, checkpoint=None):
+    """
+    Forward geocode addresses in chunks with the U.S. Census batch geocoder.
+
+    The deduplicated addresses are split into chunks of `chunk_size` and several chunks are uploaded at once.
+    This costs one request per chunk rather than one request per address.
+
+    Parameters
+    ----------
+    data : list or set of str
+        A collection of addresses to be geocoded.
+    chunk_size : int, optional
+        Number of addresses uploaded per request. Default and maximum is `BATCH_SIZE`.
+    n_threads : int, optional
+        Number of chunks to upload in parallel. Default is 4.
+    benchmark : str, optional
+        The benchmark string for the geocoding request. Default value is specified by `BENCHMARK`.
+    checkpoint : callable, optional
+        Called as `checkpoint(located_df, failed_df)` with the results of each chunk as it completes.
+
+    Returns
+    -------
+    located_df : pd.DataFrame
+        DataFrame with successfully geocoded addresses, with columns
+        ['Address', 'Date', 'Longitude', 'Latitude', 'Coordinates', 'Status', 'Attempts'].
+    failed_df : pd.DataFrame
+        DataFrame with addresses that couldn't be geocoded. Columns are consistent with `located_df`.
+        'Status' is 'no_match' for addresses the Census Geocoder did not match, or the failure class of the upload.
+
+    Raises
+    ------
+    ValueError
+        If `chunk_size` is not between 1 and `BATCH_SIZE`.
+    """
+
+    import pandas as pd
+
+    if not 1 <= chunk_size <= BATCH_SIZE:
+        raise ValueError(f'chunk_size must be between 1 and {BATCH_SIZE:,}')
+
+    # Convert data to a sorted list to remove duplicates and keep chunks deterministic
+    data = sorted(set(data))
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    # Wrapper function to set the benchmark for each chunk
+    def batch_request(chunk):
+        return geocode_address_batch(chunk, benchmark=benchmark)
+
+    located_results = []
+    failed_results = []
+
+    # Upload chunks in parallel
+    ensure_pool_size(n_threads)
+    with ThreadPoolExecutor(max_workers=max(1, n_threads)) as executor:
+        for located_df, failed_df in executor.map(batch_request, chunks):
+            located_results.append(located_df)
+            failed_results.append(failed_df)
+            if checkpoint is not None:
+                checkpoint(located_df, failed_df)
+
+    # Combine chunk results into single DataFrames
+    if chunks:
+        located_df = pd.concat(located_results, ignore_index=True)
+        failed_df = pd.concat(failed_results, ignore_index=True)
+    else:
+        located_df = pd.DataFrame(columns=FORWARD_COLUMNS + STATUS_COLUMNS)
+        failed_df = pd.DataFrame(columns=FORWARD_COLUMNS + STATUS_COLUMNS)
+
+    return located_df, failed_df
@@ -0,0 +1,365 @@
+import asyncio
+import heapq
+import json
+import logging
+import pandas as pd
+from datetime import date
+from time import monotonic
+
+from . import census_api
+from .census_api import BENCHMARK, VINTAGE, FORWARD_COLUMNS, REVERSE_COLUMNS, RETRY_STATUSES, STATUS_COLUMNS
+from .metrics import get_metrics
+from .rate import get_rate_controller
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def _require_aiohttp():
+    """ Raise an informative error if the optional aiohttp dependency is not installed. """
+    if aiohttp is None:
+        raise ImportError('Async geocoding requires aiohttp. Install it with `pip install usgeocoder[async]`.')
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for a free request slot of the rate controller, or for deferred retries of other workers
+_POLL_INTERVAL = 0.01
+
+# Marks the end of the input of `batch_geocode_async`
+_EXHAUSTED = object()
+
+
+def create_session(concurrency=1000):
+    """
+    Create an aiohttp session whose connection pool allows `concurrency` requests in flight.
+
+    Parameters
+    ----------
+    concurrency : int, optional
+        Maximum number of open connections. Default is 1000.
+
+    Returns
+    -------
+    aiohttp.ClientSession
+        A session to pass to the async geocoding functions. The caller is responsible for closing it.
+    """
+
+    _require_aiohttp()
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def _acquire(controller):
+    """ Wait without blocking the event loop until the rate controller lets a request be sent. """
+    while True:
+        start, wait = controller.try_acquire()
+        if start is not None:
+            return start
+        await asyncio.sleep(_POLL_INTERVAL if wait is None else wait)
+
+
+async def _attempt(session, url, params, timeout):
+    """
+    Send a single request to the Census Geocoder without blocking and classify the outcome like `census_api._attempt`.
+
+    The request is paced by the shared rate controller, and its outcome is reported back to it, as for the threaded
+    engine. If metrics are enabled, the request is recorded in the shared `RequestMetrics`.
+
+    Returns
+    -------
+    tuple of (str, dict or None, str or None)
+        The status, the decoded response if the status is 'ok', and an error message for request failures.
+        The status is one of 'ok', 'timeout', 'connection_error', 'throttled' (HTTP 429 or 5xx),
+        'http_error' (any other HTTP error), or 'decode_error'.
+    """
+
+    controller = get_rate_controller()
+    start = await _acquire(controller)
+    outcome = 'error'
+    request = census_api._MetricsRecord(url)
+    try:
+        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            status_code = response.status
+            body = await response.read()
+        request.received(status_code, len(body))
+        outcome = 'throttled' if status_code == 429 or status_code >= 500 else 'success'
+
+    # Handle request timeout
+    except asyncio.TimeoutError:
+        outcome = request.error = 'timeout'
+        return 'timeout', None, None
+
+    # Handle any other unforeseen client exceptions
+    except aiohttp.ClientError as e:
+        return 'connection_error', None, str(e)
+
+    finally:
+        controller.release(start, outcome)
+        request.finish()
+
+    return census_api._response_status(status_code, lambda: json.loads(body))
+
+
+async def _attempt_address(address, session, benchmark=BENCHMARK, timeout=None):
+    """ Make a single forward geocoding attempt and return (status, response, error). """
+    geocode_params = {
+        'benchmark': benchmark,
+        'format': 'json',
+        'address': address
+    }
+
+    today = date.today().strftime('%Y-%m-%d')
+    url = f'{census_api.BASE_URL}/locations/onelineaddress'
+    status, data, error = await _attempt(session, url, geocode_params, timeout or census_api.timeouts[0])
+    if status != 'ok':
+        return status, census_api._address_response(address, today), error
+
+    status, response = census_api._parse_address(address, data, today)
+    return status, response, None
+
+
+async def _attempt_coordinates(longitude_latitude, session, benchmark=BENCHMARK, vintage=VINTAGE, timeout=None):
+    """ Make a single reverse geocoding attempt and return (status, response, error). """
+    longitude = longitude_latitude[0]
+    latitude = longitude_latitude[1]
+    geocode_params = {
+        'benchmark': benchmark,
+        'vintage': vintage,
+        'format': 'json',
+        'x': str(longitude),
+        'y': str(latitude)
+    }
+
+    today = date.today().strftime('%Y-%m-%d')
+    url = f'{census_api.BASE_URL}/geographies/coordinates'
+    status, data, error = await _attempt(session, url, geocode_params, timeout or census_api.timeouts[0])
+    if status != 'ok':
+        return status, census_api._coordinates_response(longitude, latitude, today), error
+
+    status, response = census_api._parse_coordinates(longitude, latitude, data, today)
+    return status, response, None
+
+
+async def _request_status(attempt, direction):
+    """ Run a geocoding attempt with each of the escalating `timeouts` of `census_api` until it does not time out. """
+    metrics = get_metrics()
+    for rung, t in enumerate(census_api.timeouts):
+        status, response, error = await attempt(t)
+        if metrics is not None:
+            metrics.record_attempt(rung, t, status)
+        await asyncio.sleep(census_api.sleep_delay)
+        if status != 'timeout':
+            break
+
+    if metrics is not None:
+        metrics.record_result(direction, status)
+    return status, response, error
+
+
+async def geocode_address_async(address, session, benchmark=BENCHMARK, batch=False):
+    """
+    Request geocoding information for a given address using the U.S. Census Geocoder without blocking.
+
+    Parameters
+    ----------
+    address : str
+        The address string to geocode.
+    session : aiohttp.ClientSession
+        The session used to send the request. See `create_session`.
+    benchmark : str, optional
+        The benchmark string for the geocoding request. Default value is specified by `BENCHMARK`.
+    batch : bool, optional
+        Whether or not the function is being used in a batch process. Default value is False.
+
+    Returns
+    -------
+    dict
+        A dictionary with the same keys as `geocode_address`.
+    """
+
+    async def attempt(timeout):
+        return await _attempt_address(address, session, benchmark=benchmark, timeout=timeout)
+
+    status, response, error = await _request_status(attempt, 'forward')
+    if status == 'located' or batch:
+        return response
+
+    census_api._log_failure(f'address {address}', status, error, logger)
+    return None
+
+
+async def geocode_coordinates_async(longitude_latitude, session, benchmark=BENCHMARK, vintage=VINTAGE, batch=False):
+    """
+    Request geographical information based on given coordinates using the U.S. Census Geocoder without blocking.
+
+    Parameters
+    ----------
+    longitude_latitude : tuple of (float, float)
+        A tuple of (longitude, latitude) to geocode.
+    session : aiohttp.ClientSession
+        The session used to send the request. See `create_session`.
+    benchmark : str, optional
+        The benchmark string for the geocoding request. Default value is specified by `BENCHMARK`.
+    vintage : str, optional
+        The vintage string for the geocoding request. Default value is specified by `VINTAGE`.
+    batch : bool, optional
+        Whether or not the function is being used in a batch process. Default value is False.
+
+    Returns
+    -------
+    dict
+        A dictionary with the same keys as `geocode_coordinates`.
+    """
+
+    async def attempt(timeout):
+        return await _attempt_coordinates(longitude_latitude, session, benchmark=benchmark, vintage=vintage,
+                                          timeout=timeout)
+
+    status, response, error = await _request_status(attempt, 'reverse')
+    if status == 'located' or batch:
+        return response
+
+    census_api._log_failure(f'coordinates ({longitude_latitude[0]}, {longitude_latitude[1]})', status, error, logger)
+    return None
+
+
+# Geocoding attempt coroutine and output columns of each batch direction
+DIRECTIONS = {
+    'forward': (_attempt_address, FORWARD_COLUMNS),
+    'reverse': (_attempt_coordinates, REVERSE_COLUMNS)
+}
+
+
+async def batch_geocode_async(data, direction='forward', concurrency=1000, session=None, max_attempts=None):
+    """
+    Batch geocoding coroutine that supports both forward and reverse geocoding.
+
+    This is the non-blocking counterpart of `batch_geocode` and can be awaited from an existing event loop.
+    A fixed set of `concurrency` workers pulls from the input, so memory grows with the number of requests in
+    flight rather than with the number of inputs. As in `batch_geocode`, inputs that time out, hit a connection
+    error, or are throttled by the Census service are put in a deferred retry queue with exponential backoff and
+    jitter, and each retry uses the next of the escalating `timeouts` of `census_api`.
+
+    Parameters
+    ----------
+    data : list or set of str or tuple
+        A collection of addresses (for forward geocoding) or coordinates (for reverse geocoding) to be geocoded.
+    direction : str, optional
+        Direction of geocoding:
+        - 'forward' for addresses.
+        - 'reverse' for coordinates.
+        Default is 'forward'.
+    concurrency : int, optional
+        Maximum number of requests in flight. Within this maximum, the number of requests in flight and the request
+        rate are set by the shared rate controller, as for `batch_geocode`. Default is 1000.
+    session : aiohttp.ClientSession, optional
+        Session used to send requests. If None, a session is created and closed for this call.
+    max_attempts : int, optional
+        Maximum number of attempts per input. Default is the number of `timeouts`.
+
+    Returns
+    -------
+    located_df : pd.DataFrame
+        DataFrame with successfully geocoded data. Columns are the same as `batch_geocode`, including 'Status' and
+        'Attempts'.
+    failed_df : pd.DataFrame
+        DataFrame with data that couldn't be geocoded. Columns are consistent with `located_df`, and 'Status'
+        records the failure class as in `batch_geocode`.
+
+    Raises
+    ------
+    ValueError
+        If the `direction` parameter is neither 'forward' nor 'reverse'.
+    ImportError
+        If aiohttp is not installed.
+    """
+
+    # Raise error if invalid direction
+    if direction not in DIRECTIONS:
+        raise ValueError('direction must be either "forward" or "reverse"')
+    _require_aiohttp()
+
+    request, columns = DIRECTIONS[direction]
+    output_cols = columns + STATUS_COLUMNS
+    timeouts = census_api.timeouts
+    if max_attempts is None:
+        max_attempts = len(timeouts)
+    metrics = get_metrics()
+
+    # Convert data to set to remove duplicates
+    data = set(data)
+    pending = iter(data)
+
+    located_results = []
+    failed_results = []
+
+    # Deferred retries as a heap of (ready time, sequence number, input, attempts), and inputs being requested
+    retry_queue = []
+    state = {'sequence': 0, 'in_flight': 0, 'exhausted': False}
+
+    def next_input():
+        """ Return the next retry that is due or the next new input with its attempts, or None if there is none. """
+        if retry_queue and retry_queue[0][0] <= monotonic():
+            _, _, item, attempts = heapq.heappop(retry_queue)
+            return item, attempts
+        if not state['exhausted']:
+            item = next(pending, _EXHAUSTED)
+            if item is not _EXHAUSTED:
+                return item, 0
+            state['exhausted'] = True
+        return None
+
+    # Each worker takes a due retry or the next input as soon as its previous request completes
+    async def worker(worker_session):
+        while True:
+            task = next_input()
+            if task is None:
+                # Stop once no retry can be added anymore, otherwise wait for the next one
+                if not retry_queue and not state['in_flight']:
+                    return None
+                await asyncio.sleep(max(retry_queue[0][0] - monotonic(), 0) if retry_queue else _POLL_INTERVAL)
+                continue
+
+            item, attempts = task
+            rung = min(attempts, len(timeouts) - 1)
+            state['in_flight'] += 1
+            try:
+                status, response, _ = await request(item, worker_session, timeout=timeouts[rung])
+            finally:
+                state['in_flight'] -= 1
+            if metrics is not None:
+                metrics.record_attempt(rung, timeouts[rung], status)
+            await asyncio.sleep(census_api.sleep_delay)
+            attempts += 1
+
+            # Defer transient failures with exponential backoff and jitter
+            if status in RETRY_STATUSES and attempts < max_attempts:
+                ready = monotonic() + census_api._retry_delay(attempts)
+                heapq.heappush(retry_queue, (ready, state['sequence'], item, attempts))
+                state['sequence'] += 1
+                continue
+
+            response['Status'] = status
+            response['Attempts'] = attempts
+            if metrics is not None:
+                metrics.record_result(direction, status)
+            (located_results if status == 'located' else failed_results).append(response)
+
+    owns_session = session is None
+    if owns_session:
+        session = create_session(concurrency)
+    try:
+        n_workers = max(1, min(concurrency, len(data)))
+        await asyncio.gather(*(worker(session) for _ in range(n_workers)))
+    finally:
+        if owns_session:
+            await session.close()
+
+    # Convert lists to DataFrames
+    located_df = pd.DataFrame(located_results, columns=output_cols)
+    failed_df = pd.DataFrame(failed_results, columns=output_cols)
+
+    return located_df, failed_df
@@ -0,0 +1,31 @@
+import argparse
+
+
+def main(argv=None):
+    """
+    Command line entry point for `geocode_file`.
+
+    Arguments are parsed before pandas and the rest of the package are imported, so `--help` and usage errors
+    return immediately.
+    """
+
+    parser = argparse.ArgumentParser(prog='usgeocoder',
+                                     description='Geocode a CSV or Parquet file with the U.S. Census Geocoder.')
+    parser.add_argument('input', help='input CSV or Parquet file')
+    parser.add_argument('output', help='output CSV or Parquet file')
+    parser.add_argument('--chunk-size', type=int, help='rows processed at a time (default: 100000)')
+    parser.add_argument('--no-reverse', action='store_true', help='skip reverse geocoding')
+    parser.add_argument('--engine', choices=['batch', 'request'], default='batch', help='forward geocoding engine')
+    parser.add_argument('--store', help='path of the result store')
+    parser.add_argument('--no-normalize', action='store_true', help='use addresses as given for caching')
+    parser.add_argument('--verbose', action='store_true', help='print progress')
+    args = parser.parse_args(argv)
+
+    from .pipeline import CHUNK_SIZE, geocode_file
+
+    geocode_file(args.input, args.output, chunk_size=args.chunk_size or CHUNK_SIZE, reverse=not args.no_reverse,
+                 engine=args.engine, store_path=args.store, normalize=not args.no_normalize, verbose=args.verbose)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,57 @@
+import asyncio
+import numpy as np
 import pandas as pd
 import os
 from pathlib import Path
 
-from .utils import create_address_list, create_coordinates_list
-from .census_api import batch_geocode
+from .utils import create_address_list, create_coordinates_list, parse_coordinates
+from .census_api import batch_geocode, bulk_geocode, FORWARD_COLUMNS, REVERSE_COLUMNS, STATUS_COLUMNS
+from .census_async import batch_geocode_async
+from .store import ResultStore, COORDINATE_GRID, coordinates_array, coordinates_keys
+from .schema import compact_columns, compact_results, concat_results, result_coordinates
+from .normalize import normalize_addresses
+from .profiling import NULL_PHASE, Profiler
+from .join import join_columns
+from .sharded import sharded_geocode
+from .pipelined import pipelined_geocode
+from .refresh import RefreshScheduler
 
 
 ROOT = Path(os.getcwd())
 
 
+class StoredResults:
+    """
+    A `Geocoder` attribute with the located or failed results of a store table, loaded on first access.
+
+    Until the attribute is read or assigned, the results stay in the store, so creating a `Geocoder` does not depend
+    on the number of cached results.
+    """
+
+    def __init__(self, table, located):
+        self.table = table
+        self.located = located
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, geocoder, owner=None):
+        if geocoder is None:
+            return self
+        if self.name not in geocoder._results:
+            if geocoder.compact:
+                # Read longitudes and latitudes without building coordinate tuples
+                df = geocoder.store.load(self.table, located=self.located,
+                                         columns=compact_columns(self.table, self.located))
+                geocoder._results[self.name] = compact_results(df)
+            else:
+                geocoder._results[self.name] = geocoder.store.load(self.table, located=self.located)
+        return geocoder._results[self.name]
+
+    def __set__(self, geocoder, df):
+        geocoder._results[self.name] = df
+
+
 class Geocoder:
     """
     A class to manage the geocoding process by performing forward and reverse geocoding and saving the results locally.
@@ -27,87 +70,168 @@ class Geocoder:
         Coordinates that have been successfully reverse geocoded.
     failed_coordinates : pd.DataFrame
         Coordinates that failed reverse geocoding.
+    store : ResultStore
+        SQLite store in the geocoder directory that persists every result.
+    profile : ProfileReport or None
+        Wall time, CPU time, and peak memory of each phase run so far, or None if profiling is disabled.
+    refresher : RefreshScheduler or None
+        Scheduler refreshing stale results in the background, set by `start_refresh`.
+
+    The located and failed results are loaded from the store the first time they are accessed. With `compact=True`
+    they are kept in the compact schema of `compact_results`.
 
     Methods
     -------
-    load_or_create_csv(file_name, columns) -> pd.DataFrame
-        Load an existing CSV file or create a new one if it doesn't exist.
+    import_csv()
+        Import results from the CSV files used by earlier versions into the result store.
     add_addresses(data)
         Add addresses to the Geocoder instance.
     add_coordinates(data)
         Add coordinates to the Geocoder instance.
     forward(addresses=None)
         Conduct forward geocoding on the provided addresses.
+    forward_async(addresses=None)
+        Conduct forward geocoding without blocking the running event loop.
     reverse(coordinates=None)
         Conduct reverse geocoding on the provided coordinates.
+    reverse_async(coordinates=None)
+        Conduct reverse geocoding without blocking the running event loop.
+    forward_reverse(addresses=None)
+        Conduct forward and reverse geocoding in overlapping stages.
     save_data()
-        Save geocoding results to CSV files.
+        Save new geocoding results to the result store.
     delete_data(records='failed', time=365)
         Filter out geocoding results older than the specified time.
+    start_refresh(ttl=365)
+        Refresh stale results in the background, starting with the addresses and coordinates requested most recently.
+    stop_refresh()
+        Stop refreshing stale results in the background.
     """
 
-    def __init__(self, data=None):
-        """ Initializes the Geocoder instance. Loads or creates necessary CSV files for storing results. """
+    located_addresses = StoredResults('addresses', located=True)
+    failed_addresses = StoredResults('addresses', located=False)
+    located_coordinates = StoredResults('coordinates', located=True)
+    failed_coordinates = StoredResults('coordinates', located=False)
+
+    def __init__(self, data=None, checkpoint_size=1000, checkpoint_interval=30.0, normalize=True,
+                 coordinate_grid=COORDINATE_GRID, compact=False, profile=False):
+        """
+        Initializes the Geocoder instance. Opens or creates the result store. Existing results are loaded from the
+        store when they are first accessed.
+
+        Parameters
+        ----------
+        data : pd.DataFrame, optional
+            Data containing addresses or coordinates.
+        checkpoint_size : int, optional
+            Number of results between saves to the result store during forward and reverse geocoding.
+            Default is 1000.
+        checkpoint_interval : float, optional
+            Maximum number of seconds between saves to the result store during forward and reverse geocoding.
+            Default is 30.
+        normalize : bool, optional
+            Geocode and cache addresses in their canonical form from `normalize_addresses`, so variants of the same
+            address share one request and one result. The original addresses are kept in the merged data. Results
+            already in the store are re-keyed to their canonical form with `ResultStore.normalize_address_keys`.
+            Default is True.
+        coordinate_grid : float, optional
+            Spacing in degrees of the grid coordinates are snapped to for caching. Coordinates in the same grid cell
+            share one request and one result. Default is `COORDINATE_GRID`, about 0.1 meters.
+        compact : bool, optional
+            Keep located and failed results in the compact schema of `compact_results`: datetime dates, categorical
+            names, and float Longitude and Latitude columns instead of coordinate tuples. Uses a fraction of the
+            memory for large caches. Default is False.
+        profile : bool or Profiler, optional
+            Record the wall time, CPU time, and peak memory of each phase of the run, from opening the store to
+            saving results, and return them from `profile`. Pass a `Profiler` to turn off memory tracing or to emit
+            the phases as trace spans. Default is False.
+        """
+
         # Initialize attributes
         self.data = None
         self.addresses = None
         self.coordinates = None
-        self.located_addresses = None
-        self.failed_coordinates = None
-        self.located_coordinates = None
-        self.failed_addresses = None
-
-        # Initialize CSV files
-        files = {
-            'located_addresses': ['Address', 'Date', 'Longitude', 'Latitude', 'Coordinates'],
-            'failed_addresses': ['Address', 'Date', 'Longitude', 'Latitude', 'Coordinates'],
-            'located_coordinates': ['Coordinates', 'Date', 'State', 'County', 'Census Block', 'Census Tract'],
-            'failed_coordinates': ['Coordinates', 'Date', 'State', 'County', 'Census Block', 'Census Tract'],
-        }
-
-        # Load existing CSV files or create new ones if they don't exist
-        if (ROOT / 'geocoder').exists():
-            for file_name, columns in files.items():
-                setattr(self, file_name, self.load_or_create_csv(file_name, columns))
-        else:
-            (ROOT / 'geocoder').mkdir()
-            for file_name, columns in files.items():
-                df = pd.DataFrame(columns=columns)
-                df.to_csv(ROOT / 'geocoder' / f'{file_name}.csv', index=False)
-                setattr(self, file_name, df)
+        self._results = {}
+        self.profiler = Profiler() if profile is True else (profile or None)
+        self.refresher = None
+
+        # Open the result store, creating the geocoder directory if it doesn't exist
+        (ROOT / 'geocoder').mkdir(exist_ok=True)
+        with self._phase('open_store'):
+            self.store = ResultStore(ROOT / 'geocoder' / 'geocoder.db', grid=coordinate_grid)
+        self.checkpoint_size = checkpoint_size
+        self.checkpoint_interval = checkpoint_interval
+        self.normalize = normalize
+        self.compact = compact
+        self._unsaved = []
+        self._merged_columns = None
+
+        # Import results saved as CSV files by earlier versions
+        with self._phase('import_csv'):
+            self.import_csv()
+
+        # Re-key results saved with addresses as given, or in the canonical form of an earlier version
+        if normalize:
+            with self._phase('normalize_store'):
+                self.store.normalize_address_keys()
 
         # Add data if provided
         if data is not None:
-            self.add_data(data)
+            with self._phase('add_data', rows=len(data)):
+                self.add_data(data)
 
-    @staticmethod
-    def load_or_create_csv(file_name, columns):
-        """
-        Load an existing CSV file or create a new one if it doesn't exist.
+    @property
+    def profile(self):
+        """ The `ProfileReport` of the phases run so far, or None if profiling is disabled. """
+        return None if self.profiler is None else self.profiler.report
 
-        Parameters
-        ----------
-        file_name : str
-            The name of the CSV file to be loaded or created.
-        columns : list of str
-            List of column names for the CSV file.
+    def _phase(self, name, **attributes):
+        """ Return a context manager that records a phase if profiling is enabled. """
+        if self.profiler is None:
+            return NULL_PHASE
+        return self.profiler.phase(name, **attributes)
 
-        Returns
-        -------
-        pd.DataFrame
-            Loaded data or an empty DataFrame with specified columns.
+    def import_csv(self):
         """
+        Import results from the CSV files used by earlier versions into the result store.
 
-        path = ROOT / 'geocoder' / f'{file_name}.csv'
-        if path.exists():
-            return pd.read_csv(path)
-        
-        else:
-            print(f'{file_name}.csv does not exist. Creating a new one.')
-            print(f'If you have an existing {file_name}.csv data, move it to the geocoder directory.')
-            df = pd.DataFrame(columns=columns)
-            df.to_csv(path, index=False)
-            return pd.DataFrame(columns=columns)
+        Files are only imported into empty tables, so this is a no-op after the first import.
+        The CSV files are left in place.
+        """
+
+        files = {
+            'located_addresses': 'addresses',
+            'failed_addresses': 'addresses',
+            'located_coordinates': 'coordinates',
+            'failed_coordinates': 'coordinates',
+        }
+
+        tables = {table for table in files.values() if self.store.empty(table)}
+        for file_name, table in files.items():
+            path = ROOT / 'geocoder' / f'{file_name}.csv'
+            if table not in tables or not path.exists():
+                continue
+
+            df = pd.read_csv(path)
+            if df.empty:
+                continue
+
+            # Coordinates are read back from CSV as strings such as '(-104.98, 39.74)'
+            if table == 'coordinates':
+                df['Coordinates'] = [parse_coordinates(value) for value in df['Coordinates']]
+            else:
+                df['Coordinates'] = None
+                located = df['Longitude'].notna()
+                df.loc[located, 'Coordinates'] = pd.Series(
+                    list(zip(df.loc[located, 'Longitude'], df.loc[located, 'Latitude'])),
+                    index=df.index[located], dtype=object)
+            if file_name.startswith('located'):
+                df['Status'] = 'located'
+            elif 'Status' not in df.columns:
+                df['Status'] = 'no_match'
+
+            self.store.upsert(table, df)
+            print(f'Imported {len(df):,} results from {file_name}.csv into the result store.')
 
     def add_data(self, data):
         """
@@ -130,6 +254,7 @@ class Geocoder:
                 raise ValueError('Data must contain an Address or Coordinates column.')
 
             self.data = data.copy()
+            self._merged_columns = None
 
         # Raise an error if data is not a pandas dataframe
         else:
@@ -179,7 +304,7 @@ class Geocoder:
                 print('Data must be a pandas dataframe, series, or list.')
                 return None
 
-    def forward(self, addresses=None, verbose=False):
+    def forward(self, addresses=None, verbose=False, engine='batch', geographies=False, n_workers=None):
         """
         Conduct forward geocoding on the provided addresses.
 
@@ -189,6 +314,78 @@ class Geocoder:
             Uses addresses stored in the instance if not provided.
         verbose : bool, optional
             Print progress to console. Default is False.
+        engine : str, optional
+            How requests are sent to the Census Geocoder:
+            - 'batch' uploads addresses in chunks of up to 10,000 to the batch endpoint.
+            - 'request' sends one request per address.
+            Default is 'batch'.
+        geographies : bool, optional
+            Request the census geographies of each address in the same request as its coordinates and add them
+            to located_coordinates, so the located coordinates do not need to be reverse geocoded.
+            The batch endpoint does not return geography names, so this always sends one request per address.
+            Default is False.
+        n_workers : int, optional
+            Number of worker processes to geocode in. Addresses are hash-partitioned across the workers and their
+            results are merged into the result store. See `sharded_geocode`. Default uses a single process.
+
+        Raises
+        ------
+        ValueError: If no addresses are provided to instance.
+        ValueError: If no addresses are successfully geocoded.
+        ValueError: If engine is neither 'batch' nor 'request'.
+        """
+
+        if engine not in ['batch', 'request']:
+            raise ValueError('engine must be either "batch" or "request"')
+
+        addresses = self._pending_addresses(addresses, verbose=verbose)
+
+        # Return early if every address has already been geocoded
+        if not addresses:
+            with self._phase('forward.results'):
+                self._add_forward_coordinates()
+            return None
+
+        # Batch geocoder, saving results to the store as they complete so an interrupted run can resume
+        checkpoint_options = {'checkpoint_size': self.checkpoint_size, 'checkpoint_interval': self.checkpoint_interval}
+        with self._phase('forward.geocode', inputs=len(addresses)):
+            if n_workers is not None:
+                sharded_geocode(addresses, self.store, direction='combined' if geographies else 'forward',
+                                n_workers=n_workers, engine=engine, verbose=verbose)
+                located_df = self.store.lookup('addresses', addresses)
+                failed_df = self.store.lookup('addresses', addresses, located=False)
+                if geographies:
+                    coordinates = located_df['Coordinates'].drop_duplicates().tolist()
+                    self._add_located_coordinates(self.store.lookup('coordinates', coordinates), saved=True)
+            elif geographies:
+                combined_df, failed_df = batch_geocode(data=addresses, direction='combined',
+                                                       checkpoint=self._checkpoint('combined'), **checkpoint_options)
+                located_df = combined_df[FORWARD_COLUMNS]
+                failed_df = failed_df[FORWARD_COLUMNS + STATUS_COLUMNS]
+                self._add_located_coordinates(combined_df.dropna(subset=['Census Tract'])[REVERSE_COLUMNS],
+                                              saved=True)
+            elif engine == 'batch':
+                located_df, failed_df = bulk_geocode(data=addresses, checkpoint=self._checkpoint('forward'))
+            else:
+                located_df, failed_df = batch_geocode(data=addresses, direction='forward',
+                                                      checkpoint=self._checkpoint('forward'), **checkpoint_options)
+
+        with self._phase('forward.results', located=len(located_df), failed=len(failed_df)):
+            self._add_forward_results(located_df, failed_df, verbose=verbose, saved=True)
+        self.save_data()
+
+    async def forward_async(self, addresses=None, verbose=False, concurrency=1000):
+        """
+        Conduct forward geocoding on the provided addresses without blocking the running event loop.
+
+        Parameters
+        ----------
+        addresses : pd.DataFrame, pd.Series, optional
+            Uses addresses stored in the instance if not provided.
+        verbose : bool, optional
+            Print progress to console. Default is False.
+        concurrency : int, optional
+            Maximum number of requests in flight. Default is 1000.
 
         Raises
         ------
@@ -196,6 +393,23 @@ class Geocoder:
         ValueError: If no addresses are successfully geocoded.
         """
 
+        addresses = self._pending_addresses(addresses, verbose=verbose)
+
+        # Return early if every address has already been geocoded
+        if not addresses:
+            self._add_forward_coordinates()
+            return None
+
+        # Async batch geocoder, saving results to the store without blocking the event loop
+        located_df, failed_df = await batch_geocode_async(data=addresses, direction='forward', concurrency=concurrency)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.store.save_results, 'forward', located_df, failed_df)
+
+        self._add_forward_results(located_df, failed_df, verbose=verbose, saved=True)
+        await loop.run_in_executor(None, self.save_data)
+
+    def _pending_addresses(self, addresses=None, verbose=False):
+        """ Return the set of addresses that have not been geocoded yet. """
         # Add addresses to self.addresses if given
         if addresses is not None:
             self.add_addresses(addresses)
@@ -204,13 +418,14 @@ class Geocoder:
             raise ValueError('No addresses were provided to Geocoder instance. Forward geocoding failed.'
                              'Please add addresses to Geocoder instance or provide addresses to forward() method.')
 
-        # Load addresses from self.addresses and convert to set
-        addresses = set(self.addresses)
+        # Load addresses from self.addresses and convert to a set of cache keys
+        with self._phase('forward.keys', rows=len(self.addresses)):
+            addresses = {address for address in self._address_keys(self.addresses).dropna() if address}
+        if self.refresher is not None:
+            self.refresher.touch('addresses', addresses)
         # Remove any addresses that have already been geocoded
-        located_addresses = self.located_addresses['Address'].values
-        failed_addresses = self.failed_addresses['Address'].values
-        for seen_addresses in [located_addresses, failed_addresses]:
-            addresses = addresses.difference(seen_addresses)
+        with self._phase('forward.dedupe', keys=len(addresses)):
+            addresses = set(self.store.missing('addresses', addresses))
 
         # Print the number of addresses to be geocoded
         if verbose:
@@ -218,33 +433,39 @@ class Geocoder:
             number_of_addresses = f'{number_of_addresses:,}'
             print(f'Geocoding {number_of_addresses} addresses...')
 
-        # Batch geocoder
-        located_df, failed_df = batch_geocode(data=addresses, direction='forward', n_threads=100)
+        return addresses
+
+    def _address_keys(self, addresses):
+        """ Return the cache keys of addresses, which are their canonical form if normalization is enabled. """
+        addresses = pd.Series(list(addresses), dtype=object)
+        if self.normalize:
+            addresses = normalize_addresses(addresses)
+        return addresses
+
+    def _checkpoint(self, direction):
+        """ Return a callback that saves batch results to the result store as they complete. """
+        def checkpoint(located_df, failed_df):
+            self.store.save_results(direction, located_df, failed_df)
+
+        return checkpoint
+
+    def _add_forward_results(self, located_df, failed_df, verbose=False, saved=False):
+        """ Add forward geocoding results to self.located_addresses and self.failed_addresses. """
+        # Only failed results keep the failure class and number of attempts
+        located_df = located_df.drop(columns=STATUS_COLUMNS, errors='ignore')
+        if not saved:
+            self._unsaved += [('addresses', located_df), ('addresses', failed_df)]
 
-        # Add geocoding results to self.located_addresses and self.failed_addresses
         # Raise an error if no addresses were successfully geocoded
         if located_df.empty:
             raise ValueError('No addresses were successfully geocoded. Review Geocoder.addresses.')
-        # If self.located_addresses is empty, set it to located_df
-        elif self.located_addresses.empty:
-            self.located_addresses = located_df.copy()
-        # Otherwise, concatenate located_df to self.located_addresses
-        else:
-            self.located_addresses = pd.concat([self.located_addresses, located_df], ignore_index=True)
-
-        # Pass if failed_df is empty
-        if failed_df.empty:
-            pass
-        # If self.failed_addresses is empty, set it to failed_df
-        elif self.failed_addresses.empty:
-            self.failed_addresses = failed_df.copy()
-        # Otherwise, concatenate failed_df to self.failed_addresses
-        else:
-            self.failed_addresses = pd.concat([self.failed_addresses, failed_df], ignore_index=True)
+
+        self._drop_retried('addresses', [located_df, failed_df])
+        self._append_results('located_addresses', located_df, saved)
+        self._append_results('failed_addresses', failed_df, saved)
 
         # Add geocoding results to self.coordinates if not already there
-        if self.coordinates is None:
-            self.add_coordinates(self.located_addresses)
+        self._add_forward_coordinates()
 
         # Print the number of addresses located and failed addresses
         if verbose:
@@ -257,11 +478,56 @@ class Geocoder:
             print(f' - {number_of_located_addresses} addresses were located')
             print(f' - {number_of_failed_addresses} addresses failed')
 
+    def reverse(self, coordinates=None, verbose=False, n_workers=None, backend=None):
+        """
+        Conduct reverse geocoding on the provided coordinates.
+
+        Parameters
+        ----------
+        coordinates : pd.DataFrame, pd.Series, optional
+            Uses coordinates stored in the instance if not provided.
+        verbose : bool, optional
+            Print progress to console. Default is False.
+        n_workers : int, optional
+            Number of worker processes to geocode in. See `forward`. Default uses a single process.
+        backend : LocalReverseGeocoder, optional
+            Look up census geographies in local boundary files instead of sending requests to the Census Geocoder.
+            Results have the same columns and are cached the same way. Default sends requests.
+
+        Raises
+        ------
+        ValueError: If no coordinates are provided to instance.
+        ValueError: If no coordinates are successfully geocoded.
+        """
+
+        coordinates = self._pending_coordinates(coordinates, verbose=verbose)
+
+        # Return early if every coordinate has already been geocoded
+        if not coordinates:
+            return None
+
+        # Batch geocoder, saving results to the store as they complete so an interrupted run can resume
+        with self._phase('reverse.geocode', inputs=len(coordinates)):
+            if backend is not None:
+                located_df, failed_df = backend.reverse(coordinates)
+                self.store.save_results('reverse', located_df, failed_df)
+            elif n_workers is not None:
+                sharded_geocode(coordinates, self.store, direction='reverse', n_workers=n_workers, verbose=verbose)
+                located_df = self.store.lookup('coordinates', coordinates)
+                failed_df = self.store.lookup('coordinates', coordinates, located=False)
+            else:
+                located_df, failed_df = batch_geocode(data=coordinates, direction='reverse',
+                                                      checkpoint=self._checkpoint('reverse'),
+                                                      checkpoint_size=self.checkpoint_size,
+                                                      checkpoint_interval=self.checkpoint_interval)
+
+        with self._phase('reverse.results', located=len(located_df), failed=len(failed_df)):
+            self._add_reverse_results(located_df, failed_df, verbose=verbose, saved=True)
         self.save_data()
 
-    def reverse(self, coordinates=None, verbose=False):
+    async def reverse_async(self, coordinates=None, verbose=False, concurrency=1000):
         """
-        Conduct reverse geocoding on the provided coordinates.
+        Conduct reverse geocoding on the provided coordinates without blocking the running event loop.
 
         Parameters
         ----------
@@ -269,6 +535,8 @@ class Geocoder:
             Uses coordinates stored in the instance if not provided.
         verbose : bool, optional
             Print progress to console. Default is False.
+        concurrency : int, optional
+            Maximum number of requests in flight. Default is 1000.
 
         Raises
         ------
@@ -276,6 +544,23 @@ class Geocoder:
         ValueError: If no coordinates are successfully geocoded.
         """
 
+        coordinates = self._pending_coordinates(coordinates, verbose=verbose)
+
+        # Return early if every coordinate has already been geocoded
+        if not coordinates:
+            return None
+
+        # Async batch geocoder, saving results to the store without blocking the event loop
+        located_df, failed_df = await batch_geocode_async(data=coordinates, direction='reverse',
+                                                          concurrency=concurrency)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.store.save_results, 'reverse', located_df, failed_df)
+
+        self._add_reverse_results(located_df, failed_df, verbose=verbose, saved=True)
+        await loop.run_in_executor(None, self.save_data)
+
+    def _pending_coordinates(self, coordinates=None, verbose=False):
+        """ Return the set of coordinates that have not been reverse geocoded yet. """
         # Add coordinates to self.coordinates if given
         if coordinates is not None:
             self.add_coordinates(coordinates)
@@ -285,14 +570,17 @@ class Geocoder:
             raise ValueError('No coordinates were provided to Geocoder instance. Reverse geocoding failed.'
                              'Please add coordinates to Geocoder instance or provide coordinates to reverse() method.')
 
-        # Load coordinates from self.coordinates and convert to set
-        coordinates = set(self.coordinates)
-        
-        # Remove any coordinates that have already been geocoded
-        located_coordinates = self.located_coordinates['Coordinates'].values
-        failed_coordinates = self.failed_coordinates['Coordinates'].values
-        for seen_coordinates in [located_coordinates, failed_coordinates]:
-            coordinates = coordinates.difference(seen_coordinates)
+        # Parse coordinates from self.coordinates, which may be read from CSV as strings
+        with self._phase('reverse.keys', rows=len(self.coordinates)):
+            positions = coordinates_array(self.coordinates)
+            coordinates = [(longitude, latitude)
+                           for longitude, latitude in positions[~np.isnan(positions).any(axis=1)]]
+        if self.refresher is not None:
+            self.refresher.touch('coordinates', coordinates)
+
+        # Remove any coordinates whose grid cell has already been geocoded, and keep one per grid cell
+        with self._phase('reverse.dedupe', keys=len(coordinates)):
+            coordinates = set(self.store.missing('coordinates', coordinates))
 
         # Print the number of coordinates to be geocoded
         if verbose:
@@ -300,29 +588,22 @@ class Geocoder:
             number_of_coordinates = f'{number_of_coordinates:,}'
             print(f'Reverse geocoding {number_of_coordinates} coordinates...')
 
-        # Batch geocoder
-        located_df, failed_df = batch_geocode(data=coordinates, direction='reverse', n_threads=100)
+        return coordinates
+
+    def _add_reverse_results(self, located_df, failed_df, verbose=False, saved=False):
+        """ Add reverse geocoding results to self.located_coordinates and self.failed_coordinates. """
+        # Only failed results keep the failure class and number of attempts
+        located_df = located_df.drop(columns=STATUS_COLUMNS, errors='ignore')
+        if not saved:
+            self._unsaved += [('coordinates', located_df), ('coordinates', failed_df)]
 
-        # Add geocoding results to self.located_coordinates and self.failed_coordinates
         # Raise an error if no coordinates were successfully geocoded
         if located_df.empty:
             raise ValueError('No coordinates were successfully geocoded. Review Geocoder.coordinates data.')
-        # If self.located_coordinates is None, set it to located_df
-        elif self.located_coordinates is None:
-            self.located_coordinates = located_df.copy()
-        # Otherwise, concatenate located_df to self.located_coordinates
-        else:
-            self.located_coordinates = pd.concat([self.located_coordinates, located_df], ignore_index=True)
-
-        # Pass if failed_df is empty
-        if failed_df.empty:
-            pass
-        # If self.failed_coordinates is None, set it to failed_df
-        elif self.failed_coordinates is None:
-            self.failed_coordinates = failed_df.copy()
-        # Otherwise, concatenate failed_df to self.failed_coordinates
-        else:
-            self.failed_coordinates = pd.concat([self.failed_coordinates, failed_df], ignore_index=True)
+
+        self._drop_retried('coordinates', [located_df, failed_df])
+        self._append_results('located_coordinates', located_df, saved)
+        self._append_results('failed_coordinates', failed_df, saved)
 
         # Print the number of coordinates located and failed coordinates
         if verbose:
@@ -334,8 +615,131 @@ class Geocoder:
             print('Reverse geocoding complete')
             print(f' - {number_of_located_coordinates} coordinates were located')
             print(f' - {number_of_failed_coordinates} coordinates failed')
-        
-        self.save_data()
+
+    def forward_reverse(self, addresses=None, verbose=False, engine='request', forward_threads=None,
+                        reverse_threads=None, queue_size=1000):
+        """
+        Conduct forward and reverse geocoding in overlapping stages.
+
+        The coordinates of each located address go straight into a bounded queue of a reverse geocoding stage while
+        forward geocoding continues, so the time taken is close to the longer of the two stages rather than their
+        sum. See `pipelined_geocode`. Coordinates the stages did not cover, such as those of addresses located in an
+        earlier run, are then reverse geocoded as in `reverse`.
+
+        Parameters
+        ----------
+        addresses : pd.DataFrame, pd.Series, optional
+            Uses addresses stored in the instance if not provided.
+        verbose : bool, optional
+            Print progress to console. Default is False.
+        engine : str, optional
+            'request' to send one request per address, so coordinates are queued as each address is located, or
+            'batch' to upload addresses to the batch endpoint, so coordinates are queued one chunk of up to 10,000
+            at a time. Default is 'request'.
+        forward_threads : int, optional
+            Maximum number of forward requests in flight. See `pipelined_geocode`.
+        reverse_threads : int, optional
+            Maximum number of reverse requests in flight. See `pipelined_geocode`.
+        queue_size : int, optional
+            Maximum number of coordinates waiting to be reverse geocoded. Default is 1000.
+
+        Raises
+        ------
+        ValueError: If no addresses are provided to instance.
+        ValueError: If no addresses are successfully geocoded.
+        ValueError: If engine is neither 'batch' nor 'request'.
+        """
+
+        if engine not in ['batch', 'request']:
+            raise ValueError('engine must be either "batch" or "request"')
+
+        addresses = self._pending_addresses(addresses, verbose=verbose)
+
+        if addresses:
+            with self._phase('pipeline.geocode', inputs=len(addresses)):
+                coordinates = pipelined_geocode(addresses, self.store, engine=engine,
+                                                forward_threads=forward_threads, reverse_threads=reverse_threads,
+                                                queue_size=queue_size, checkpoint_size=self.checkpoint_size,
+                                                checkpoint_interval=self.checkpoint_interval)
+
+            with self._phase('pipeline.results'):
+                located_df = self.store.lookup('addresses', addresses)
+                failed_df = self.store.lookup('addresses', addresses, located=False)
+                self._add_forward_results(located_df, failed_df, verbose=verbose, saved=True)
+                if coordinates:
+                    self._add_reverse_results(self.store.lookup('coordinates', coordinates),
+                                              self.store.lookup('coordinates', coordinates, located=False),
+                                              verbose=verbose, saved=True)
+            self.save_data()
+        else:
+            self._add_forward_coordinates()
+
+        # Reverse geocode coordinates that were not queued, which costs no requests if there are none
+        self.reverse(verbose=verbose)
+
+    def _add_located_coordinates(self, located_df, saved=False):
+        """ Add coordinates located by a combined forward request to self.located_coordinates. """
+        # Saved results are included when the table is loaded
+        if saved and 'located_coordinates' not in self._results:
+            return None
+
+        # Skip coordinates whose grid cell has already been reverse geocoded
+        positions = result_coordinates(self.located_coordinates)
+        seen_keys = coordinates_keys(positions[:, 0], positions[:, 1], self.store.grid)
+        located_keys = pd.Series(self.store.keys('coordinates', located_df['Coordinates']), index=located_df.index)
+        located_df = located_df[~located_keys.isin(seen_keys)]
+        if located_df.empty:
+            return None
+
+        if not saved:
+            self._unsaved.append(('coordinates', located_df))
+        self._append_results('located_coordinates', located_df, saved=False)
+
+    def _append_results(self, name, df, saved):
+        """
+        Append results to self.located_addresses, self.failed_addresses, self.located_coordinates, or
+        self.failed_coordinates. Results already saved to the store are skipped if the table has not been loaded
+        yet, since they are included when it is loaded.
+        """
+
+        if df.empty or (saved and name not in self._results):
+            return None
+
+        results = getattr(self, name)
+        if self.compact:
+            setattr(self, name, concat_results([results, compact_results(df)]))
+        else:
+            setattr(self, name, df.copy() if results.empty else pd.concat([results, df], ignore_index=True))
+
+    def _drop_retried(self, table, results):
+        """
+        Drop loaded failed results of inputs that have new results, such as transient failures that were retried,
+        so each input keeps a single result.
+        """
+
+        name = f'failed_{table}'
+        failed = self._results.get(name)
+        if failed is None or failed.empty:
+            return None
+
+        def keys(df):
+            return self.store.keys(table, df['Address'] if table == 'addresses' else result_coordinates(df))
+
+        new_keys = {key for df in results if not df.empty for key in keys(df) if key is not None}
+        retried = pd.Series(keys(failed), dtype=object).isin(new_keys).to_numpy()
+        if retried.any():
+            self._results[name] = failed[~retried].reset_index(drop=True)
+
+    def _add_forward_coordinates(self):
+        """ Add the located coordinates of self.addresses to self.coordinates for reverse geocoding, if not set. """
+        if self.coordinates is not None or self.addresses is None:
+            return None
+
+        # Only look up the addresses of this instance instead of loading every located address
+        keys = self._address_keys(self.addresses).dropna().unique()
+        located_df = self.store.lookup('addresses', keys, columns=['Coordinates'])
+        if not located_df.empty:
+            self.add_coordinates(located_df)
 
     def merge_data(self, data=None, verbose=False):
         """
@@ -361,28 +765,57 @@ class Geocoder:
             raise ValueError('No data was provided to Geocoder instance. Data merge failed.'
                              'Please add data to Geocoder instance or provide data to merge_data() method.')
 
-        # Merge data
-        if 'Coordinates' in self.data.columns:
-            if self.located_coordinates is None:
-                raise ValueError('No coordinates have been successfully geocoded. Data merge failed.'
-                                 'Please run reverse() method to reverse geocode coordinate data.')
+        # Remove the results of a previous merge, so merging again replaces them instead of adding them twice
+        if self._merged_columns is not None:
+            renames, result_columns = self._merged_columns
+            self.data = self.data.drop(columns=result_columns).rename(columns={v: k for k, v in renames.items()})
+            self._merged_columns = None
 
-            self.data = self.data.merge(self.located_coordinates, how='left', on='Coordinates')
+        # Join data with its results on hashed keys, from addresses to coordinates to geographies in one pass
+        if 'Coordinates' in self.data.columns:
+            # Keep the original coordinates of the data, which may differ from the cached ones within a grid cell
+            with self._phase('merge.lookup'):
+                located_coordinates = self._located_results('located_coordinates', 'coordinates',
+                                                            self.data['Coordinates'].dropna())
+            with self._phase('merge.join', rows=len(self.data)):
+                renames, results = join_columns(self.data, located_coordinates=located_coordinates,
+                                                grid=self.store.grid)
 
         elif 'Address' in self.data.columns:
-            if self.located_addresses is None:
-                raise ValueError('No addresses have been successfully geocoded. Data merge failed.'
-                                 'Please run forward() method to geocode address data.')
+            # Join on the cache key of each address, keeping the original address
+            with self._phase('merge.keys', rows=len(self.data)):
+                address_keys = self._address_keys(self.data['Address'])
+            with self._phase('merge.lookup'):
+                located_addresses = self._located_results('located_addresses', 'addresses',
+                                                          address_keys.dropna().unique())
+                located_coordinates = self._located_results('located_coordinates', 'coordinates',
+                                                            result_coordinates(located_addresses))
+            with self._phase('merge.join', rows=len(self.data)):
+                renames, results = join_columns(self.data, located_addresses, located_coordinates,
+                                                address_keys=address_keys.values, grid=self.store.grid)
 
-            self.data = self.data.merge(self.located_addresses, how='left', on='Address')
+        else:
+            raise ValueError('Data must contain an Address or Coordinates column.')
 
-            if self.located_coordinates is not None:
-                self.data = self.data.merge(self.located_coordinates, how='left', on='Coordinates')
+        with self._phase('merge.concat'):
+            self.data = pd.concat([self.data.rename(columns=renames), results], axis=1)
+        self._merged_columns = (renames, list(results.columns))
 
         if verbose:
             print('Data merge complete')
 
-    def process(self, forward=True, reverse=True, merge=True, data=None, verbose=False):
+    def _located_results(self, name, table, values):
+        """
+        Return the located results of a table for the given values. If the table has not been loaded yet, only the
+        rows of the values are read from the store instead of loading the whole table.
+        """
+
+        if name in self._results:
+            return self._results[name]
+        return self.store.lookup(table, values)
+
+    def process(self, forward=True, reverse=True, merge=True, data=None, verbose=False, combined=False,
+                n_workers=None, reverse_backend=None, pipelined=False):
         """
         Process data by conducting forward and reverse geocoding and merging the results.
 
@@ -398,6 +831,19 @@ class Geocoder:
             Data to be processed.
         verbose : bool, optional
             Print progress to console. Default is False.
+        combined : bool, optional
+            When both forward and reverse are True, request the coordinates and census geographies of each address
+            in a single request. Reverse geocoding then only covers coordinates that were not located this way.
+            Default is False.
+        n_workers : int, optional
+            Number of worker processes for forward and reverse geocoding. See `forward`.
+            Default uses a single process.
+        reverse_backend : LocalReverseGeocoder, optional
+            Reverse geocode offline with local boundary files. See `reverse`. Default sends requests.
+        pipelined : bool, optional
+            When both forward and reverse are True, reverse geocode the coordinates of located addresses while
+            forward geocoding continues, sending one request per address. See `forward_reverse`. Cannot be combined
+            with `combined`, `n_workers`, or `reverse_backend`. Default is False.
 
         Returns
         -------
@@ -405,45 +851,72 @@ class Geocoder:
             Data with geocoding results if merge=True.
         """
 
-        if data is not None:
-            self.add_data(data)
+        if pipelined and (combined or n_workers is not None or reverse_backend is not None):
+            raise ValueError('pipelined cannot be used with combined, n_workers, or reverse_backend')
 
-        if forward:
-            self.forward(verbose=verbose)
-            if verbose:
-                print()
-        if reverse:
-            self.reverse(verbose=verbose)
-            if verbose:
-                print()
-        if merge:
-            self.merge_data(verbose=verbose)
-            if verbose:
-                print()
+        with self._phase('process'):
+            if data is not None:
+                with self._phase('add_data', rows=len(data)):
+                    self.add_data(data)
+
+            if pipelined and forward and reverse:
+                with self._phase('pipeline'):
+                    self.forward_reverse(verbose=verbose)
+                if verbose:
+                    print()
+            else:
+                if forward:
+                    with self._phase('forward'):
+                        self.forward(verbose=verbose, geographies=combined and reverse, n_workers=n_workers)
+                    if verbose:
+                        print()
+                if reverse:
+                    with self._phase('reverse'):
+                        self.reverse(verbose=verbose, n_workers=n_workers, backend=reverse_backend)
+                    if verbose:
+                        print()
+            if merge:
+                with self._phase('merge'):
+                    self.merge_data(verbose=verbose)
+                if verbose:
+                    print()
 
         if verbose:
             print('Processing complete')
+            if self.profiler is not None:
+                print()
+                print(self.profile.summary())
 
         if merge:
             return self.data
 
     def save_data(self):
-        """ Save geocoding results to CSV files. """
-        self.located_addresses.to_csv(ROOT / 'geocoder/located_addresses.csv', index=False)
-        self.failed_addresses.to_csv(ROOT / 'geocoder/failed_addresses.csv', index=False)
-        self.located_coordinates.to_csv(ROOT / 'geocoder/located_coordinates.csv', index=False)
-        self.failed_coordinates.to_csv(ROOT / 'geocoder/failed_coordinates.csv', index=False)
+        """
+        Save new geocoding results to the result store. Only results added since the last save are written.
+        The key index of the store is saved too, so the next `Geocoder` can reload it instead of rebuilding it.
+        """
 
-    def delete_data(self, records='failed', time=365):
+        unsaved, self._unsaved = self._unsaved, []
+        with self._phase('save', tables=len(unsaved)):
+            for table, df in unsaved:
+                self.store.upsert(table, df)
+            self.store.save_index()
+
+    def delete_data(self, records='failed', time=365, confirm=True):
         """
         Filter out geocoding results older than the specified time.
 
+        Deleted results are geocoded again the next time they are needed. To renew old results without losing them
+        in the meantime, use `start_refresh` instead.
+
         Parameters
         ----------
         records : str, optional
             Type of records to filter. Options are 'failed', 'located', or 'all'. Default is 'failed'.
         time : int or str, optional
             Number of days to keep geocoding results. Can also be 'week', 'month', 'year', or 'all'. Default is 365.
+        confirm : bool, optional
+            Ask for confirmation before deleting. Set to False in scripts and pipelines. Default is True.
 
         Raises
         ------
@@ -463,27 +936,27 @@ class Geocoder:
             print("Time must be an integer or one of 'week', 'month', 'year', or 'all'.")
             return None
 
-        # Define a dictionary to store references to the relevant attributes
-        data_refs = {
-            'located_addresses': self.located_addresses,
-            'failed_addresses': self.failed_addresses,
-            'located_coordinates': self.located_coordinates,
-            'failed_coordinates': self.failed_coordinates
-        }
-
-        filtered_data = {}
-
         # Determine which records to filter
+        names = ['located_addresses', 'failed_addresses', 'located_coordinates', 'failed_coordinates']
         if records == 'all':
-            keys = data_refs.keys()
+            keys = names
         elif records in ['located', 'failed']:
-            keys = [key for key in data_refs.keys() if records in key]
+            keys = [key for key in names if records in key]
         else:
             raise ValueError("Records must be 'all', 'located', or 'failed'.")
 
-        # Filter the data
+        # Use the loaded results, or only read the key and date columns of results that have not been loaded
+        data_refs = {}
         for key in keys:
-            filtered_data[key] = data_refs[key][data_refs[key]['Date'] > cutoff_date]
+            table, column = ('addresses', 'Address') if 'addresses' in key else ('coordinates', 'Coordinates')
+            data_refs[key] = self._results[key] if key in self._results else self.store.load(
+                table, located=key.startswith('located'), columns=[column, 'Date'])
+
+        filtered_data = {}
+
+        # Filter the data, parsing the stored 'YYYY-MM-DD' strings before comparing them with the cutoff
+        for key in keys:
+            filtered_data[key] = data_refs[key][pd.to_datetime(data_refs[key]['Date']) > cutoff_date]
 
         # Display the number of records to be deleted
         print('Deleting data...')
@@ -494,11 +967,55 @@ class Geocoder:
         print('This cannot be undone.')
 
         # Confirm the deletion with the user
-        confirmation = input('Would you like to continue? (y/n) ')
+        confirmation = input('Would you like to continue? (y/n) ') if confirm else 'y'
         if confirmation == 'y':
-            for key in keys:
-                setattr(self, key, filtered_data[key])
             self.save_data()
+            for key in keys:
+                table, column = ('addresses', 'Address') if 'addresses' in key else ('coordinates', 'Coordinates')
+                deleted = data_refs[key][~data_refs[key].index.isin(filtered_data[key].index)]
+                self.store.delete(table, deleted['Address'] if column == 'Address' else result_coordinates(deleted))
+                if key in self._results:
+                    setattr(self, key, filtered_data[key])
             print('Data deletion complete.')
         else:
             print('Aborting data deletion.')
+
+    def start_refresh(self, ttl=365, failed_ttl=30, batch_size=100, interval=1.0, n_threads=2):
+        """
+        Refresh stale results in the background, starting with the addresses and coordinates requested most recently.
+
+        Results older than `ttl` days, failed results older than `failed_ttl` days, and results made with another
+        benchmark or vintage are geocoded again in small batches on a background thread. Stale results are kept in
+        the store until their new result replaces them. Results already loaded into this instance are not updated;
+        new results are read from the store by later lookups and instances. See `RefreshScheduler`.
+
+        Parameters
+        ----------
+        ttl : float, optional
+            Days after which a located result is refreshed. Default is 365.
+        failed_ttl : float, optional
+            Days after which a failed result is tried again. Default is 30.
+        batch_size : int, optional
+            Maximum number of inputs refreshed per batch. Default is 100.
+        interval : float, optional
+            Minimum number of seconds between batches. Default is 1.
+        n_threads : int, optional
+            Maximum number of refresh requests in flight. Default is 2.
+
+        Returns
+        -------
+        RefreshScheduler
+            The running scheduler, also available as `refresher`.
+        """
+
+        self.stop_refresh()
+        self.refresher = RefreshScheduler(self.store, ttl=ttl, failed_ttl=failed_ttl, batch_size=batch_size,
+                                          interval=interval, n_threads=n_threads)
+        self.refresher.start()
+        return self.refresher
+
+    def stop_refresh(self):
+        """ Stop refreshing stale results in the background, waiting for the current batch to finish. """
+        if self.refresher is not None:
+            self.refresher.stop()
+            self.refresher = None
@@ -0,0 +1,150 @@
+import os
+import numpy as np
+import pandas as pd
+
+# The delta of recent keys is merged into the base once it holds more than this fraction of the base
+MERGE_FRACTION = 0.125
+MIN_MERGE_SIZE = 4096
+
+
+def key_hashes(keys):
+    """
+    Return 64-bit hashes of store keys.
+
+    Parameters
+    ----------
+    keys : iterable of str
+        Store keys, such as those from `ResultStore.keys`. Keys must not be missing.
+
+    Returns
+    -------
+    np.ndarray
+        The uint64 hash of each key.
+    """
+
+    keys = np.asarray(list(keys), dtype=object)
+    if len(keys) == 0:
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_array(keys, categorize=False)
+
+
+def _contains(sorted_hashes, hashes):
+    """ Return whether each hash is in a sorted array of hashes. """
+    if len(sorted_hashes) == 0:
+        return np.zeros(len(hashes), dtype=bool)
+    positions = np.searchsorted(sorted_hashes, hashes)
+    return sorted_hashes[np.minimum(positions, len(sorted_hashes) - 1)] == hashes
+
+
+class KeyIndex:
+    """
+    A set of 64-bit key hashes that answers membership for a batch of keys without touching the rest of the set.
+
+    Hashes are kept in two sorted arrays: a large base that is written to disk as is and can be memory-mapped back,
+    and a small delta of recently added hashes. Lookups are binary searches in both arrays, so checking n keys costs
+    O(n log m) for m indexed keys, and adding keys only re-sorts the delta. The delta is merged into the base once it
+    grows past a fraction of it, so the cost of merging is amortized over the keys added.
+
+    Two different keys can share a hash, so a key found in the index might not be in the store. With 64-bit hashes
+    this is vanishingly rare: about one key in 10^12 for an index of 10 million keys. `ResultStore` confirms the
+    keys found in the index in the database, so a collision costs a lookup rather than a wrong answer.
+
+    Parameters
+    ----------
+    hashes : np.ndarray, optional
+        Hashes to start with, such as those of every key in a store table. Default is an empty index.
+    """
+
+    def __init__(self, hashes=None):
+        self._base = np.unique(np.asarray(hashes if hashes is not None else [], dtype=np.uint64))
+        self._delta = np.empty(0, dtype=np.uint64)
+        self._removed = np.empty(0, dtype=np.uint64)
+        self.base_saved = False
+
+    def __len__(self):
+        return len(self._base) + len(self._delta) - len(self._removed)
+
+    def contains(self, hashes):
+        """ Return a boolean array that is True for each hash in the index. """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        found = _contains(self._base, hashes) | _contains(self._delta, hashes)
+        if len(self._removed):
+            found &= ~_contains(self._removed, hashes)
+        return found
+
+    def add(self, hashes):
+        """ Add hashes to the index. """
+        hashes = np.unique(np.asarray(hashes, dtype=np.uint64))
+        if len(self._removed):
+            self._removed = np.setdiff1d(self._removed, hashes, assume_unique=True)
+        hashes = hashes[~(_contains(self._base, hashes) | _contains(self._delta, hashes))]
+        if len(hashes) == 0:
+            return None
+
+        self._delta = np.union1d(self._delta, hashes)
+        if len(self._delta) > max(MIN_MERGE_SIZE, MERGE_FRACTION * len(self._base)):
+            self._merge()
+
+    def remove(self, hashes):
+        """ Remove hashes from the index. """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        hashes = np.unique(hashes[self.contains(hashes)])
+        self._removed = np.union1d(self._removed, hashes)
+        if len(self._removed) > max(MIN_MERGE_SIZE, MERGE_FRACTION * len(self._base)):
+            self._merge()
+
+    def _merge(self):
+        """ Merge the delta and the removed hashes into the base. """
+        base = np.union1d(self._base, self._delta)
+        if len(self._removed):
+            base = np.setdiff1d(base, self._removed, assume_unique=True)
+        self._base = base
+        self._delta = np.empty(0, dtype=np.uint64)
+        self._removed = np.empty(0, dtype=np.uint64)
+        self.base_saved = False
+
+    def save(self, path):
+        """
+        Write the index to `path`, a directory that is created if needed.
+
+        The base is only rewritten if it changed since it was last saved or loaded, so saving after adding a few keys
+        only writes the delta.
+        """
+
+        os.makedirs(path, exist_ok=True)
+        if not self.base_saved:
+            _save_array(os.path.join(path, 'base.npy'), self._base)
+            self.base_saved = True
+        _save_array(os.path.join(path, 'delta.npy'), self._delta)
+        _save_array(os.path.join(path, 'removed.npy'), self._removed)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an index written by `save`. The base is memory-mapped rather than read into memory.
+
+        Returns
+        -------
+        KeyIndex or None
+            The index, or None if it has not been saved to `path` or cannot be read.
+        """
+
+        try:
+            base = np.load(os.path.join(path, 'base.npy'), mmap_mode='r')
+            delta = np.load(os.path.join(path, 'delta.npy'))
+            removed = np.load(os.path.join(path, 'removed.npy'))
+        except (OSError, ValueError):
+            return None
+
+        index = cls()
+        index._base, index._delta, index._removed = base, delta, removed
+        index.base_saved = True
+        return index
+
+
+def _save_array(path, array):
+    """ Write an array to a .npy file, replacing the file in one step so readers never see a partial file. """
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        np.save(file, np.asarray(array))
+    os.replace(temporary, path)
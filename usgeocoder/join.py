@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+from .census_api import FORWARD_COLUMNS, REVERSE_COLUMNS
+from .schema import result_coordinates
+from .store import COORDINATE_GRID, address_hashes, coordinates_hashes
+
+# Columns added to the data by each join, without the column joined on
+ADDRESS_RESULT_COLUMNS = FORWARD_COLUMNS[1:]
+COORDINATES_RESULT_COLUMNS = REVERSE_COLUMNS[1:]
+
+
+def _rows(table_hashes, table_valid, hashes, valid):
+    """ Return the table row with the hash of each value, or -1 if there is none. The first matching row is used. """
+    rows = np.flatnonzero(table_valid)
+    index = pd.Index(table_hashes[table_valid])
+    if not index.is_unique:
+        unique = ~index.duplicated()
+        index, rows = index[unique], rows[unique]
+
+    if len(rows) == 0:
+        return np.full(len(hashes), -1)
+
+    positions = index.get_indexer(hashes)
+    return np.where((positions >= 0) & valid, rows[np.maximum(positions, 0)], -1)
+
+
+def _address_rows(located_addresses, address_keys):
+    """ Return the row of `located_addresses` of each address key, or -1 if there is none. """
+    # Repeated addresses are only hashed and looked up once
+    codes, uniques = pd.factorize(pd.Series(address_keys, dtype=object))
+    hashes, valid = address_hashes(uniques)
+    table_hashes, table_valid = address_hashes(located_addresses['Address'])
+    rows = _rows(table_hashes, table_valid, hashes, valid)
+    return np.where(codes >= 0, rows[np.maximum(codes, 0)], -1)
+
+
+def _coordinates_rows(located_coordinates, longitudes, latitudes, grid):
+    """ Return the row of `located_coordinates` in the grid cell of each point, or -1 if there is none. """
+    hashes, valid = coordinates_hashes(longitudes, latitudes, grid)
+    positions = result_coordinates(located_coordinates)
+    table_hashes, table_valid = coordinates_hashes(positions[:, 0], positions[:, 1], grid)
+    return _rows(table_hashes, table_valid, hashes, valid)
+
+
+def _take(table, columns, rows):
+    """
+    Return the given columns of the table rows, with missing values where a row is -1. Columns the table does not
+    have, such as 'Coordinates' of compact results, are skipped.
+    """
+
+    return {column: pd.api.extensions.take(table[column].array, rows, allow_fill=True)
+            for column in columns if column in table.columns}
+
+
+def _add_columns(columns, results):
+    """
+    Append result columns to a list of [name, values] columns. Names that are already taken get the suffixes '_x'
+    and '_y', the same as with `pd.DataFrame.merge`.
+    """
+
+    names = {column[0]: column for column in columns}
+    for name, values in results.items():
+        if name in names:
+            names[name][0] = f'{name}_x'
+            name = f'{name}_y'
+        columns.append([name, values])
+
+
+def join_columns(data, located_addresses=None, located_coordinates=None, address_keys=None, grid=COORDINATE_GRID):
+    """
+    Look up the geocoding results of each row of data by hashed keys.
+
+    Addresses are joined on a 64-bit hash of their cache key and coordinates on a 64-bit hash of their grid cell,
+    so no Python strings or tuples are hashed or compared. For address data, the located coordinates of each
+    address are joined with `located_coordinates` in the same pass.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Data with a 'Coordinates' column, or an 'Address' column.
+    located_addresses : pd.DataFrame, optional
+        Located forward geocoding results, keyed by 'Address'.
+    located_coordinates : pd.DataFrame, optional
+        Located reverse geocoding results, keyed by 'Coordinates', or by 'Longitude' and 'Latitude' if they are in
+        the compact schema of `compact_results`.
+    address_keys : iterable of str, optional
+        Cache key of each address of data, such as its canonical form. Default is the 'Address' column.
+    grid : float, optional
+        Grid spacing in degrees that coordinates are matched on. Default is `COORDINATE_GRID`.
+
+    Returns
+    -------
+    renames : dict
+        New names of the columns of data whose names are taken by result columns, such as {'State': 'State_x'}.
+    results : pd.DataFrame
+        The result columns, with the same index as `data`. Rows without a result have missing values.
+    """
+
+    columns = [[column, None] for column in data.columns]
+
+    if 'Coordinates' in data.columns:
+        if located_coordinates is not None:
+            positions = result_coordinates(data[['Coordinates']])
+            rows = _coordinates_rows(located_coordinates, positions[:, 0], positions[:, 1], grid)
+            _add_columns(columns, _take(located_coordinates, COORDINATES_RESULT_COLUMNS, rows))
+
+    elif located_addresses is not None:
+        rows = _address_rows(located_addresses, data['Address'] if address_keys is None else address_keys)
+        _add_columns(columns, _take(located_addresses, ADDRESS_RESULT_COLUMNS, rows))
+
+        # Continue from the row of each address to the geographies of its located coordinates
+        if located_coordinates is not None:
+            positions = result_coordinates(located_addresses)
+            address_coordinates_rows = _coordinates_rows(located_coordinates, positions[:, 0], positions[:, 1], grid)
+            if len(address_coordinates_rows):
+                rows = np.where(rows >= 0, address_coordinates_rows[np.maximum(rows, 0)], -1)
+            _add_columns(columns, _take(located_coordinates, COORDINATES_RESULT_COLUMNS, rows))
+
+    renames = {original: name for original, (name, values) in zip(data.columns, columns) if name != original}
+    results = pd.DataFrame({name: values for name, values in columns[len(data.columns):]}, index=data.index)
+    return renames, results
+
+
+def join_results(data, located_addresses=None, located_coordinates=None, address_keys=None, grid=COORDINATE_GRID):
+    """
+    Join data with its forward and reverse geocoding results. See `join_columns`.
+
+    Returns
+    -------
+    pd.DataFrame
+        The data followed by the result columns, with the same rows and index as `data`.
+    """
+
+    renames, results = join_columns(data, located_addresses, located_coordinates, address_keys, grid)
+    return pd.concat([data.rename(columns=renames), results], axis=1)
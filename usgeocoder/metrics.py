@@ -0,0 +1,348 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds in seconds of the buckets of the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0)
+
+# Metrics are disabled until `enable_metrics` is called, so requests only check this for None
+_metrics = None
+_lock = threading.Lock()
+
+
+def endpoint_name(url):
+    """ Return the endpoint of a Census Geocoder URL, such as 'locations/onelineaddress'. """
+    return '/'.join(url.rstrip('/').split('/')[-2:])
+
+
+def _outcome(status_code, error):
+    """ Classify a request by its HTTP status code, or by the error if there was no response. """
+    if status_code is None:
+        return error or 'connection_error'
+    if status_code == 429 or status_code >= 500:
+        return 'throttled'
+    if status_code >= 400:
+        return 'http_error'
+    return 'ok'
+
+
+def _labels(**labels):
+    """ Format Prometheus labels, escaping backslashes, quotes, and newlines in their values. """
+    values = {name: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+              for name, value in labels.items()}
+    return '{' + ','.join(f'{name}="{value}"' for name, value in values.items()) + '}'
+
+
+class RequestMetrics:
+    """
+    A registry of metrics about requests to the Census Geocoder, shared by every thread of the process.
+
+    The HTTP layer of `census_api` and `census_async` records each request: its latency in a histogram per endpoint,
+    its outcome and HTTP status code, and the bytes received. Each attempt of the escalating `timeouts` ladder is
+    counted per rung, with the attempts that timed out and the retries, and each final result is counted per
+    direction and status, which gives the match rate. The number of requests in flight is tracked as a gauge.
+
+    Hooks are called with a dict for every event, so metrics can also be forwarded to another system. Events have an
+    'event' key of 'request', 'attempt', or 'result' and the same values that are recorded.
+
+    Parameters
+    ----------
+    buckets : tuple of float, optional
+        Upper bounds in seconds of the latency histogram buckets. Default is `LATENCY_BUCKETS`.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self):
+        """ Set every metric back to zero. Requests in flight stay counted. """
+        with self._lock:
+            self._latency = {}
+            self._requests = {}
+            self._status_codes = {}
+            self._bytes = {}
+            self._attempts = {}
+            self._timeouts = {}
+            self._results = {}
+            self.max_in_flight = self.in_flight
+
+    def add_hook(self, hook):
+        """ Call `hook(event)` with a dict for every request, attempt, and result. """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """ Stop calling a hook added with `add_hook`. """
+        self.hooks.remove(hook)
+
+    def _emit(self, event):
+        for hook in list(self.hooks):
+            hook(event)
+
+    def request_started(self):
+        """ Count a request in flight. """
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def request_finished(self, endpoint, seconds, status_code=None, error=None, n_bytes=0):
+        """
+        Record a finished request.
+
+        Parameters
+        ----------
+        endpoint : str
+            Endpoint of the request, such as 'locations/onelineaddress'.
+        seconds : float
+            Time from sending the request to receiving the whole response, or to the error.
+        status_code : int, optional
+            HTTP status code, or None if there was no response.
+        error : str, optional
+            'timeout' or 'connection_error' if there was no response.
+        n_bytes : int, optional
+            Bytes of the response body.
+        """
+
+        outcome = _outcome(status_code, error)
+        with self._lock:
+            self.in_flight -= 1
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][bisect_left(self.buckets, seconds)] += 1
+            histogram[1] += seconds
+            self._requests[endpoint, outcome] = self._requests.get((endpoint, outcome), 0) + 1
+            if status_code is not None:
+                self._status_codes[endpoint, status_code] = self._status_codes.get((endpoint, status_code), 0) + 1
+            self._bytes[endpoint] = self._bytes.get(endpoint, 0) + n_bytes
+
+        if self.hooks:
+            self._emit({'event': 'request', 'endpoint': endpoint, 'seconds': seconds, 'outcome': outcome,
+                        'status_code': status_code, 'bytes': n_bytes})
+
+    def record_attempt(self, rung, timeout, status):
+        """
+        Record an attempt made with the timeout of a rung of the `timeouts` ladder. Attempts on rungs after the first
+        are retries.
+        """
+
+        with self._lock:
+            self._attempts[rung, timeout] = self._attempts.get((rung, timeout), 0) + 1
+            if status == 'timeout':
+                self._timeouts[rung, timeout] = self._timeouts.get((rung, timeout), 0) + 1
+
+        if self.hooks:
+            self._emit({'event': 'attempt', 'rung': rung, 'timeout': timeout, 'status': status})
+
+    def record_result(self, direction, status, count=1):
+        """ Record the final status of `count` geocoding inputs, such as 'located', 'no_match', or 'timeout'. """
+        with self._lock:
+            self._results[direction, status] = self._results.get((direction, status), 0) + count
+
+        if self.hooks:
+            self._emit({'event': 'result', 'direction': direction, 'status': status, 'count': count})
+
+    def state(self):
+        """ Return every count as plain dicts, which can be sent to another process and added with `merge`. """
+        with self._lock:
+            return {
+                'buckets': self.buckets,
+                'latency': {endpoint: (list(counts), total) for endpoint, (counts, total) in self._latency.items()},
+                'requests': dict(self._requests),
+                'status_codes': dict(self._status_codes),
+                'bytes': dict(self._bytes),
+                'attempts': dict(self._attempts),
+                'timeouts': dict(self._timeouts),
+                'results': dict(self._results),
+                'max_in_flight': self.max_in_flight,
+            }
+
+    def merge(self, state):
+        """
+        Add the counts of another registry, such as one of a worker process, from its `state`. Hooks are not called.
+
+        Raises
+        ------
+        ValueError
+            If the other registry uses other latency histogram buckets.
+        """
+
+        if tuple(state['buckets']) != self.buckets:
+            raise ValueError('Metrics with other latency buckets cannot be merged.')
+
+        with self._lock:
+            for endpoint, (counts, total) in state['latency'].items():
+                histogram = self._latency.get(endpoint)
+                if histogram is None:
+                    histogram = self._latency[endpoint] = [[0] * (len(self.buckets) + 1), 0.0]
+                histogram[0] = [count + other for count, other in zip(histogram[0], counts)]
+                histogram[1] += total
+            for name in ['requests', 'status_codes', 'bytes', 'attempts', 'timeouts', 'results']:
+                counts = getattr(self, f'_{name}')
+                for key, count in state[name].items():
+                    counts[key] = counts.get(key, 0) + count
+            self.max_in_flight = max(self.max_in_flight, state['max_in_flight'])
+
+    def latency_quantile(self, q, endpoint=None):
+        """
+        Estimate a quantile of the request latency from the histogram, interpolating within the bucket it falls in.
+
+        Parameters
+        ----------
+        q : float
+            Quantile between 0 and 1, such as 0.99.
+        endpoint : str, optional
+            Only use requests to this endpoint. Default uses every request.
+
+        Returns
+        -------
+        float or None
+            Latency in seconds, or None if no requests were recorded.
+        """
+
+        with self._lock:
+            histograms = [histogram for name, histogram in self._latency.items() if endpoint in (None, name)]
+            counts = [sum(bucket) for bucket in zip(*(histogram[0] for histogram in histograms))]
+        total = sum(counts)
+        if total == 0:
+            return None
+
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                # The last bucket has no upper bound, so report the largest finite bound
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        """
+        Return the current values of every metric.
+
+        Returns
+        -------
+        dict
+            A dictionary with the following keys:
+            - requests : int, total number of requests
+            - outcomes : dict of {(endpoint, outcome): int}, with outcomes 'ok', 'timeout', 'connection_error',
+              'throttled', and 'http_error'
+            - status_codes : dict of {(endpoint, status code): int}
+            - bytes : dict of {endpoint: int}, bytes received
+            - latency : dict of {endpoint: dict}, with the count, sum, and mean in seconds
+            - p50_latency, p99_latency : float or None, estimated from the histogram in seconds
+            - attempts, timeouts : dict of {(rung, timeout): int}, per rung of the `timeouts` ladder
+            - retries : int, attempts on rungs after the first
+            - results : dict of {(direction, status): int}
+            - match_rate : float or None, the fraction of located results among located and no_match results
+            - in_flight, max_in_flight : int
+        """
+
+        with self._lock:
+            latency = {endpoint: {'count': sum(counts), 'sum': total, 'mean': total / max(sum(counts), 1)}
+                       for endpoint, (counts, total) in self._latency.items()}
+            snapshot = {
+                'requests': sum(self._requests.values()),
+                'outcomes': dict(self._requests),
+                'status_codes': dict(self._status_codes),
+                'bytes': dict(self._bytes),
+                'latency': latency,
+                'attempts': dict(self._attempts),
+                'timeouts': dict(self._timeouts),
+                'retries': sum(count for (rung, _), count in self._attempts.items() if rung > 0),
+                'results': dict(self._results),
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+            }
+
+        located = sum(count for (_, status), count in snapshot['results'].items() if status == 'located')
+        no_match = sum(count for (_, status), count in snapshot['results'].items() if status == 'no_match')
+        snapshot['match_rate'] = located / (located + no_match) if located + no_match else None
+        snapshot['p50_latency'] = self.latency_quantile(0.5)
+        snapshot['p99_latency'] = self.latency_quantile(0.99)
+        return snapshot
+
+    def to_prometheus(self):
+        """ Return every metric in the Prometheus text exposition format. """
+        with self._lock:
+            latency = {endpoint: (list(counts), total) for endpoint, (counts, total) in self._latency.items()}
+            requests, status_codes = dict(self._requests), dict(self._status_codes)
+            n_bytes, attempts, timeouts = dict(self._bytes), dict(self._attempts), dict(self._timeouts)
+            results, in_flight, max_in_flight = dict(self._results), self.in_flight, self.max_in_flight
+
+        lines = ['# HELP usgeocoder_request_duration_seconds Latency of requests to the Census Geocoder.',
+                 '# TYPE usgeocoder_request_duration_seconds histogram']
+        for endpoint, (counts, total) in sorted(latency.items()):
+            cumulative = 0
+            for bound, count in zip([*self.buckets, '+Inf'], counts):
+                cumulative += count
+                lines.append(f'usgeocoder_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} '
+                             f'{cumulative}')
+            lines.append(f'usgeocoder_request_duration_seconds_sum{_labels(endpoint=endpoint)} {total}')
+            lines.append(f'usgeocoder_request_duration_seconds_count{_labels(endpoint=endpoint)} {cumulative}')
+
+        counters = [
+            ('usgeocoder_requests_total', 'Requests by endpoint and outcome.', ('endpoint', 'outcome'), requests),
+            ('usgeocoder_http_responses_total', 'HTTP responses by endpoint and status code.', ('endpoint', 'code'),
+             status_codes),
+            ('usgeocoder_response_bytes_total', 'Bytes of response bodies received.', ('endpoint',),
+             {(endpoint,): count for endpoint, count in n_bytes.items()}),
+            ('usgeocoder_attempts_total', 'Attempts per rung of the timeouts ladder.', ('rung', 'timeout'), attempts),
+            ('usgeocoder_attempt_timeouts_total', 'Attempts that timed out per rung of the timeouts ladder.',
+             ('rung', 'timeout'), timeouts),
+            ('usgeocoder_retries_total', 'Attempts after the first rung of the timeouts ladder.', ('rung', 'timeout'),
+             {key: count for key, count in attempts.items() if key[0] > 0}),
+            ('usgeocoder_results_total', 'Final geocoding results by direction and status.', ('direction', 'status'),
+             results),
+        ]
+        for name, description, names, values in counters:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+            for key, count in sorted(values.items(), key=lambda item: tuple(map(str, item[0]))):
+                lines.append(f'{name}{_labels(**dict(zip(names, key)))} {count}')
+
+        lines += ['# HELP usgeocoder_requests_in_flight Requests sent and not yet answered.',
+                  '# TYPE usgeocoder_requests_in_flight gauge', f'usgeocoder_requests_in_flight {in_flight}',
+                  '# HELP usgeocoder_requests_in_flight_max Most requests in flight at once since the last reset.',
+                  '# TYPE usgeocoder_requests_in_flight_max gauge',
+                  f'usgeocoder_requests_in_flight_max {max_in_flight}']
+        return '\n'.join(lines) + '\n'
+
+
+def enable_metrics(buckets=LATENCY_BUCKETS):
+    """
+    Start recording metrics for every request to the Census Geocoder.
+
+    Parameters
+    ----------
+    buckets : tuple of float, optional
+        Upper bounds in seconds of the latency histogram buckets, used if metrics are not enabled yet.
+        Default is `LATENCY_BUCKETS`.
+
+    Returns
+    -------
+    RequestMetrics
+        The shared registry. If metrics are already enabled, the existing registry is returned.
+    """
+
+    global _metrics
+    with _lock:
+        if _metrics is None:
+            _metrics = RequestMetrics(buckets)
+        return _metrics
+
+
+def disable_metrics():
+    """ Stop recording metrics. Requests then skip every metric and hook. """
+    global _metrics
+    with _lock:
+        _metrics = None
+
+
+def get_metrics():
+    """ Return the shared `RequestMetrics` registry, or None if metrics are disabled. """
+    return _metrics
@@ -0,0 +1,267 @@
+import re
+import pandas as pd
+
+# USPS street suffix abbreviations (Publication 28, Appendix C1), including common misspellings
+STREET_SUFFIXES = {
+    'ALLEY': 'ALY', 'ALLEE': 'ALY', 'ALLY': 'ALY',
+    'ANNEX': 'ANX', 'ANNX': 'ANX',
+    'AVENUE': 'AVE', 'AV': 'AVE', 'AVEN': 'AVE', 'AVENU': 'AVE', 'AVN': 'AVE', 'AVNUE': 'AVE',
+    'BEACH': 'BCH',
+    'BEND': 'BND',
+    'BLUFF': 'BLF',
+    'BOULEVARD': 'BLVD', 'BOUL': 'BLVD', 'BOULV': 'BLVD',
+    'BRANCH': 'BR',
+    'BRIDGE': 'BRG',
+    'BROOK': 'BRK',
+    'BYPASS': 'BYP',
+    'CANYON': 'CYN',
+    'CAUSEWAY': 'CSWY',
+    'CENTER': 'CTR', 'CENTRE': 'CTR', 'CENTR': 'CTR', 'CNTR': 'CTR',
+    'CIRCLE': 'CIR', 'CIRC': 'CIR', 'CIRCL': 'CIR', 'CRCL': 'CIR',
+    'CLIFF': 'CLF',
+    'COMMON': 'CMN',
+    'CORNER': 'COR',
+    'COURSE': 'CRSE',
+    'COURT': 'CT',
+    'COVE': 'CV',
+    'CREEK': 'CRK',
+    'CRESCENT': 'CRES',
+    'CROSSING': 'XING', 'CRSSNG': 'XING',
+    'DRIVE': 'DR', 'DRIV': 'DR', 'DRV': 'DR',
+    'ESTATE': 'EST',
+    'ESTATES': 'ESTS',
+    'EXPRESSWAY': 'EXPY', 'EXPRESS': 'EXPY', 'EXPW': 'EXPY',
+    'EXTENSION': 'EXT', 'EXTN': 'EXT',
+    'FALLS': 'FLS',
+    'FERRY': 'FRY',
+    'FIELD': 'FLD',
+    'FIELDS': 'FLDS',
+    'FOREST': 'FRST',
+    'FORK': 'FRK',
+    'FREEWAY': 'FWY', 'FREEWY': 'FWY', 'FRWAY': 'FWY', 'FRWY': 'FWY',
+    'GARDEN': 'GDN',
+    'GARDENS': 'GDNS',
+    'GATEWAY': 'GTWY',
+    'GLEN': 'GLN',
+    'GREEN': 'GRN',
+    'GROVE': 'GRV',
+    'HARBOR': 'HBR',
+    'HAVEN': 'HVN',
+    'HEIGHTS': 'HTS',
+    'HIGHWAY': 'HWY', 'HIGHWY': 'HWY', 'HIWAY': 'HWY', 'HIWY': 'HWY',
+    'HILL': 'HL',
+    'HILLS': 'HLS',
+    'HOLLOW': 'HOLW',
+    'ISLAND': 'IS',
+    'JUNCTION': 'JCT',
+    'KNOLL': 'KNL',
+    'LAKE': 'LK',
+    'LANDING': 'LNDG',
+    'LANE': 'LN',
+    'LOOP': 'LOOP',
+    'MANOR': 'MNR',
+    'MEADOWS': 'MDWS',
+    'MOUNT': 'MT',
+    'MOUNTAIN': 'MTN',
+    'ORCHARD': 'ORCH',
+    'PARKWAY': 'PKWY', 'PARKWY': 'PKWY', 'PKWAY': 'PKWY', 'PKY': 'PKWY',
+    'PASSAGE': 'PSGE',
+    'PIKE': 'PIKE',
+    'PINES': 'PNES',
+    'PLACE': 'PL',
+    'PLAINS': 'PLNS',
+    'PLAZA': 'PLZ',
+    'POINT': 'PT',
+    'PORT': 'PRT',
+    'PRAIRIE': 'PR',
+    'RANCH': 'RNCH',
+    'RIDGE': 'RDG',
+    'RIVER': 'RIV',
+    'ROAD': 'RD',
+    'ROUTE': 'RTE',
+    'SHORE': 'SHR',
+    'SPRINGS': 'SPGS',
+    'SQUARE': 'SQ',
+    'STATION': 'STA',
+    'STREET': 'ST', 'STR': 'ST', 'STRT': 'ST',
+    'SUMMIT': 'SMT',
+    'TERRACE': 'TER',
+    'TRACE': 'TRCE',
+    'TRAIL': 'TRL', 'TRAILS': 'TRL',
+    'TURNPIKE': 'TPKE',
+    'VALLEY': 'VLY',
+    'VIADUCT': 'VIA',
+    'VIEW': 'VW',
+    'VILLAGE': 'VLG',
+    'VISTA': 'VIS',
+    'WALK': 'WALK',
+}
+
+# USPS directional abbreviations
+DIRECTIONALS = {
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
+    'NORTHEAST': 'NE', 'NORTHWEST': 'NW', 'SOUTHEAST': 'SE', 'SOUTHWEST': 'SW',
+}
+
+# USPS secondary unit designators (Publication 28, Appendix C2)
+UNIT_DESIGNATORS = {
+    'APARTMENT': 'APT', 'APPT': 'APT',
+    'BUILDING': 'BLDG', 'BLD': 'BLDG',
+    'DEPARTMENT': 'DEPT',
+    'FLOOR': 'FL', 'FLR': 'FL',
+    'HANGAR': 'HNGR',
+    'LOT': 'LOT',
+    'OFFICE': 'OFC',
+    'PENTHOUSE': 'PH',
+    'ROOM': 'RM',
+    'SPACE': 'SPC',
+    'SUITE': 'STE', 'SUIT': 'STE',
+    'TRAILER': 'TRLR',
+    'UNIT': 'UNIT',
+}
+
+# State names and their USPS abbreviations
+STATES = {
+    'ALABAMA': 'AL', 'ALASKA': 'AK', 'ARIZONA': 'AZ', 'ARKANSAS': 'AR', 'CALIFORNIA': 'CA', 'COLORADO': 'CO',
+    'CONNECTICUT': 'CT', 'DELAWARE': 'DE', 'DISTRICT OF COLUMBIA': 'DC', 'FLORIDA': 'FL', 'GEORGIA': 'GA',
+    'HAWAII': 'HI', 'IDAHO': 'ID', 'ILLINOIS': 'IL', 'INDIANA': 'IN', 'IOWA': 'IA', 'KANSAS': 'KS',
+    'KENTUCKY': 'KY', 'LOUISIANA': 'LA', 'MAINE': 'ME', 'MARYLAND': 'MD', 'MASSACHUSETTS': 'MA',
+    'MICHIGAN': 'MI', 'MINNESOTA': 'MN', 'MISSISSIPPI': 'MS', 'MISSOURI': 'MO', 'MONTANA': 'MT',
+    'NEBRASKA': 'NE', 'NEVADA': 'NV', 'NEW HAMPSHIRE': 'NH', 'NEW JERSEY': 'NJ', 'NEW MEXICO': 'NM',
+    'NEW YORK': 'NY', 'NORTH CAROLINA': 'NC', 'NORTH DAKOTA': 'ND', 'OHIO': 'OH', 'OKLAHOMA': 'OK',
+    'OREGON': 'OR', 'PENNSYLVANIA': 'PA', 'RHODE ISLAND': 'RI', 'SOUTH CAROLINA': 'SC', 'SOUTH DAKOTA': 'SD',
+    'TENNESSEE': 'TN', 'TEXAS': 'TX', 'UTAH': 'UT', 'VERMONT': 'VT', 'VIRGINIA': 'VA', 'WASHINGTON': 'WA',
+    'WEST VIRGINIA': 'WV', 'WISCONSIN': 'WI', 'WYOMING': 'WY', 'AMERICAN SAMOA': 'AS', 'GUAM': 'GU',
+    'NORTHERN MARIANA ISLANDS': 'MP', 'PUERTO RICO': 'PR', 'VIRGIN ISLANDS': 'VI',
+}
+
+
+# Version of the canonical form. Stores keyed by another version are re-keyed by `ResultStore.normalize_address_keys`.
+NORMALIZATION_VERSION = 2
+
+SUFFIX_WORDS = set(STREET_SUFFIXES) | set(STREET_SUFFIXES.values())
+DIRECTIONAL_WORDS = set(DIRECTIONALS) | set(DIRECTIONALS.values())
+UNIT_WORDS = set(UNIT_DESIGNATORS) | set(UNIT_DESIGNATORS.values()) | {'#'}
+
+
+def _abbreviate_street(street):
+    """
+    Abbreviate the directionals, street suffix, and unit designator of the street part of an address.
+
+    Only the directional after the house number, the suffix and directional ending the street name, and the unit
+    designator are abbreviated. Words of the street name itself are kept, as in 'NORTH AVE' or 'LAKE SHORE DR'.
+    """
+
+    words = street.split(' ')
+
+    # The secondary unit starts at a unit designator or '#' after the street name, followed by the unit number
+    end = next((i for i in range(2, len(words) - 1) if words[i] in UNIT_WORDS), len(words))
+    if end < len(words):
+        words[end] = UNIT_DESIGNATORS.get(words[end], words[end])
+
+    # Skip the house number, then abbreviate the post-directional, suffix, and pre-directional around the name
+    start = 1 if words[0][:1].isdigit() else 0
+    if end - start > 1 and words[end - 1] in DIRECTIONAL_WORDS:
+        end -= 1
+        words[end] = DIRECTIONALS.get(words[end], words[end])
+    if end - start > 1 and words[end - 1] in SUFFIX_WORDS:
+        end -= 1
+        words[end] = STREET_SUFFIXES.get(words[end], words[end])
+    if end - start > 1 and words[start] in DIRECTIONAL_WORDS:
+        words[start] = DIRECTIONALS.get(words[start], words[start])
+    return ' '.join(words)
+
+
+UNIT_PATTERN = re.compile(rf'\b({"|".join(sorted(set(UNIT_DESIGNATORS.values())))}) # ')
+STATE_PATTERN = re.compile(rf'(?<=,)\s*({"|".join(sorted(STATES, key=len, reverse=True))})(?=\s+\d{{5}}|\s*$)')
+
+# Remove periods and apostrophes, replace other punctuation with spaces, and space '#' unit markers, whitespace, and
+# commas consistently
+CLEANUP_STEPS = [
+    (re.compile(r"[.']"), ''),
+    (re.compile(r'[^\w\s,#/-]'), ' '),
+    (re.compile(r'\s*#\s*'), ' # '),
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r'\s*,\s*'), ', '),
+]
+ZIP_PATTERN = re.compile(r'\b(\d{5})-?\d{4}$')
+
+
+def _state_abbreviation(match):
+    return ' ' + STATES[match.group(1)]
+
+
+def normalize_addresses(addresses):
+    """
+    Convert addresses to a canonical form, so variants of the same address share one cache key.
+
+    The canonical form is upper case without periods or extra punctuation. In the street part, the street suffix,
+    the directionals before and after the street name, and the unit designator are abbreviated as recommended by
+    USPS Publication 28, and a '#' unit marker is spaced consistently. Other words are kept, so 'North Ave' becomes
+    'NORTH AVE' and 'Lake Shore Drive' becomes 'LAKE SHORE DR'. State names are abbreviated, and ZIP+4 codes are
+    shortened to the 5 digit ZIP code.
+    For example, '200 East Colfax Avenue, Denver, Colorado 80203-1234' becomes '200 E COLFAX AVE, DENVER, CO 80203'.
+
+    Parameters
+    ----------
+    addresses : pd.Series
+        Addresses formatted as `123 Main St, City, State Zip`, for example by `concatenate_address`.
+
+    Returns
+    -------
+    pd.Series
+        The canonical addresses, with the same index as `addresses`. Missing addresses stay missing.
+    """
+
+    addresses = addresses.astype('string').str.upper()
+    for pattern, replacement in CLEANUP_STEPS:
+        addresses = addresses.str.replace(pattern, replacement, regex=True)
+    addresses = addresses.str.strip(' ,')
+
+    # Abbreviate suffixes, directionals, and unit designators in the street part only, so city names are kept
+    parts = addresses.str.split(', ', n=1, expand=True)
+    street = parts[0].map(_abbreviate_street, na_action='ignore').astype('string')
+    street = street.str.replace(UNIT_PATTERN, r'\1 ', regex=True)
+    if parts.shape[1] > 1:
+        rest = parts[1].str.replace(STATE_PATTERN, _state_abbreviation, regex=True)
+        addresses = street.where(rest.isna(), street + ', ' + rest.str.strip())
+    else:
+        addresses = street
+
+    # Shorten ZIP+4 codes to the 5 digit ZIP code
+    addresses = addresses.str.replace(ZIP_PATTERN, r'\1', regex=True)
+    return addresses.astype(object).where(addresses.notna(), None)
+
+
+def normalize_address(address):
+    """
+    Convert a single address to its canonical form. See `normalize_addresses`.
+
+    Runs the same steps on a plain string instead of a Series, so single lookups such as those of `GeocodeCache` do
+    not pay for pandas.
+
+    Parameters
+    ----------
+    address : str
+        An address formatted as `123 Main St, City, State Zip`.
+
+    Returns
+    -------
+    str or None
+        The canonical address, or None if the address is missing.
+    """
+
+    if not isinstance(address, str):
+        if address is None or address is pd.NA or address != address:
+            return None
+        address = str(address)
+
+    address = address.upper()
+    for pattern, replacement in CLEANUP_STEPS:
+        address = pattern.sub(replacement, address)
+    street, separator, rest = address.strip(' ,').partition(', ')
+
+    street = UNIT_PATTERN.sub(r'\1 ', _abbreviate_street(street))
+    if separator:
+        street += ', ' + STATE_PATTERN.sub(_state_abbreviation, rest).strip()
+    return ZIP_PATTERN.sub(r'\1', street)
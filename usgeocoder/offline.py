@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from .census_api import REVERSE_COLUMNS, STATUS_COLUMNS
+from .store import coordinates_array
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+try:
+    import geopandas
+except ImportError:
+    geopandas = None
+
+# Columns of the boundaries used by `LocalReverseGeocoder`, the same as the geographies in `REVERSE_COLUMNS`
+GEOGRAPHY_COLUMNS = ['State', 'County', 'Census Block', 'Census Tract']
+
+# State names by FIPS code, as returned in the BASENAME of the Census Geocoder
+STATE_NAMES = {
+    '01': 'Alabama', '02': 'Alaska', '04': 'Arizona', '05': 'Arkansas', '06': 'California', '08': 'Colorado',
+    '09': 'Connecticut', '10': 'Delaware', '11': 'District of Columbia', '12': 'Florida', '13': 'Georgia',
+    '15': 'Hawaii', '16': 'Idaho', '17': 'Illinois', '18': 'Indiana', '19': 'Iowa', '20': 'Kansas',
+    '21': 'Kentucky', '22': 'Louisiana', '23': 'Maine', '24': 'Maryland', '25': 'Massachusetts', '26': 'Michigan',
+    '27': 'Minnesota', '28': 'Mississippi', '29': 'Missouri', '30': 'Montana', '31': 'Nebraska', '32': 'Nevada',
+    '33': 'New Hampshire', '34': 'New Jersey', '35': 'New Mexico', '36': 'New York', '37': 'North Carolina',
+    '38': 'North Dakota', '39': 'Ohio', '40': 'Oklahoma', '41': 'Oregon', '42': 'Pennsylvania',
+    '44': 'Rhode Island', '45': 'South Carolina', '46': 'South Dakota', '47': 'Tennessee', '48': 'Texas',
+    '49': 'Utah', '50': 'Vermont', '51': 'Virginia', '53': 'Washington', '54': 'West Virginia', '55': 'Wisconsin',
+    '56': 'Wyoming', '60': 'American Samoa', '66': 'Guam', '69': 'Commonwealth of the Northern Mariana Islands',
+    '72': 'Puerto Rico', '78': 'United States Virgin Islands'
+}
+
+
+def _require_shapely():
+    """ Raise an informative error if the optional shapely dependency is not installed. """
+    if shapely is None:
+        raise ImportError('Offline reverse geocoding requires shapely. '
+                          'Install it with `pip install usgeocoder[offline]`.')
+
+
+def _require_geopandas():
+    """ Raise an informative error if the optional geopandas dependency is not installed. """
+    if geopandas is None:
+        raise ImportError('Reading boundary files requires geopandas. '
+                          'Install it with `pip install usgeocoder[offline]`.')
+
+
+def tract_name(tract_code):
+    """ Convert a 6 digit TIGER/Line tract code such as '003102' to its name, such as '31.02'. """
+    tract_code = str(tract_code).zfill(6)
+    number, suffix = int(tract_code[:4]), tract_code[4:]
+    return str(number) if suffix == '00' else f'{number}.{suffix}'
+
+
+def _field(df, name):
+    """ Return a TIGER/Line field by name, with or without the vintage suffix such as 'STATEFP20'. """
+    for column in df.columns:
+        if column.upper().rstrip('0123456789') == name:
+            return df[column].astype(str)
+    raise ValueError(f'Boundary file has no {name} field.')
+
+
+class LocalReverseGeocoder:
+    """
+    A reverse geocoder that looks up census geographies in boundaries held in memory instead of sending requests.
+
+    Census blocks nest in tracts, counties, and states, so a single point-in-polygon lookup against block boundaries
+    gives every geography returned by `geocode_coordinates`. Boundaries are indexed in an STR-tree, and each batch of
+    points is matched with one vectorized query.
+
+    Parameters
+    ----------
+    boundaries : pd.DataFrame
+        Boundaries with a 'geometry' column of shapely polygons and the columns 'State', 'County', 'Census Block',
+        and 'Census Tract' with the names returned for a point inside each polygon. See `from_files` to read them
+        from TIGER/Line files.
+
+    Raises
+    ------
+    ImportError
+        If shapely is not installed.
+    """
+
+    def __init__(self, boundaries):
+        _require_shapely()
+        self.boundaries = boundaries[GEOGRAPHY_COLUMNS].reset_index(drop=True)
+        self.geometries = np.asarray(boundaries['geometry'], dtype=object)
+        self.tree = shapely.STRtree(self.geometries)
+
+    @classmethod
+    def from_files(cls, block_paths, county_path=None, states=None):
+        """
+        Read census block boundaries from TIGER/Line shapefiles or GeoParquet files.
+
+        Parameters
+        ----------
+        block_paths : str, Path, or list
+            Paths of block boundary files, for example 'tl_2020_08_tabblock20.zip' for the blocks of Colorado.
+            Files ending in '.parquet' are read as GeoParquet, any other file with `geopandas.read_file`.
+        county_path : str or Path, optional
+            Path of a county boundary file such as 'tl_2020_us_county.zip', used for county names. If None, counties
+            are named by their FIPS code.
+        states : list of str, optional
+            State FIPS codes such as ['08'] to keep. Default keeps every block in the files.
+
+        Returns
+        -------
+        LocalReverseGeocoder
+            A reverse geocoder for the blocks in the files.
+
+        Raises
+        ------
+        ImportError
+            If geopandas or shapely is not installed.
+        """
+
+        _require_geopandas()
+        if not isinstance(block_paths, (list, tuple)):
+            block_paths = [block_paths]
+
+        def read(path):
+            path = str(path)
+            return geopandas.read_parquet(path) if path.endswith('.parquet') else geopandas.read_file(path)
+
+        blocks = pd.concat([read(path) for path in block_paths], ignore_index=True)
+        state_codes = _field(blocks, 'STATEFP')
+        if states is not None:
+            blocks = blocks[state_codes.isin(states).values].reset_index(drop=True)
+            state_codes = _field(blocks, 'STATEFP')
+        county_codes = state_codes + _field(blocks, 'COUNTYFP')
+
+        county_names = {}
+        if county_path is not None:
+            counties = read(county_path)
+            county_names = dict(zip(_field(counties, 'STATEFP') + _field(counties, 'COUNTYFP'),
+                                    _field(counties, 'NAME')))
+
+        boundaries = pd.DataFrame({
+            'geometry': np.asarray(blocks.geometry, dtype=object),
+            'State': state_codes.map(STATE_NAMES).fillna(state_codes).values,
+            'County': county_codes.map(county_names).fillna(_field(blocks, 'COUNTYFP')).values,
+            'Census Block': _field(blocks, 'BLOCKCE').values,
+            'Census Tract': _field(blocks, 'TRACTCE').map(tract_name).values
+        })
+        return cls(boundaries)
+
+    def lookup(self, coordinates):
+        """
+        Find the boundary containing each point.
+
+        Parameters
+        ----------
+        coordinates : iterable of tuple
+            (longitude, latitude) pairs.
+
+        Returns
+        -------
+        np.ndarray
+            The position in `boundaries` of the polygon containing each point, or -1 if no polygon contains it.
+            A point on the border of several polygons is assigned to the first of them.
+        """
+
+        positions = coordinates_array(coordinates)
+        points = shapely.points(positions)
+        point_index, boundary_index = self.tree.query(points, predicate='intersects')
+
+        matches = np.full(len(positions), -1, dtype=np.int64)
+        point_index, first = np.unique(point_index, return_index=True)
+        matches[point_index] = boundary_index[first]
+        return matches
+
+    def reverse(self, coordinates):
+        """
+        Reverse geocode coordinates offline.
+
+        Parameters
+        ----------
+        coordinates : iterable of tuple
+            (longitude, latitude) pairs. Duplicates are removed.
+
+        Returns
+        -------
+        located_df : pd.DataFrame
+            Coordinates inside a boundary, with the same columns as `batch_geocode` with direction='reverse'.
+        failed_df : pd.DataFrame
+            Coordinates outside every boundary, with 'Status' set to 'no_match'.
+            'Attempts' is 0 since no request is made.
+        """
+
+        coordinates = list(set(coordinates))
+        matches = self.lookup(coordinates)
+        located = matches >= 0
+
+        df = pd.DataFrame({'Coordinates': pd.Series(coordinates, dtype=object),
+                           'Date': date.today().strftime('%Y-%m-%d')})
+        for column in GEOGRAPHY_COLUMNS:
+            values = np.full(len(coordinates), None, dtype=object)
+            values[located] = self.boundaries[column].values[matches[located]]
+            df[column] = values
+        df['Status'] = np.where(located, 'located', 'no_match')
+        df['Attempts'] = 0
+
+        columns = REVERSE_COLUMNS + STATUS_COLUMNS
+        return df.loc[located, columns].reset_index(drop=True), df.loc[~located, columns].reset_index(drop=True)
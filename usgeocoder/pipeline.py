@@ -0,0 +1,260 @@
+import os
+import pandas as pd
+from pathlib import Path
+
+from .census_api import batch_geocode, bulk_geocode
+from .join import join_results
+from .normalize import normalize_addresses
+from .store import ResultStore
+from .utils import (concatenate_address, concatenate_coordinates, create_address_list, create_coordinates_list,
+                    parse_coordinates)
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Default number of input rows read, geocoded, and written at a time
+CHUNK_SIZE = 100000
+
+
+def _require_pyarrow():
+    """ Raise an informative error if the optional pyarrow dependency is not installed. """
+    if pyarrow is None:
+        raise ImportError('Reading and writing Parquet files requires pyarrow. '
+                          'Install it with `pip install usgeocoder[parquet]`.')
+
+
+def _is_parquet(path):
+    """ Return True if the file extension of `path` is a Parquet extension. """
+    return Path(path).suffix.lower() in ('.parquet', '.pq')
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Read a CSV or Parquet file in chunks.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path of the input file. Files ending in '.parquet' or '.pq' are read as Parquet, any other file as CSV.
+    chunk_size : int, optional
+        Number of rows per chunk. Default is `CHUNK_SIZE`.
+
+    Yields
+    ------
+    pd.DataFrame
+        The next `chunk_size` rows of the file.
+    """
+
+    if _is_parquet(path):
+        _require_pyarrow()
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """
+    Append DataFrames to a CSV or Parquet file, creating or replacing the file on the first write.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path of the output file. Files ending in '.parquet' or '.pq' are written as Parquet, any other file as CSV.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = _is_parquet(path)
+        self.rows = 0
+        self._writer = None
+        if self.parquet:
+            _require_pyarrow()
+
+    def write(self, df):
+        """ Append the rows of `df` to the output file. """
+        if self.parquet:
+            # Coordinates are written as '(Longitude, Latitude)' strings, the same as in CSV files
+            df = df.copy()
+            if 'Coordinates' in df.columns:
+                df['Coordinates'] = [None if coordinates is None else str(coordinates)
+                                     for coordinates in df['Coordinates']]
+            if self._writer is None:
+                table = pyarrow.Table.from_pandas(df, preserve_index=False)
+                self._writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            else:
+                table = pyarrow.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        """ Close the output file. """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def _geocode_misses(store, table, values, geocode):
+    """ Geocode the values that are not in the store yet, saving results to the store as they complete. """
+    misses = store.missing(table, values)
+    if not misses:
+        return 0
+
+    def checkpoint(located_df, failed_df):
+        store.save_results('forward' if table == 'addresses' else 'reverse', located_df, failed_df)
+
+    geocode(misses, checkpoint)
+    return len(misses)
+
+
+def geocode_chunk(chunk, store, reverse=True, engine='batch', normalize=True):
+    """
+    Geocode the cache misses of one chunk of data and merge the results with it.
+
+    Parameters
+    ----------
+    chunk : pd.DataFrame
+        Data with an 'Address' column, the columns ['Street Address', 'City', 'State', 'ZIP'], a 'Coordinates'
+        column, or the columns ['Longitude', 'Latitude'].
+    store : ResultStore
+        Store used to look up cached results and to save new ones.
+    reverse : bool, optional
+        Reverse geocode the coordinates of located addresses. Default is True.
+    engine : str, optional
+        'batch' to forward geocode with the Census batch endpoint, or 'request' to send one request per address.
+        Default is 'batch'.
+    normalize : bool, optional
+        Geocode and cache addresses in their canonical form from `normalize_addresses`. Default is True.
+
+    Returns
+    -------
+    merged_df : pd.DataFrame
+        The chunk merged with its geocoding results, in the same schema as `Geocoder.merge_data`.
+    counts : dict
+        Number of addresses and coordinates requested from the Census Geocoder for this chunk.
+
+    Raises
+    ------
+    ValueError
+        If the chunk has neither address nor coordinate columns.
+    """
+
+    chunk = chunk.copy()
+    counts = {'addresses': 0, 'coordinates': 0}
+
+    # Coordinates in CSV files are read as strings
+    if 'Coordinates' in chunk.columns:
+        chunk['Coordinates'] = chunk['Coordinates'].map(parse_coordinates)
+    elif {'Longitude', 'Latitude'}.issubset(chunk.columns) and 'Address' not in chunk.columns:
+        chunk['Coordinates'] = concatenate_coordinates(chunk)
+
+    # Reverse geocode coordinate data directly
+    if 'Coordinates' in chunk.columns:
+        coordinates = create_coordinates_list(chunk) if chunk['Coordinates'].notna().any() else []
+        counts['coordinates'] = _geocode_misses(
+            store, 'coordinates', coordinates,
+            lambda misses, checkpoint: batch_geocode(misses, direction='reverse', checkpoint=checkpoint))
+        merged_df = join_results(chunk, located_coordinates=store.lookup('coordinates', coordinates), grid=store.grid)
+        return merged_df, counts
+
+    if 'Address' not in chunk.columns:
+        if not {'Street Address', 'City', 'State', 'ZIP'}.issubset(chunk.columns):
+            raise ValueError('Data must contain an Address or Coordinates column.')
+        chunk['Address'] = concatenate_address(chunk)
+
+    # Forward geocode addresses that are not cached yet, keyed by their canonical form
+    addresses = create_address_list(chunk) if chunk['Address'].fillna('').astype(bool).any() else []
+    address_keys = chunk['Address']
+    if normalize:
+        addresses = [address for address in normalize_addresses(pd.Series(addresses, dtype=object)).unique() if address]
+        address_keys = normalize_addresses(chunk['Address'])
+    if engine == 'batch':
+        def forward(misses, checkpoint):
+            bulk_geocode(misses, checkpoint=checkpoint)
+    else:
+        def forward(misses, checkpoint):
+            batch_geocode(misses, direction='forward', checkpoint=checkpoint)
+    counts['addresses'] = _geocode_misses(store, 'addresses', addresses, forward)
+    located_addresses = store.lookup('addresses', addresses)
+
+    # Reverse geocode the located coordinates that are not cached yet
+    located_coordinates = None
+    if reverse:
+        coordinates = located_addresses['Coordinates'].drop_duplicates().tolist()
+        counts['coordinates'] = _geocode_misses(
+            store, 'coordinates', coordinates,
+            lambda misses, checkpoint: batch_geocode(misses, direction='reverse', checkpoint=checkpoint))
+        located_coordinates = store.lookup('coordinates', coordinates)
+
+    # Join on the cache key of each address, keeping the original address
+    merged_df = join_results(chunk, located_addresses, located_coordinates, address_keys=address_keys.values,
+                             grid=store.grid)
+    return merged_df, counts
+
+
+def geocode_file(input_path, output_path, chunk_size=CHUNK_SIZE, reverse=True, engine='batch', store_path=None,
+                 normalize=True, verbose=False):
+    """
+    Geocode a CSV or Parquet file chunk by chunk and write the merged results to another file.
+
+    Each chunk is read, its addresses or coordinates are looked up in the result store, only the cache misses are
+    sent to the Census Geocoder, and the merged chunk is appended to the output file. Peak memory is set by
+    `chunk_size` rather than by the size of the input file.
+
+    Parameters
+    ----------
+    input_path : str or Path
+        Path of the input file, with the columns accepted by `Geocoder.add_data`.
+    output_path : str or Path
+        Path of the output file. It is replaced if it exists.
+    chunk_size : int, optional
+        Number of rows read, geocoded, and written at a time. Default is `CHUNK_SIZE`.
+    reverse : bool, optional
+        Reverse geocode the coordinates of located addresses. Default is True.
+    engine : str, optional
+        'batch' or 'request'. See `Geocoder.forward`. Default is 'batch'.
+    store_path : str or Path, optional
+        Path of the result store. Default is 'geocoder/geocoder.db' in the current working directory, the same
+        store used by `Geocoder`.
+    normalize : bool, optional
+        Geocode and cache addresses in their canonical form from `normalize_addresses`. Results already in the store
+        are re-keyed to their canonical form with `ResultStore.normalize_address_keys`. Default is True.
+    verbose : bool, optional
+        Print progress to console. Default is False.
+
+    Returns
+    -------
+    int
+        Number of rows written to the output file.
+    """
+
+    if store_path is None:
+        store_dir = Path(os.getcwd()) / 'geocoder'
+        store_dir.mkdir(exist_ok=True)
+        store_path = store_dir / 'geocoder.db'
+    store = ResultStore(store_path)
+    if normalize:
+        store.normalize_address_keys()
+
+    writer = ChunkWriter(output_path)
+    try:
+        for i, chunk in enumerate(read_chunks(input_path, chunk_size)):
+            merged_df, counts = geocode_chunk(chunk, store, reverse=reverse, engine=engine, normalize=normalize)
+            writer.write(merged_df)
+
+            if verbose:
+                print(f'Chunk {i + 1}: {len(chunk):,} rows, geocoded {counts["addresses"]:,} addresses '
+                      f'and {counts["coordinates"]:,} coordinates')
+    finally:
+        writer.close()
+        store.close()
+
+    if verbose:
+        print(f'Wrote {writer.rows:,} rows to {output_path}')
+
+    return writer.rows
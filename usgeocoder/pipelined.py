@@ -0,0 +1,182 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+from .census_api import bulk_geocode, iter_geocode, FORWARD_COLUMNS, REVERSE_COLUMNS, STATUS_COLUMNS
+from .rate import get_rate_controller
+from .session import ensure_pool_size
+
+# Marks the end of the coordinates put in the queue of the reverse stage
+_DONE = object()
+
+# Seconds between checks of whether the other stage has failed while waiting on the queue
+_POLL_INTERVAL = 0.1
+
+
+class _Results:
+    """ Collect the results of a stage and save them to the store every `size` results or `interval` seconds. """
+
+    def __init__(self, store, direction, columns, size, interval):
+        self.store = store
+        self.direction = direction
+        self.columns = columns + STATUS_COLUMNS
+        self.size = size
+        self.interval = interval
+        self.located = []
+        self.failed = []
+        self.saved = monotonic()
+
+    def add(self, response):
+        (self.located if response['Status'] == 'located' else self.failed).append(response)
+        if len(self.located) + len(self.failed) >= self.size or monotonic() - self.saved >= self.interval:
+            self.flush()
+
+    def flush(self):
+        import pandas as pd
+
+        if self.located or self.failed:
+            self.store.save_results(self.direction, pd.DataFrame(self.located, columns=self.columns),
+                                    pd.DataFrame(self.failed, columns=self.columns))
+        self.located, self.failed, self.saved = [], [], monotonic()
+
+
+def _queued_coordinates(coordinates_queue, store, batch_size):
+    """
+    Yield the coordinates put in the queue that have not been reverse geocoded yet, until `_DONE` is read.
+
+    Coordinates are read in batches of up to `batch_size`, so each batch costs one lookup in the store.
+    Only one coordinate is yielded per grid cell, also across batches.
+    """
+
+    seen = set()
+    done = False
+    while not done:
+        batch = [coordinates_queue.get()]
+        while len(batch) < batch_size:
+            try:
+                batch.append(coordinates_queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch[-1] is _DONE:
+            batch.pop()
+            done = True
+
+        # Keep the first coordinates of each grid cell not seen in an earlier batch
+        new = {}
+        for coordinates, key in zip(batch, store.keys('coordinates', batch)):
+            if key is not None and key not in seen and key not in new:
+                new[key] = coordinates
+        seen.update(new)
+        yield from store.missing('coordinates', new.values())
+
+
+def pipelined_geocode(addresses, store, engine='request', forward_threads=None, reverse_threads=None,
+                      queue_size=1000, checkpoint_size=1000, checkpoint_interval=30.0):
+    """
+    Forward geocode addresses and reverse geocode their coordinates in two overlapping stages.
+
+    The coordinates of each located address are put in a bounded queue as soon as they arrive, and a reverse stage
+    running in its own thread geocodes them while forward geocoding continues. End-to-end time is then close to the
+    longer of the two stages rather than their sum. When the queue is full, the forward stage waits for the reverse
+    stage to catch up, so memory stays bounded. Results of both stages are saved to `store` as they complete.
+
+    Both stages are paced by the shared rate controller, so their combined request rate and concurrency stay within
+    its limits.
+
+    Parameters
+    ----------
+    addresses : iterable of str
+        Addresses to be geocoded. Duplicates are not removed by the 'request' engine.
+    store : ResultStore
+        Store the results are saved to. Coordinates whose grid cell already has a result are not reverse geocoded.
+    engine : str, optional
+        'batch' to forward geocode with the Census batch endpoint, whose coordinates are queued one chunk at a time,
+        or 'request' to send one request per address. Default is 'request'.
+    forward_threads : int, optional
+        Maximum number of forward requests in flight, or of chunks uploaded at once with the 'batch' engine.
+        Default is half the `max_concurrency` of the shared rate controller, or 4 chunks.
+    reverse_threads : int, optional
+        Maximum number of reverse requests in flight. Default is half the `max_concurrency` of the shared rate
+        controller.
+    queue_size : int, optional
+        Maximum number of coordinates waiting for the reverse stage. Default is 1000.
+    checkpoint_size : int, optional
+        Number of results of each stage between saves to the store. Default is 1000.
+    checkpoint_interval : float, optional
+        Maximum number of seconds between saves to the store. Default is 30.
+
+    Returns
+    -------
+    list of tuple
+        The (longitude, latitude) coordinates reverse geocoded by the reverse stage.
+
+    Raises
+    ------
+    ValueError
+        If `engine` is neither 'batch' nor 'request'.
+    """
+
+    if engine not in ['batch', 'request']:
+        raise ValueError('engine must be either "batch" or "request"')
+
+    half = max(get_rate_controller().max_concurrency // 2, 1)
+    if forward_threads is None:
+        forward_threads = 4 if engine == 'batch' else half
+    if reverse_threads is None:
+        reverse_threads = half
+
+    # Size the shared connection pool for both stages before either starts sending requests
+    ensure_pool_size(forward_threads + reverse_threads)
+
+    coordinates_queue = queue.Queue(maxsize=queue_size)
+    reversed_coordinates = []
+
+    def reverse_stage():
+        results = _Results(store, 'reverse', REVERSE_COLUMNS, checkpoint_size, checkpoint_interval)
+        pending = _queued_coordinates(coordinates_queue, store, batch_size=max(reverse_threads, 1))
+        try:
+            for response in iter_geocode(pending, 'reverse', n_threads=reverse_threads):
+                reversed_coordinates.append(response['Coordinates'])
+                results.add(response)
+        finally:
+            results.flush()
+
+    def put(item):
+        # Wait for free space, but stop waiting if the reverse stage has failed so its error can be raised
+        while True:
+            try:
+                coordinates_queue.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                if reverse.done():
+                    reverse.result()
+                    return
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    reverse = executor.submit(reverse_stage)
+    try:
+        if engine == 'batch':
+            def checkpoint(located_df, failed_df):
+                store.save_results('forward', located_df, failed_df)
+                for coordinates in located_df['Coordinates']:
+                    put(coordinates)
+
+            bulk_geocode(addresses, n_threads=forward_threads, checkpoint=checkpoint)
+
+        else:
+            results = _Results(store, 'forward', FORWARD_COLUMNS, checkpoint_size, checkpoint_interval)
+            try:
+                for response in iter_geocode(addresses, 'forward', n_threads=forward_threads):
+                    results.add(response)
+                    if response['Status'] == 'located':
+                        put(response['Coordinates'])
+            finally:
+                results.flush()
+
+    # Let the reverse stage finish the queued coordinates, also if the forward stage failed
+    finally:
+        put(_DONE)
+        executor.shutdown(wait=True)
+
+    reverse.result()
+    return reversed_coordinates
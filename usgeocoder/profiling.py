@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Returned by `Profiler.phase` of a disabled profiler, so unprofiled code only pays for entering a null context
+NULL_PHASE = nullcontext()
+
+
+class Phase:
+    """
+    Wall time, CPU time, and peak memory of one phase of a `Geocoder` run.
+
+    Attributes
+    ----------
+    name : str
+        Name of the phase, such as 'forward.geocode'.
+    path : tuple of str
+        Names of the enclosing phases and this phase, such as ('process', 'forward', 'forward.geocode').
+    start : float
+        Seconds from the start of the profile to the start of the phase.
+    wall : float
+        Elapsed seconds.
+    cpu : float
+        CPU seconds of the process, summed over its threads.
+    peak_memory : int or None
+        Peak bytes allocated by Python above the allocations at the start of the phase, or None if memory is not
+        traced.
+    attributes : dict
+        Values describing the phase, such as the number of inputs.
+    thread : int
+        Identifier of the thread the phase ran in.
+    """
+
+    __slots__ = ('name', 'path', 'start', 'wall', 'cpu', 'peak_memory', 'attributes', 'thread')
+
+    def __init__(self, name, path, start, wall, cpu, peak_memory, attributes, thread):
+        self.name = name
+        self.path = path
+        self.start = start
+        self.wall = wall
+        self.cpu = cpu
+        self.peak_memory = peak_memory
+        self.attributes = attributes
+        self.thread = thread
+
+    def __repr__(self):
+        return f'Phase({self.name!r}, wall={self.wall:.3f}, cpu={self.cpu:.3f}, peak_memory={self.peak_memory})'
+
+    @property
+    def depth(self):
+        return len(self.path) - 1
+
+    def to_dict(self):
+        return {'name': self.name, 'path': list(self.path), 'start': self.start, 'wall': self.wall, 'cpu': self.cpu,
+                'peak_memory': self.peak_memory, 'attributes': dict(self.attributes), 'thread': self.thread}
+
+
+class ProfileReport:
+    """
+    The phases recorded by a `Profiler`, in the order they finished.
+
+    Attributes
+    ----------
+    phases : list of Phase
+        Every recorded phase, including nested phases.
+    """
+
+    def __init__(self, phases=None):
+        self.phases = list(phases or [])
+
+    def __iter__(self):
+        return iter(self.phases)
+
+    def __len__(self):
+        return len(self.phases)
+
+    def __getitem__(self, name):
+        """ Return the last phase with a name. """
+        for phase in reversed(self.phases):
+            if phase.name == name:
+                return phase
+        raise KeyError(name)
+
+    def totals(self):
+        """ Return the summed wall time, CPU time, maximum peak memory, and count of the phases of each name. """
+        totals = {}
+        for phase in self.phases:
+            total = totals.setdefault(phase.name, {'wall': 0.0, 'cpu': 0.0, 'peak_memory': None, 'count': 0})
+            total['wall'] += phase.wall
+            total['cpu'] += phase.cpu
+            total['count'] += 1
+            if phase.peak_memory is not None:
+                total['peak_memory'] = max(total['peak_memory'] or 0, phase.peak_memory)
+        return totals
+
+    def to_dict(self):
+        return {'phases': [phase.to_dict() for phase in self.phases]}
+
+    @classmethod
+    def from_dict(cls, report):
+        """ Rebuild a report saved with `to_dict`, for example to compare it with a later run. """
+        return cls(Phase(phase['name'], tuple(phase['path']), phase['start'], phase['wall'], phase['cpu'],
+                         phase['peak_memory'], phase['attributes'], phase['thread']) for phase in report['phases'])
+
+    def to_frame(self):
+        """ Return the phases as a DataFrame with one row per phase, in the order they started. """
+        import pandas as pd
+
+        rows = [dict(phase.to_dict(), depth=phase.depth) for phase in sorted(self.phases, key=lambda p: p.start)]
+        columns = ['name', 'depth', 'start', 'wall', 'cpu', 'peak_memory', 'attributes']
+        return pd.DataFrame(rows, columns=columns)
+
+    def summary(self):
+        """ Return a table of the phases in the order they started, indented by nesting depth. """
+        lines = [f'{"phase":<36} {"wall (s)":>10} {"cpu (s)":>10} {"peak (MiB)":>11}']
+        for phase in sorted(self.phases, key=lambda p: p.start):
+            memory = '' if phase.peak_memory is None else f'{phase.peak_memory / 2 ** 20:.1f}'
+            name = '  ' * phase.depth + phase.name
+            lines.append(f'{name:<36} {phase.wall:>10.3f} {phase.cpu:>10.3f} {memory:>11}')
+        return '\n'.join(lines)
+
+    def to_trace_events(self):
+        """
+        Return the phases as complete events of the Trace Event Format, which can be opened in Perfetto or
+        chrome://tracing to compare runs.
+        """
+
+        return [{'name': phase.name, 'cat': phase.path[0], 'ph': 'X', 'pid': 0, 'tid': phase.thread,
+                 'ts': phase.start * 1e6, 'dur': phase.wall * 1e6,
+                 'args': dict(phase.attributes, cpu=phase.cpu, peak_memory=phase.peak_memory)}
+                for phase in self.phases]
+
+    def save_trace(self, path):
+        """ Write the phases to a JSON trace file. See `to_trace_events`. """
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.to_trace_events(), 'displayTimeUnit': 'ms'}, f)
+
+
+class Profiler:
+    """
+    Record the wall time, CPU time, and peak memory of the phases of a `Geocoder` run.
+
+    Phases are recorded with the `phase` context manager and can be nested. Peak memory is measured with
+    `tracemalloc`, which slows down allocation-heavy code, so it can be turned off with `trace_memory=False`.
+
+    Parameters
+    ----------
+    trace_memory : bool, optional
+        Trace the peak memory of each phase. Starts `tracemalloc` if it is not already running. Default is True.
+    tracer : opentelemetry.trace.Tracer, optional
+        Also emit each phase as a span of this tracer, or of any object with a compatible `start_as_current_span`
+        method. Default does not emit spans.
+    """
+
+    def __init__(self, trace_memory=True, tracer=None):
+        self.trace_memory = trace_memory
+        self.tracer = tracer
+        self.report = ProfileReport()
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def close(self):
+        """ Stop `tracemalloc` if this profiler started it. Recorded phases are kept. """
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextmanager
+    def phase(self, name, **attributes):
+        """
+        Record a phase of the run.
+
+        Parameters
+        ----------
+        name : str
+            Name of the phase.
+        **attributes
+            Values describing the phase, such as the number of inputs, added to the report and the trace span.
+        """
+
+        stack = self._local.__dict__.setdefault('stack', [])
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        frame = {'path': tuple(entry['name'] for entry in stack) + (name,), 'name': name, 'peak': 0, 'memory': 0}
+        if tracing:
+            # The peak is reset for this phase, so keep the peak reached so far by the enclosing phase
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['memory'] = frame['peak'] = current
+        stack.append(frame)
+
+        span = self.tracer.start_as_current_span(name, attributes=attributes) if self.tracer else NULL_PHASE
+        with span as current_span:
+            start, cpu = time.perf_counter(), time.process_time()
+            try:
+                yield
+            finally:
+                wall, cpu = time.perf_counter() - start, time.process_time() - cpu
+                stack.pop()
+                peak_memory = None
+                if tracing:
+                    peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                    peak_memory = peak - frame['memory']
+                    if stack:
+                        stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+
+                phase = Phase(name, frame['path'], start - self._origin, wall, cpu, peak_memory, attributes,
+                              threading.get_ident())
+                with self._lock:
+                    self.report.phases.append(phase)
+
+                if current_span is not None:
+                    current_span.set_attribute('cpu_seconds', cpu)
+                    if peak_memory is not None:
+                        current_span.set_attribute('peak_memory_bytes', peak_memory)
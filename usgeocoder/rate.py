@@ -0,0 +1,209 @@
+import threading
+from time import monotonic
+
+# Default limits for the shared rate controller
+INITIAL_RATE = 50.0
+MAX_RATE = 500.0
+INITIAL_CONCURRENCY = 50
+MAX_CONCURRENCY = 200
+TARGET_LATENCY = 1.0
+
+# Outcomes that signal the Census service is overloaded
+BACKOFF_OUTCOMES = ('timeout', 'throttled', 'error')
+
+_controller = None
+_lock = threading.Lock()
+
+
+class RateController:
+    """
+    A rate and concurrency limiter shared by all workers sending requests to the Census Geocoder.
+
+    Requests are paced by a token bucket and capped by a concurrency limit. Both limits follow an additive increase,
+    multiplicative decrease (AIMD) policy: every window of fast, successful requests raises them a little, and a
+    timeout, connection error, throttling response (429), or server error (5xx) cuts them in half.
+
+    Parameters
+    ----------
+    rate : float, optional
+        Initial number of requests per second. Default is `INITIAL_RATE`.
+    concurrency : int, optional
+        Initial number of requests in flight. Default is `INITIAL_CONCURRENCY`.
+    max_rate : float, optional
+        Upper bound for the rate. Default is `MAX_RATE`.
+    max_concurrency : int, optional
+        Upper bound for the concurrency, and the number of threads used by `batch_geocode`.
+        Default is `MAX_CONCURRENCY`.
+    min_rate : float, optional
+        Lower bound for the rate. Default is 1.
+    min_concurrency : int, optional
+        Lower bound for the concurrency. Default is 1.
+    target_latency : float, optional
+        Requests slower than this many seconds do not raise the limits. Default is `TARGET_LATENCY`.
+    rate_increase : float, optional
+        Requests per second added to the rate after each window of healthy requests. Default is 5.
+    decrease_factor : float, optional
+        Factor applied to both limits when the service is overloaded. Default is 0.5.
+    """
+
+    def __init__(self, rate=INITIAL_RATE, concurrency=INITIAL_CONCURRENCY, max_rate=MAX_RATE,
+                 max_concurrency=MAX_CONCURRENCY, min_rate=1.0, min_concurrency=1, target_latency=TARGET_LATENCY,
+                 rate_increase=5.0, decrease_factor=0.5):
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+        self.rate_increase = rate_increase
+        self.decrease_factor = decrease_factor
+
+        self.rate = float(min(max(rate, min_rate), max_rate))
+        self.concurrency = float(min(max(concurrency, min_concurrency), max_concurrency))
+        self.in_flight = 0
+
+        self._tokens = 1.0
+        self._updated = monotonic()
+        self._last_decrease = 0.0
+        self._counts = {'success': 0, 'slow': 0, 'timeout': 0, 'throttled': 0, 'error': 0}
+        self._condition = threading.Condition()
+
+    def _refill(self, now):
+        """ Add the tokens earned since the last update, holding at most one second of burst. """
+        self._tokens = min(self._tokens + (now - self._updated) * self.rate, max(self.rate, 1.0))
+        self._updated = now
+
+    def acquire(self):
+        """
+        Block until a request may be sent.
+
+        Returns
+        -------
+        float
+            The start time of the request, to be passed to `release`.
+        """
+
+        with self._condition:
+            while True:
+                start, wait = self._try_acquire()
+                if start is not None:
+                    return start
+
+                # Wait for the next token, or for a request in flight to be released
+                self._condition.wait(wait)
+
+    def try_acquire(self):
+        """
+        Take a request slot if one is free, without blocking. Used by the async engine, which must not block its
+        event loop.
+
+        Returns
+        -------
+        tuple of (float or None, float or None)
+            The start time of the request, to be passed to `release`, and None. If no request may be sent yet, None
+            and None if the concurrency limit is reached, or None and the number of seconds until the next token.
+        """
+
+        with self._condition:
+            return self._try_acquire()
+
+    def _try_acquire(self):
+        now = monotonic()
+        self._refill(now)
+        if self.in_flight >= int(self.concurrency):
+            return None, None
+        if self._tokens < 1:
+            return None, (1 - self._tokens) / self.rate
+        self._tokens -= 1
+        self.in_flight += 1
+        return now, None
+
+    def release(self, start, outcome='success'):
+        """
+        Record the outcome of a request and adjust the limits.
+
+        Parameters
+        ----------
+        start : float
+            The start time returned by `acquire`.
+        outcome : str, optional
+            One of 'success', 'timeout', 'throttled' (HTTP 429 or 5xx), or 'error' (connection error).
+            Default is 'success'.
+        """
+
+        now = monotonic()
+        latency = now - start
+        with self._condition:
+            self.in_flight -= 1
+
+            # Multiplicative decrease, at most once per target latency so one burst of failures counts once
+            if outcome in BACKOFF_OUTCOMES:
+                self._counts[outcome] += 1
+                if now - self._last_decrease >= self.target_latency:
+                    self._last_decrease = now
+                    self.rate = max(self.rate * self.decrease_factor, self.min_rate)
+                    self.concurrency = max(self.concurrency * self.decrease_factor, self.min_concurrency)
+
+            # Additive increase, spread over a window of `concurrency` healthy requests
+            elif latency <= self.target_latency:
+                self._counts['success'] += 1
+                self.concurrency = min(self.concurrency + 1 / self.concurrency, self.max_concurrency)
+                self.rate = min(self.rate + self.rate_increase / self.concurrency, self.max_rate)
+
+            else:
+                self._counts['slow'] += 1
+
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        Report the current limits and the number of requests recorded per outcome.
+
+        Returns
+        -------
+        dict
+            A dictionary with the keys rate, concurrency, in_flight, and one count per outcome.
+        """
+
+        with self._condition:
+            stats = {'rate': self.rate, 'concurrency': int(self.concurrency), 'in_flight': self.in_flight}
+            stats.update(self._counts)
+        return stats
+
+
+def get_rate_controller():
+    """
+    Return the rate controller shared by all Census Geocoder requests, creating it if needed.
+
+    Returns
+    -------
+    RateController
+        The shared rate controller.
+    """
+
+    global _controller
+    if _controller is None:
+        with _lock:
+            if _controller is None:
+                _controller = RateController()
+    return _controller
+
+
+def configure_rate_controller(**kwargs):
+    """
+    Replace the shared rate controller with one created from the given settings.
+
+    Parameters
+    ----------
+    **kwargs
+        Keyword arguments passed to `RateController`.
+
+    Returns
+    -------
+    RateController
+        The new shared rate controller.
+    """
+
+    global _controller
+    with _lock:
+        _controller = RateController(**kwargs)
+    return _controller
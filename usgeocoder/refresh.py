@@ -0,0 +1,219 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from time import monotonic
+
+from .census_api import batch_geocode
+
+# Default ages in days after which located and failed results are refreshed
+REFRESH_TTL = 365
+FAILED_REFRESH_TTL = 30
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    Re-geocode stale results of a `ResultStore` in small batches on a background thread.
+
+    A result is stale once it is older than `ttl` days, or `failed_ttl` days if it failed, or if it was made with
+    another `census_api.BENCHMARK` or `census_api.VINTAGE` than the current ones, so a new Census release is picked
+    up gradually rather than starting from an empty cache. Stale results stay in the store and keep being served
+    until their new result is saved over them. Only located and 'no_match' results are saved. Results that fail to
+    refresh with any other status, such as a timeout, throttling, or an HTTP or decode error, are kept and tried again
+    after `retry_delay` seconds.
+
+    Each batch first takes stale results of recently requested addresses and coordinates, reported with `touch`,
+    most recent first, and fills up with the oldest stale results of the store. At most `batch_size` inputs are
+    requested per batch, with `n_threads` requests in flight, and batches are at least `interval` seconds apart,
+    on top of the shared rate controller.
+
+    Parameters
+    ----------
+    store : ResultStore
+        Store whose results are refreshed.
+    ttl : float, optional
+        Days after which a located result is refreshed. Default is `REFRESH_TTL`, 365.
+    failed_ttl : float, optional
+        Days after which a failed result is tried again. Default is `FAILED_REFRESH_TTL`, 30.
+    batch_size : int, optional
+        Maximum number of inputs refreshed per batch and table. Default is 100.
+    interval : float, optional
+        Minimum number of seconds between the starts of two batches. Default is 1.
+    idle_interval : float, optional
+        Seconds to wait before checking the store again once nothing is stale. Default is 60.
+    n_threads : int, optional
+        Maximum number of requests in flight. Default is 2.
+    retry_delay : float, optional
+        Seconds before a result that failed to refresh is tried again. Default is 300.
+    max_recent : int, optional
+        Maximum number of recently requested values waiting to be checked for each table. The least recently
+        requested are dropped first. Default is 100,000.
+    """
+
+    def __init__(self, store, ttl=REFRESH_TTL, failed_ttl=FAILED_REFRESH_TTL, batch_size=100, interval=1.0,
+                 idle_interval=60.0, n_threads=2, retry_delay=300.0, max_recent=100000):
+        self.store = store
+        self.ttl = ttl
+        self.failed_ttl = failed_ttl
+        self.batch_size = batch_size
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.n_threads = n_threads
+        self.retry_delay = retry_delay
+        self.max_recent = max_recent
+
+        # Recently requested values by key, most recent last, and keys whose refresh failed with their retry time
+        self._recent = {'addresses': OrderedDict(), 'coordinates': OrderedDict()}
+        self._deferred = {'addresses': {}, 'coordinates': {}}
+        self._counts = {'batches': 0, 'refreshed': 0, 'deferred': 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """ Start refreshing on a daemon thread. Does nothing if it is already running. """
+        if self._thread is not None and self._thread.is_alive():
+            return None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='usgeocoder-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        """ Stop refreshing after the current batch, waiting for it to finish if `wait` is True. """
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def touch(self, table, values):
+        """
+        Report addresses or coordinates that were just requested, so their stale results are refreshed first.
+
+        Parameters
+        ----------
+        table : str
+            'addresses' or 'coordinates'.
+        values : iterable of str or tuple
+            Addresses, in the form used as store keys, or (longitude, latitude) coordinates.
+        """
+
+        values = list(values)
+        keys = self.store.keys(table, values)
+        with self._lock:
+            recent = self._recent[table]
+            for key, value in zip(keys, values):
+                if key is None:
+                    continue
+                recent[key] = value
+                recent.move_to_end(key)
+            while len(recent) > self.max_recent:
+                recent.popitem(last=False)
+
+    def stats(self):
+        """ Return the number of batches run, results refreshed, and refreshes deferred after a failure. """
+        with self._lock:
+            return dict(self._counts)
+
+    def _cutoffs(self):
+        today = date.today()
+        return ((today - timedelta(days=self.ttl)).strftime('%Y-%m-%d'),
+                (today - timedelta(days=self.failed_ttl)).strftime('%Y-%m-%d'))
+
+    def _due(self, table):
+        """ Return up to `batch_size` stale values of a table, recently requested ones first. """
+        cutoff, failed_cutoff = self._cutoffs()
+        now = monotonic()
+        with self._lock:
+            deferred = self._deferred[table]
+            for key in [key for key, retry_time in deferred.items() if retry_time <= now]:
+                del deferred[key]
+            deferred = set(deferred)
+
+        # Check recently requested values, most recent first. Each is checked once, and only stale ones are kept.
+        due = {}
+        while len(due) < self.batch_size:
+            with self._lock:
+                recent = self._recent[table]
+                checked = [recent.popitem() for _ in range(min(self.batch_size - len(due), len(recent)))]
+            if not checked:
+                break
+            stale = self.store.stale(table, cutoff, failed_cutoff, values=[value for _, value in checked])
+            stale_keys = set(self.store.keys(table, stale))
+            for key, value in checked:
+                if key in stale_keys and key not in deferred:
+                    due[key] = value
+
+        # Fill up with the oldest stale results, skipping those that failed to refresh recently
+        if len(due) < self.batch_size:
+            stale = self.store.stale(table, cutoff, failed_cutoff, limit=self.batch_size + len(deferred))
+            for key, value in zip(self.store.keys(table, stale), stale):
+                if len(due) < self.batch_size and key not in deferred:
+                    due.setdefault(key, value)
+
+        return list(due.values())
+
+    def run_once(self):
+        """
+        Refresh one batch of each table.
+
+        Returns
+        -------
+        int
+            Number of inputs requested, 0 if nothing was stale.
+        """
+
+        n_requested = 0
+        for table, direction in [('addresses', 'forward'), ('coordinates', 'reverse')]:
+            values = self._due(table)
+            if not values:
+                continue
+            n_requested += len(values)
+
+            located_df, failed_df = batch_geocode(values, direction=direction, n_threads=self.n_threads)
+
+            # Only save definitive answers. Keep the stale result of values that failed to refresh for any other
+            # reason, such as an error response or one that could not be decoded, and try them again later.
+            no_match = failed_df['Status'] == 'no_match'
+            retry_values = failed_df.loc[~no_match, 'Coordinates' if table == 'coordinates' else 'Address']
+            self.store.save_results(direction, located_df, failed_df[no_match])
+
+            retry_time = monotonic() + self.retry_delay
+            with self._lock:
+                for key in self.store.keys(table, retry_values):
+                    if key is not None:
+                        self._deferred[table][key] = retry_time
+                self._counts['refreshed'] += len(located_df) + int(no_match.sum())
+                self._counts['deferred'] += len(retry_values)
+
+        if n_requested:
+            with self._lock:
+                self._counts['batches'] += 1
+        return n_requested
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                start = monotonic()
+                try:
+                    n_requested = self.run_once()
+                except Exception:
+                    # Keep refreshing in the background, the next batch may succeed
+                    logger.exception('Refreshing stale results failed')
+                    n_requested = 0
+                wait = self.interval if n_requested else self.idle_interval
+                self._stop.wait(max(wait - (monotonic() - start), 0))
+        finally:
+            self.store.close()
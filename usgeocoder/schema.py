@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from .census_api import FORWARD_COLUMNS, REVERSE_COLUMNS, STATUS_COLUMNS
+from .store import coordinates_array
+
+# Columns with few distinct values, which are stored once and referenced by integer codes
+CATEGORY_COLUMNS = ['State', 'County', 'Census Block', 'Census Tract', 'Status']
+
+
+def compact_columns(table, located=True):
+    """
+    Return the columns of the compact schema of a table, where 'Coordinates' is replaced by 'Longitude' and
+    'Latitude'.
+
+    Parameters
+    ----------
+    table : str
+        'addresses' or 'coordinates'.
+    located : bool, optional
+        Columns of located results if True, or of failed results if False. Default is True.
+
+    Returns
+    -------
+    list of str
+    """
+
+    columns = REVERSE_COLUMNS if table == 'coordinates' else FORWARD_COLUMNS
+    columns = columns if located else columns + STATUS_COLUMNS
+    compact = []
+    for column in columns:
+        for name in (['Longitude', 'Latitude'] if column == 'Coordinates' else [column]):
+            if name not in compact:
+                compact.append(name)
+    return compact
+
+
+def result_coordinates(df):
+    """
+    Return the coordinates of results in either schema as an array of shape (n, 2), using the 'Longitude' and
+    'Latitude' columns if there are any and the 'Coordinates' column otherwise.
+    """
+
+    if 'Longitude' in df.columns and 'Latitude' in df.columns:
+        return np.column_stack([pd.to_numeric(df['Longitude'], errors='coerce'),
+                                pd.to_numeric(df['Latitude'], errors='coerce')]).astype(np.float64)
+    return coordinates_array(df['Coordinates'])
+
+
+def compact_results(df):
+    """
+    Convert geocoding results to a compact schema that takes a fraction of the memory.
+
+    - 'Date' strings become datetime64[s] values.
+    - State, County, Census Block, Census Tract, and Status become categoricals, so each distinct name is stored
+      once and every row holds an integer code.
+    - 'Coordinates' tuples become float64 'Longitude' and 'Latitude' columns.
+    - 'Attempts' becomes a nullable Int16 column.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Results in the schema returned by `batch_geocode` or used by `Geocoder`. Results that are already compact
+        are returned unchanged.
+
+    Returns
+    -------
+    pd.DataFrame
+        A new DataFrame in the compact schema, with the same rows and index.
+    """
+
+    df = df.copy()
+    if 'Coordinates' in df.columns:
+        positions = result_coordinates(df)
+        df = df.drop(columns='Coordinates')
+        if 'Longitude' not in df.columns:
+            df.insert(0, 'Longitude', positions[:, 0])
+            df.insert(1, 'Latitude', positions[:, 1])
+
+    for column in ['Longitude', 'Latitude']:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(np.float64)
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d').astype('datetime64[s]')
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    if 'Attempts' in df.columns:
+        df['Attempts'] = pd.to_numeric(df['Attempts'], errors='coerce').astype('Int16')
+
+    return df
+
+
+def expand_results(df):
+    """
+    Convert compact results from `compact_results` back to the schema returned by `batch_geocode`.
+
+    Returns
+    -------
+    pd.DataFrame
+        A new DataFrame with 'Date' strings, string columns of names, and a 'Coordinates' column of
+        (longitude, latitude) tuples.
+    """
+
+    df = df.copy()
+    if 'Date' in df.columns and pd.api.types.is_datetime64_any_dtype(df['Date']):
+        df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(df[column].cat.categories.dtype)
+    if 'Attempts' in df.columns:
+        df['Attempts'] = df['Attempts'].astype(object).where(df['Attempts'].notna(), None)
+
+    if 'Coordinates' not in df.columns:
+        coordinates = [None if np.isnan(longitude) or np.isnan(latitude) else (longitude, latitude)
+                       for longitude, latitude in result_coordinates(df).tolist()]
+        if 'Address' in df.columns:
+            df['Coordinates'] = coordinates
+            columns = FORWARD_COLUMNS
+        else:
+            df.insert(0, 'Coordinates', coordinates)
+            df = df.drop(columns=['Longitude', 'Latitude'])
+            columns = REVERSE_COLUMNS
+        df = df[[column for column in columns + STATUS_COLUMNS if column in df.columns]]
+
+    return df
+
+
+def concat_results(frames):
+    """
+    Concatenate results, keeping categorical columns categorical.
+
+    `pd.concat` only keeps a categorical column if every frame has the same categories, so the categories of each
+    column are first extended to their union. Rows keep their integer codes instead of being converted to strings.
+
+    Parameters
+    ----------
+    frames : list of pd.DataFrame
+        Results in the same schema.
+
+    Returns
+    -------
+    pd.DataFrame
+        The concatenated results, with a new default index.
+    """
+
+    frames = [df for df in frames if not df.empty] or frames[:1]
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    frames = [df.copy() for df in frames]
+    for column in frames[0].columns:
+        dtypes = [df[column].dtype for df in frames if column in df.columns]
+        if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            categories = dtypes[0].categories
+            for dtype in dtypes[1:]:
+                categories = categories.union(dtype.categories)
+            for df in frames:
+                df[column] = df[column].cat.set_categories(categories)
+
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,216 @@
+import threading
+from functools import partial
+import requests
+from requests.adapters import HTTPAdapter
+
+# Default connection pool limits, sized for the thread pools used by batch geocoding
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 100
+
+_session = None
+_settings = {'pool_connections': POOL_CONNECTIONS, 'pool_maxsize': POOL_MAXSIZE, 'connect_timeout': None}
+_lock = threading.Lock()
+
+
+def _key_without_maxsize(key_fn, request_context):
+    """ Return the pool key of a request context, leaving out the pool size. """
+    request_context = dict(request_context)
+    request_context.pop('maxsize', None)
+    return key_fn(request_context)
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    An HTTP adapter that keeps connections alive between requests and counts how often they are reused.
+
+    urllib3 tracks the number of requests and new connections for each host's connection pool.
+    The adapter adds those counts up, including pools that have been evicted, so `stats()` covers the
+    lifetime of the adapter.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._closed_requests = 0
+        self._closed_connections = 0
+        self._stats_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pools = self.poolmanager.pools
+        dispose = pools.dispose_func
+
+        # Record the counts of a host's pool before it is evicted and closed
+        def dispose_func(pool):
+            with self._stats_lock:
+                self._closed_requests += pool.num_requests
+                self._closed_connections += pool.num_connections
+            if dispose is not None:
+                dispose(pool)
+
+        pools.dispose_func = dispose_func
+
+        # Key pools without their size, so a host keeps its pool after `grow`
+        self.poolmanager.key_fn_by_scheme = {scheme: partial(_key_without_maxsize, key_fn)
+                                             for scheme, key_fn in self.poolmanager.key_fn_by_scheme.items()}
+
+    def grow(self, maxsize):
+        """
+        Keep up to `maxsize` connections alive per host, without closing any connection or resetting `stats()`.
+
+        The connection pools of hosts already in use get free slots below their idle connections, which are taken
+        from the top of their LIFO queue first, so requests in flight are not affected.
+        """
+
+        self._pool_maxsize = maxsize
+        self.poolmanager.connection_pool_kw['maxsize'] = maxsize
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            connections = None if pool is None else pool.pool
+            if connections is None:
+                continue
+            with connections.mutex:
+                n_free = maxsize - connections.maxsize
+                if n_free > 0:
+                    connections.maxsize = maxsize
+                    connections.queue[:0] = [None] * n_free
+
+    def stats(self):
+        """ Return the number of requests, new connections, and reused connections made through the adapter. """
+        with self._stats_lock:
+            n_requests = self._closed_requests
+            n_connections = self._closed_connections
+            for key in list(self.poolmanager.pools.keys()):
+                pool = self.poolmanager.pools.get(key)
+                if pool is not None:
+                    n_requests += pool.num_requests
+                    n_connections += pool.num_connections
+
+        return {
+            'requests': n_requests,
+            'connections': n_connections,
+            'reused': max(n_requests - n_connections, 0)
+        }
+
+
+def _create_session():
+    """ Create a session with a pooled adapter mounted for HTTP and HTTPS. """
+    session = requests.Session()
+    adapter = PooledAdapter(pool_connections=_settings['pool_connections'], pool_maxsize=_settings['pool_maxsize'])
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Return the shared session used for all Census Geocoder requests, creating it if needed.
+
+    Returns
+    -------
+    requests.Session
+        A session that reuses keep-alive connections across requests and threads.
+    """
+
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+def configure_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, connect_timeout=None):
+    """
+    Configure the shared session used for all Census Geocoder requests.
+
+    The current session is closed and replaced, which also resets the statistics from `session_stats`.
+
+    Parameters
+    ----------
+    pool_connections : int, optional
+        Number of hosts to keep connection pools for. Default is `POOL_CONNECTIONS`.
+    pool_maxsize : int, optional
+        Maximum number of connections kept alive per host. This should be at least the number of threads
+        sending requests. Default is `POOL_MAXSIZE`.
+    connect_timeout : float, optional
+        Timeout in seconds for establishing a connection. If None, the read timeout of each attempt is also used
+        for the connection. Default is None.
+    """
+
+    global _session
+    with _lock:
+        _settings.update(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                         connect_timeout=connect_timeout)
+        if _session is not None:
+            _session.close()
+        _session = _create_session()
+
+
+def session_settings():
+    """ Return the settings of the shared session, as keyword arguments of `configure_session`. """
+    with _lock:
+        return dict(_settings)
+
+
+def ensure_pool_size(n_workers):
+    """
+    Grow the connection pool of the shared session so that each of `n_workers` threads can keep a connection alive.
+
+    Unlike `configure_session`, the session is neither closed nor replaced, so it can be grown while other threads
+    are sending requests through it, and the statistics from `session_stats` are kept.
+
+    Parameters
+    ----------
+    n_workers : int
+        Number of threads that will send requests concurrently.
+    """
+
+    with _lock:
+        if n_workers <= _settings['pool_maxsize']:
+            return None
+        _settings['pool_maxsize'] = n_workers
+        if _session is not None:
+            for adapter in {id(adapter): adapter for adapter in _session.adapters.values()}.values():
+                if isinstance(adapter, PooledAdapter):
+                    adapter.grow(n_workers)
+
+
+def request_timeout(timeout):
+    """ Combine the configured connect timeout with the read timeout of a request attempt. """
+    if _settings['connect_timeout'] is None:
+        return timeout
+    return _settings['connect_timeout'], timeout
+
+
+def session_stats():
+    """
+    Report connection reuse for the shared session.
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys:
+        - requests : int
+            Number of requests sent.
+        - connections : int
+            Number of new connections opened, each costing a TCP and TLS handshake.
+        - reused : int
+            Number of requests sent over an existing keep-alive connection.
+    """
+
+    session = get_session()
+    stats = {'requests': 0, 'connections': 0, 'reused': 0}
+    for adapter in {id(adapter): adapter for adapter in session.adapters.values()}.values():
+        if isinstance(adapter, PooledAdapter):
+            for key, value in adapter.stats().items():
+                stats[key] += value
+    return stats
+
+
+def close_session():
+    """ Close the shared session and its connections. A new session is created on the next request. """
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
@@ -0,0 +1,211 @@
+import multiprocessing
+import os
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import census_api
+from .census_api import batch_geocode, bulk_geocode
+from .metrics import enable_metrics, get_metrics
+from .rate import configure_rate_controller, get_rate_controller
+from .session import configure_session, session_settings
+from .store import ResultStore
+
+# Module settings of `census_api` copied to each worker process, so changes made in the parent process apply
+CENSUS_SETTINGS = ['BASE_URL', 'sleep_delay', 'timeouts', 'batch_timeouts', 'retry_backoff']
+
+
+def shard_index(key, n_shards):
+    """ Return the shard of a store key. The hash is stable across processes and Python versions. """
+    return zlib.crc32(key.encode('utf-8')) % n_shards
+
+
+def partition(data, direction, n_shards, store):
+    """
+    Hash-partition unique addresses or coordinates into shards.
+
+    Parameters
+    ----------
+    data : iterable of str or tuple
+        Addresses (for forward or combined geocoding) or coordinates (for reverse geocoding).
+    direction : str
+        'forward', 'reverse', or 'combined'.
+    n_shards : int
+        Number of shards.
+    store : ResultStore
+        Store whose keys identify unique inputs. Only one input is kept per key.
+
+    Returns
+    -------
+    list of list
+        The unique inputs of each shard. Every input is assigned to the same shard in every run.
+    """
+
+    data = list(data)
+    keys = store.keys('coordinates' if direction == 'reverse' else 'addresses', data)
+    unique = {key: item for key, item in zip(keys, data) if key is not None}
+    shards = [[] for _ in range(n_shards)]
+    for key, item in unique.items():
+        shards[shard_index(key, n_shards)].append(item)
+    return shards
+
+
+def shard_rate_settings(controller, n_shards):
+    """
+    Return the settings of the rate controller of one of `n_shards` workers, so the workers together keep to the
+    rate and concurrency limits of `controller`. Each worker keeps at least one request in flight.
+
+    Parameters
+    ----------
+    controller : RateController
+        Rate controller whose limits are shared by the workers.
+    n_shards : int
+        Number of workers.
+
+    Returns
+    -------
+    dict
+        Keyword arguments of `RateController`.
+    """
+
+    return {
+        'rate': controller.rate / n_shards,
+        'concurrency': max(int(controller.concurrency) // n_shards, 1),
+        'max_rate': controller.max_rate / n_shards,
+        'max_concurrency': max(controller.max_concurrency // n_shards, 1),
+        'min_rate': controller.min_rate / n_shards,
+        'min_concurrency': max(controller.min_concurrency // n_shards, 1),
+        'target_latency': controller.target_latency,
+        'rate_increase': controller.rate_increase / n_shards,
+        'decrease_factor': controller.decrease_factor,
+    }
+
+
+def _geocode_shard(shard, direction, engine, n_threads, path, grid, settings, rate_settings, pool_settings,
+                   metrics_buckets):
+    """
+    Geocode one shard in a worker process and save its results to a store of its own. Returns the number of inputs
+    and the state of the metrics of the worker, or None if metrics are disabled.
+    """
+
+    for name, value in settings.items():
+        setattr(census_api, name, value)
+    configure_rate_controller(**rate_settings)
+    configure_session(**pool_settings)
+    metrics = None if metrics_buckets is None else enable_metrics(metrics_buckets)
+
+    store = ResultStore(path, grid=grid)
+
+    def checkpoint(located_df, failed_df):
+        store.save_results(direction, located_df, failed_df)
+
+    try:
+        if direction == 'forward' and engine == 'batch':
+            bulk_geocode(shard, checkpoint=checkpoint)
+        else:
+            batch_geocode(shard, direction=direction, n_threads=n_threads, checkpoint=checkpoint)
+    finally:
+        store.close()
+
+    return len(shard), None if metrics is None else metrics.state()
+
+
+def sharded_geocode(data, store, direction='forward', n_workers=None, engine='request', n_threads=None,
+                    work_dir=None, verbose=False):
+    """
+    Geocode inputs in several worker processes and merge their results into a result store.
+
+    Unique inputs are hash-partitioned across `n_workers` processes. Each process runs its own geocoding loop,
+    rate controller, and connection pool, and saves its partial results to a separate SQLite file, so parsing and
+    building results is not limited by a single interpreter lock. Once every worker is done, the partial results are
+    merged into `store`.
+
+    The limits of the shared rate controller and the connection pool size of the shared session are divided between
+    the workers, see `shard_rate_settings`, so together they send requests at the configured rate rather than a
+    multiple of it. The other session settings and the `census_api` settings are copied to each worker. If metrics
+    are enabled, the metrics of each worker are added to the shared registry once it is done.
+
+    Parameters
+    ----------
+    data : iterable of str or tuple
+        Addresses (for forward or combined geocoding) or coordinates (for reverse geocoding) to be geocoded.
+    store : ResultStore
+        Store the results are merged into.
+    direction : str, optional
+        'forward', 'reverse', or 'combined'. See `batch_geocode`. Default is 'forward'.
+    n_workers : int, optional
+        Number of worker processes. Default is the number of CPUs.
+    engine : str, optional
+        'batch' to forward geocode with the Census batch endpoint, or 'request' to send one request per input.
+        Only used for forward geocoding. Default is 'request'.
+    n_threads : int, optional
+        Maximum number of threads per worker. Default is the `max_concurrency` of the rate controller of each worker.
+    work_dir : str or Path, optional
+        Directory for the partial results of each worker, which are kept after merging. If None, a temporary
+        directory is used and removed after merging.
+    verbose : bool, optional
+        Print progress to console. Default is False.
+
+    Returns
+    -------
+    int
+        Number of unique inputs geocoded.
+
+    Raises
+    ------
+    ValueError
+        If the `direction` parameter is not 'forward', 'reverse', or 'combined'.
+    """
+
+    if direction not in census_api.DIRECTIONS:
+        raise ValueError('direction must be "forward", "reverse", or "combined"')
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+    shards = [shard for shard in partition(data, direction, n_workers, store) if shard]
+    if not shards:
+        return 0
+
+    # Split the limits of the shared rate controller and connection pool between the workers
+    settings = {name: getattr(census_api, name) for name in CENSUS_SETTINGS}
+    rate_settings = shard_rate_settings(get_rate_controller(), len(shards))
+    pool_settings = session_settings()
+    pool_settings['pool_maxsize'] = max(pool_settings['pool_maxsize'] // len(shards), 1)
+    metrics = get_metrics()
+    metrics_buckets = None if metrics is None else metrics.buckets
+    if n_threads is None:
+        n_threads = rate_settings['max_concurrency']
+
+    temporary_dir = None
+    if work_dir is None:
+        temporary_dir = tempfile.TemporaryDirectory()
+        work_dir = temporary_dir.name
+    paths = [Path(work_dir) / f'shard-{i}.db' for i in range(len(shards))]
+
+    try:
+        # Spawn workers rather than forking, so no threads or open connections of this process are copied
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as executor:
+            futures = [executor.submit(_geocode_shard, shard, direction, engine, n_threads, path, store.grid, settings,
+                                       rate_settings, pool_settings, metrics_buckets)
+                       for shard, path in zip(shards, paths)]
+            n_geocoded = 0
+            for future in futures:
+                n_inputs, metrics_state = future.result()
+                n_geocoded += n_inputs
+                if metrics_state is not None:
+                    metrics.merge(metrics_state)
+
+    # Merge the partial results of every worker into the store, also those saved before a worker failed
+    finally:
+        for path in paths:
+            if path.exists():
+                n_results = store.merge(path)
+                if verbose:
+                    print(f'Merged {n_results:,} results from {path.name}')
+        if temporary_dir is not None:
+            temporary_dir.cleanup()
+
+    return n_geocoded
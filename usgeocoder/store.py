@@ -0,0 +1,798 @@
+import sqlite3
+import threading
+from itertools import chain
+import numpy as np
+import pandas as pd
+
+from . import census_api
+from .census_api import FORWARD_COLUMNS, REVERSE_COLUMNS, STATUS_COLUMNS
+from .index import KeyIndex, key_hashes
+from .normalize import NORMALIZATION_VERSION, normalize_addresses
+from .utils import parse_coordinates
+
+# SQLite limits the number of parameters in one statement, so lookups are split into chunks
+LOOKUP_CHUNK_SIZE = 900
+
+# Bytes of the database file SQLite reads through a memory map instead of read calls
+MMAP_SIZE = 2 ** 30
+
+# Spacing in degrees of the grid coordinates are snapped to for cache keys, so points closer than this share
+# one result. 1e-6 degrees is about 0.1 meters.
+COORDINATE_GRID = 1e-6
+
+# Column types of each table. Coordinates are stored as separate Longitude and Latitude columns. Benchmark and
+# Vintage record the Census data a result was made with, so results of an earlier release can be refreshed.
+TABLES = {
+    'addresses': {
+        'Address': 'TEXT',
+        'Date': 'TEXT',
+        'Longitude': 'REAL',
+        'Latitude': 'REAL',
+        'Status': 'TEXT',
+        'Attempts': 'INTEGER',
+        'Benchmark': 'TEXT',
+        'Vintage': 'TEXT'
+    },
+    'coordinates': {
+        'Longitude': 'REAL',
+        'Latitude': 'REAL',
+        'Date': 'TEXT',
+        'State': 'TEXT',
+        'County': 'TEXT',
+        'Census Block': 'TEXT',
+        'Census Tract': 'TEXT',
+        'Status': 'TEXT',
+        'Attempts': 'INTEGER',
+        'Benchmark': 'TEXT',
+        'Vintage': 'TEXT'
+    }
+}
+
+# Columns that select the Census data of a result in each table. Address locations do not depend on the vintage.
+RELEASE_COLUMNS = {
+    'addresses': ['Benchmark'],
+    'coordinates': ['Benchmark', 'Vintage']
+}
+
+
+def address_key(address):
+    """ Return the store key of an address. """
+    return str(address)
+
+
+def coordinates_array(coordinates):
+    """
+    Convert (longitude, latitude) pairs to a float64 array, parsing strings such as '(-104.98, 39.74)'.
+
+    Parameters
+    ----------
+    coordinates : iterable of tuple or str
+        Coordinate pairs. Missing or unparseable pairs become NaN.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (n, 2) with the longitude and latitude of each pair.
+    """
+
+    coordinates = coordinates.tolist() if isinstance(coordinates, (pd.Series, np.ndarray)) else list(coordinates)
+
+    # Convert pairs of numbers in one step, and only parse values one by one if there are strings or missing values
+    if coordinates and not isinstance(coordinates[0], str):
+        try:
+            if set(map(len, coordinates)) != {2}:
+                raise ValueError
+            positions = np.fromiter(chain.from_iterable(coordinates), dtype=np.float64)
+            if len(positions) == 2 * len(coordinates):
+                return positions.reshape(-1, 2)
+        except (TypeError, ValueError):
+            pass
+
+    pairs = [value if isinstance(value, tuple) and len(value) == 2 else parse_coordinates(value)
+             for value in coordinates]
+    return np.array([(np.nan, np.nan) if pair is None else pair for pair in pairs], dtype=np.float64).reshape(-1, 2)
+
+
+def coordinates_keys(longitudes, latitudes, grid=COORDINATE_GRID):
+    """
+    Return the store keys of arrays of longitudes and latitudes, snapped to a grid.
+
+    Parameters
+    ----------
+    longitudes, latitudes : array-like of float
+        Longitudes and latitudes in degrees.
+    grid : float, optional
+        Grid spacing in degrees. Default is `COORDINATE_GRID`.
+
+    Returns
+    -------
+    list of str or None
+        Keys formatted as 'x,y' with the integer grid position of each point, or None where a value is missing.
+    """
+
+    cells, valid = coordinates_cells(longitudes, latitudes, grid)
+    keys = pd.Series(cells[:, 0]).astype(str) + ',' + pd.Series(cells[:, 1]).astype(str)
+    return keys.where(valid, None).tolist()
+
+
+def coordinates_cells(longitudes, latitudes, grid=COORDINATE_GRID):
+    """
+    Return the integer grid position of arrays of longitudes and latitudes.
+
+    Returns
+    -------
+    cells : np.ndarray
+        Array of shape (n, 2) with the int64 grid position of each point, or (0, 0) where a value is missing.
+    valid : np.ndarray
+        Boolean array that is False where a longitude or latitude is missing.
+    """
+
+    cells = np.floor(np.column_stack([longitudes, latitudes]).astype(np.float64) / grid + 0.5)
+    valid = ~np.isnan(cells).any(axis=1)
+    return np.where(valid[:, None], cells, 0).astype(np.int64), valid
+
+
+def coordinates_hashes(longitudes, latitudes, grid=COORDINATE_GRID):
+    """
+    Return 64-bit hashes of the grid cells of arrays of longitudes and latitudes, for joining on coordinates.
+
+    Points in the same grid cell have the same hash, like their store keys, but hashes are compared and looked up
+    as numbers rather than as Python strings or tuples.
+
+    Returns
+    -------
+    hashes : np.ndarray
+        The uint64 hash of each grid cell.
+    valid : np.ndarray
+        Boolean array that is False where a longitude or latitude is missing.
+    """
+
+    cells, valid = coordinates_cells(longitudes, latitudes, grid)
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(cells), index=False).to_numpy()
+    return hashes, valid
+
+
+def address_hashes(addresses):
+    """
+    Return 64-bit hashes of addresses, for joining on address keys.
+
+    Returns
+    -------
+    hashes : np.ndarray
+        The uint64 hash of each address.
+    valid : np.ndarray
+        Boolean array that is False where an address is missing.
+    """
+
+    addresses = pd.Series(addresses, dtype=object)
+    hashes = pd.util.hash_pandas_object(addresses, index=False, categorize=False).to_numpy()
+    return hashes, addresses.notna().to_numpy()
+
+
+def coordinates_key(coordinates, grid=COORDINATE_GRID):
+    """ Return the store key of a (longitude, latitude) pair. """
+    return coordinates_keys([float(coordinates[0])], [float(coordinates[1])], grid)[0]
+
+
+class ResultStore:
+    """
+    An embedded SQLite store for geocoding results, indexed on address and on coordinates.
+
+    The database runs in write-ahead logging (WAL) mode, so several processes can read and write the same store,
+    and writes only touch the rows being added. Each thread uses its own connection.
+
+    `missing` and `seen` first check a `KeyIndex` of the hashed keys of each table, which is built on first use and
+    kept up to date as results are written, so only keys found in the index are looked up in the database to confirm
+    them, and new keys cost no database lookup.
+    Every write increments a version number of the table, so an index that missed writes from another process is
+    detected and rebuilt. `save_index` writes the indexes next to the database so they can be reloaded cheaply.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path of the SQLite database file. It is created if it doesn't exist.
+    timeout : float, optional
+        Seconds to wait for a lock held by another writer. Default is 30.
+    grid : float, optional
+        Spacing in degrees of the grid coordinates are snapped to for their keys. Coordinates in the same grid cell
+        share one result. If the store was created with a different grid, its coordinate keys are rebuilt.
+        Default is `COORDINATE_GRID`.
+    """
+
+    def __init__(self, path, timeout=30.0, grid=COORDINATE_GRID):
+        self.path = str(path)
+        self.timeout = timeout
+        self.grid = grid
+        self._local = threading.local()
+
+        # Key index of each table with the table version it is up to date with
+        self._indexes = {}
+        self._index_lock = threading.RLock()
+
+        connection = self._connection()
+        with connection:
+            for table, columns in TABLES.items():
+                column_definitions = ', '.join(f'"{column}" {kind}' for column, kind in columns.items())
+                connection.execute(f'CREATE TABLE IF NOT EXISTS {table} (Key TEXT PRIMARY KEY, {column_definitions})')
+
+                # Add columns missing from stores created by earlier versions. Their results have no release.
+                existing = {row[1] for row in connection.execute(f'PRAGMA table_info({table})')}
+                for column, kind in columns.items():
+                    if column not in existing:
+                        connection.execute(f'ALTER TABLE {table} ADD COLUMN "{column}" {kind}')
+
+                connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_status ON {table} (Status)')
+                connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_date ON {table} (Date)')
+            connection.execute('CREATE TABLE IF NOT EXISTS metadata (Name TEXT PRIMARY KEY, Value TEXT)')
+
+        # Rebuild coordinate keys made with another grid, or with the exact coordinates by earlier versions
+        stored_grid = connection.execute("SELECT Value FROM metadata WHERE Name = 'grid'").fetchone()
+        if stored_grid is None or float(stored_grid[0]) != grid:
+            self._rebuild_coordinate_keys()
+
+    def _rebuild_coordinate_keys(self):
+        """ Recompute the keys of the coordinates table for the grid of this store. """
+        columns = list(TABLES['coordinates'])
+        column_names = ', '.join(f'"{column}"' for column in columns)
+        connection = self._connection()
+        with connection:
+            rows = connection.execute(f'SELECT {column_names} FROM coordinates').fetchall()
+            if rows:
+                positions = np.array([row[:2] for row in rows], dtype=np.float64)
+                keys = coordinates_keys(positions[:, 0], positions[:, 1], self.grid)
+                connection.execute('DELETE FROM coordinates')
+                placeholders = ', '.join('?' for _ in range(len(columns) + 1))
+                connection.executemany(f'INSERT OR REPLACE INTO coordinates (Key, {column_names}) '
+                                       f'VALUES ({placeholders})', [(key, *row) for key, row in zip(keys, rows)])
+            connection.execute("INSERT OR REPLACE INTO metadata (Name, Value) VALUES ('grid', ?)", [repr(self.grid)])
+            self._increment_version(connection, 'coordinates')
+        self._update_index('coordinates', None)
+
+    def normalize_address_keys(self):
+        """
+        Re-key address results by the canonical form of their address from `normalize_addresses`.
+
+        Results saved with addresses as given, imported from CSV files, or normalized by an earlier version of
+        `normalize_addresses` are otherwise not found by a `Geocoder` that normalizes addresses. When several results
+        share a canonical address, a located result is kept over a failed one, then the most recent one. The
+        normalization version is recorded in the store, so this only scans the table once per version.
+
+        Returns
+        -------
+        int
+            Number of results whose address changed.
+        """
+
+        if self._metadata('address_normalization') == NORMALIZATION_VERSION:
+            return 0
+
+        columns = list(TABLES['addresses'])
+        column_names = ', '.join(f'"{column}"' for column in columns)
+        connection = self._connection()
+        with connection:
+            rows = connection.execute(f"SELECT Key, {column_names} FROM addresses WHERE Address IS NOT NULL "
+                                      f"ORDER BY Status = 'located', Date").fetchall()
+            canonical = normalize_addresses(pd.Series([row[1] for row in rows], dtype=object)).tolist() if rows else []
+            changed = {address for row, address in zip(rows, canonical) if address != row[1]}
+
+            # Replace every result of a changed canonical address by the last of its results in priority order
+            rekeyed = {}
+            old_keys = []
+            for row, address in zip(rows, canonical):
+                if address in changed:
+                    rekeyed[address_key(address)] = (address, *row[2:])
+                    old_keys.append(row[0])
+            if rekeyed:
+                connection.executemany('DELETE FROM addresses WHERE Key = ?', [(key,) for key in old_keys])
+                placeholders = ', '.join('?' for _ in range(len(columns) + 1))
+                connection.executemany(f'INSERT OR REPLACE INTO addresses (Key, {column_names}) '
+                                       f'VALUES ({placeholders})', [(key, *row) for key, row in rekeyed.items()])
+                self._increment_version(connection, 'addresses')
+            connection.execute("INSERT OR REPLACE INTO metadata (Name, Value) VALUES ('address_normalization', ?)",
+                               [str(NORMALIZATION_VERSION)])
+
+        if rekeyed:
+            self._update_index('addresses', None)
+        return sum(address != row[1] for row, address in zip(rows, canonical))
+
+    @staticmethod
+    def _increment_version(connection, table):
+        """ Increment the version of a table in the current transaction and return it. """
+        name = f'{table}_version'
+        connection.execute("INSERT OR IGNORE INTO metadata (Name, Value) VALUES (?, '0')", [name])
+        connection.execute('UPDATE metadata SET Value = CAST(Value AS INTEGER) + 1 WHERE Name = ?', [name])
+        return int(connection.execute('SELECT Value FROM metadata WHERE Name = ?', [name]).fetchone()[0])
+
+    def _metadata(self, name):
+        """ Return an integer value of the metadata table, or None if it is not set. """
+        row = self._connection().execute('SELECT Value FROM metadata WHERE Name = ?', [name]).fetchone()
+        return None if row is None else int(row[0])
+
+    def _index_path(self, table):
+        """ Return the directory the key index of a table is saved to. """
+        return f'{self.path}-index/{table}'
+
+    def _index(self, table):
+        """ Return the key index of a table, loading or rebuilding it if it is missing or out of date. """
+        with self._index_lock:
+            version = self._metadata(f'{table}_version') or 0
+            entry = self._indexes.get(table)
+            if entry is not None and entry[1] == version:
+                return entry[0]
+
+            # Reload the saved index if it is up to date, or rebuild it from the keys in the table
+            index = None
+            if self._metadata(f'{table}_index') == version:
+                index = KeyIndex.load(self._index_path(table))
+            if index is None:
+                rows = self._connection().execute(f'SELECT Key FROM {table} WHERE Key IS NOT NULL')
+                index = KeyIndex(key_hashes(key for (key,) in rows))
+            self._indexes[table] = (index, version)
+            return index
+
+    def _update_index(self, table, version, added=None, removed=None):
+        """
+        Apply a write to the key index of a table. The index is dropped if it missed a write, or if `version` is None
+        because the written keys are not known, and rebuilt on next use.
+        """
+
+        with self._index_lock:
+            entry = self._indexes.pop(table, None)
+            if entry is None or version is None or version != entry[1] + 1:
+                return None
+
+            index = entry[0]
+            if added is not None:
+                index.add(key_hashes(added))
+            if removed is not None:
+                index.remove(key_hashes(removed))
+            self._indexes[table] = (index, version)
+
+    def save_index(self):
+        """
+        Save the key index of each table next to the database, in a directory named after it with '-index' appended.
+
+        Only indexes that changed since they were saved are written, and usually only their recently added keys.
+        """
+
+        with self._index_lock:
+            for table, (index, version) in self._indexes.items():
+                if self._metadata(f'{table}_index') == version:
+                    continue
+                index.save(self._index_path(table))
+                connection = self._connection()
+                with connection:
+                    connection.execute('INSERT OR REPLACE INTO metadata (Name, Value) VALUES (?, ?)',
+                                       [f'{table}_index', str(version)])
+
+    def keys(self, table, values):
+        """
+        Return the store keys of addresses or coordinates.
+
+        Parameters
+        ----------
+        table : str
+            'addresses' or 'coordinates'.
+        values : iterable of str or tuple
+            Addresses or (longitude, latitude) coordinates. Coordinates may also be strings such as
+            '(-104.98, 39.74)'.
+
+        Returns
+        -------
+        list of str or None
+            The key of each value, or None for coordinates that are missing or cannot be parsed.
+        """
+
+        if table == 'coordinates':
+            positions = coordinates_array(values)
+            return coordinates_keys(positions[:, 0], positions[:, 1], self.grid)
+        return [address_key(address) for address in values]
+
+    def _connection(self):
+        """ Return the connection of the current thread, opening it if needed. """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """ Close the connection of the current thread. """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def upsert(self, table, df):
+        """
+        Insert geocoding results, replacing any existing results with the same key.
+
+        Parameters
+        ----------
+        table : str
+            'addresses' or 'coordinates'.
+        df : pd.DataFrame
+            Results in the schema returned by `batch_geocode`, or in the compact schema of `compact_results`.
+            Without a 'Status' column, rows with a result are stored as located and rows without one as 'no_match'.
+            Rows without 'Benchmark' and 'Vintage' columns are recorded as made with `census_api.BENCHMARK` and
+            `census_api.VINTAGE`.
+        """
+
+        if df.empty:
+            return None
+
+        df = df.copy()
+        if 'Status' not in df.columns:
+            located = df['Census Tract' if table == 'coordinates' else 'Longitude'].notna()
+            df['Status'] = np.where(located, 'located', 'no_match')
+        if 'Attempts' not in df.columns:
+            df['Attempts'] = None
+        if 'Benchmark' not in df.columns:
+            df['Benchmark'] = census_api.BENCHMARK
+        if 'Vintage' not in df.columns:
+            df['Vintage'] = census_api.VINTAGE
+        if pd.api.types.is_datetime64_any_dtype(df['Date']):
+            df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+
+        if table == 'coordinates':
+            if 'Coordinates' in df.columns:
+                positions = coordinates_array(df['Coordinates'])
+                df['Longitude'] = positions[:, 0]
+                df['Latitude'] = positions[:, 1]
+            keys = coordinates_keys(df['Longitude'].to_numpy(np.float64), df['Latitude'].to_numpy(np.float64),
+                                    self.grid)
+        else:
+            keys = self.keys(table, df['Address'])
+
+        # Convert missing values to None so SQLite stores them as NULL
+        columns = list(TABLES[table])
+        df = df[columns].astype(object).where(df[columns].notna(), None)
+        rows = [(key, *values) for key, values in zip(keys, df.itertuples(index=False, name=None))]
+
+        column_names = ', '.join(f'"{column}"' for column in columns)
+        placeholders = ', '.join('?' for _ in range(len(columns) + 1))
+        connection = self._connection()
+        with connection:
+            connection.executemany(f'INSERT OR REPLACE INTO {table} (Key, {column_names}) VALUES ({placeholders})',
+                                   rows)
+            version = self._increment_version(connection, table)
+        self._update_index(table, version, added=[key for key in keys if key is not None])
+
+    def save_results(self, direction, located_df, failed_df):
+        """
+        Save the results of a batch geocoding run, for example from the `checkpoint` callback of `batch_geocode`.
+
+        Parameters
+        ----------
+        direction : str
+            'forward' or 'reverse', or 'combined' to save both the addresses and the located coordinates.
+        located_df : pd.DataFrame
+            Located results.
+        failed_df : pd.DataFrame
+            Failed results.
+        """
+
+        if direction == 'combined':
+            self.upsert('coordinates', located_df.dropna(subset=['Census Tract'])[REVERSE_COLUMNS])
+            located_df = located_df[FORWARD_COLUMNS]
+            failed_df = failed_df[FORWARD_COLUMNS + STATUS_COLUMNS]
+
+        table = 'coordinates' if direction == 'reverse' else 'addresses'
+        self.upsert(table, located_df.drop(columns=STATUS_COLUMNS, errors='ignore'))
+        self.upsert(table, failed_df)
+
+    def merge(self, path):
+        """
+        Copy every result of another store into this one, replacing existing results with the same key.
+
+        Parameters
+        ----------
+        path : str or Path
+            Path of the SQLite database file of the other store.
+
+        Returns
+        -------
+        int
+            Number of merged results.
+        """
+
+        connection = self._connection()
+        connection.execute('ATTACH DATABASE ? AS other', [str(path)])
+        try:
+            n_results = 0
+            merged = {}
+            with connection:
+                for table, columns in TABLES.items():
+                    rows = connection.execute(f'SELECT Key FROM other.{table} WHERE Key IS NOT NULL')
+                    keys = [key for (key,) in rows]
+                    column_names = ', '.join(['Key'] + [f'"{column}"' for column in columns])
+                    query = f'INSERT OR REPLACE INTO {table} ({column_names}) SELECT {column_names} FROM other.{table}'
+                    n_results += connection.execute(query).rowcount
+                    merged[table] = (self._increment_version(connection, table), keys)
+        finally:
+            connection.execute('DETACH DATABASE other')
+
+        for table, (version, keys) in merged.items():
+            self._update_index(table, version, added=keys)
+        return n_results
+
+    def _select_keys(self, table, keys, columns):
+        """ Yield the rows of the given keys, querying at most `LOOKUP_CHUNK_SIZE` keys at a time. """
+        keys = list(keys)
+        column_names = ', '.join(f'"{column}"' for column in columns)
+        connection = self._connection()
+        for i in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+            chunk = keys[i:i + LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join('?' for _ in chunk)
+            query = f'SELECT {column_names} FROM {table} WHERE Key IN ({placeholders})'
+            yield from connection.execute(query, chunk)
+
+    def seen(self, table, values):
+        """
+        Return the values that already have a located or failed result.
+
+        Parameters
+        ----------
+        table : str
+            'addresses' or 'coordinates'.
+        values : iterable of str or tuple
+            Addresses or (longitude, latitude) coordinates.
+
+        Returns
+        -------
+        set
+            The subset of `values` found in the store. Coordinates are found if a result is stored for their grid
+            cell.
+        """
+
+        values = pd.Series(list(values), dtype=object)
+        keys = pd.Series(self.keys(table, values), dtype=object)
+        values, keys = values[keys.notna()], keys[keys.notna()]
+        found = pd.Series(self._indexed(table, keys), index=keys.index)
+        return set(values[found])
+
+    def _indexed(self, table, keys):
+        """
+        Return whether each key is in the table, using the key index as a filter with an exact check of its hits.
+
+        The index is rebuilt whenever the table version shows a write it missed, so keys not found in it are not in
+        the table and are not looked up. Keys found in it are confirmed in the database, since a hash collision or a
+        row removed without a version change would otherwise hide a key that has no result.
+        """
+
+        keys = pd.Series(keys, dtype=object)
+        found = self._index(table).contains(key_hashes(keys))
+        candidates = keys[found]
+        stored = {key for (key,) in self._select_keys(table, candidates.unique(), ['Key'])}
+        found[found] = candidates.isin(stored).to_numpy()
+        return found
+
+    def missing(self, table, values):
+        """
+        Return the values that have no result yet, keeping one value per key.
+
+        Unlike the difference of `values` and `seen`, coordinates in the same grid cell are only returned once, so
+        they are only geocoded once. Values whose result is a transient failure, with a status in
+        `census_api.RETRY_STATUSES`, are also returned, so a resumed run tries them again.
+
+        Parameters
+        ----------
+        table : str
+            'addresses' or 'coordinates'.
+        values : iterable of str or tuple
+            Addresses or (longitude, latitude) coordinates. Missing coordinates are skipped.
+
+        Returns
+        -------
+        list
+            The first value of each key that is not in the store or failed with a transient failure.
+        """
+
+        values = pd.Series(list(values), dtype=object)
+        keys = pd.Series(self.keys(table, values), dtype=object)
+        unique = keys.notna() & ~keys.duplicated()
+        values, keys = values[unique], keys[unique]
+        done = self._indexed(table, keys) & ~keys.isin(self._retry_keys(table)).to_numpy()
+        return values[~done].tolist()
+
+    def _retry_keys(self, table):
+        """ Return the keys of results that failed with a transient failure. Uses the index on 'Status'. """
+        placeholders = ', '.join('?' for _ in census_api.RETRY_STATUSES)
+        rows = self._connection().execute(f'SELECT Key FROM {table} WHERE Status IN ({placeholders})',
+                                          list(census_api.RETRY_STATUSES))
+        return {key for (key,) in rows}
+
+    def stale(self, table, cutoff_date, failed_cutoff_date=None, values=None, limit=None):
+        """
+        Return the addresses or coordinates whose results are due for a refresh. Without `values`, the oldest results
+        come first.
+
+        A result is due if it is dated before its cutoff date, or if it was made with another benchmark or vintage
+        than `census_api.BENCHMARK` and `census_api.VINTAGE`. Results stored by earlier versions, which have no
+        benchmark or vintage, are only due by date.
+
+        Parameters
+        ----------
+        table : str
+            'addresses' or 'coordinates'.
+        cutoff_date : str
+            Date in the format 'YYYY-MM-DD'. Located results dated before it are due.
+        failed_cutoff_date : str, optional
+            Date in the format 'YYYY-MM-DD'. Failed results dated before it are due. Default is `cutoff_date`.
+        values : iterable of str or tuple, optional
+            Only check the results of these addresses or coordinates. Default checks every result.
+        limit : int, optional
+            Maximum number of values to return. Default returns every due value.
+
+        Returns
+        -------
+        list
+            Addresses, or the stored (longitude, latitude) of each due grid cell.
+        """
+
+        if failed_cutoff_date is None:
+            failed_cutoff_date = cutoff_date
+        conditions = ["(Status = 'located' AND Date < ?)", "(Status IS NOT 'located' AND Date < ?)"]
+        parameters = [cutoff_date, failed_cutoff_date]
+        releases = {'Benchmark': census_api.BENCHMARK, 'Vintage': census_api.VINTAGE}
+        for column in RELEASE_COLUMNS[table]:
+            conditions.append(f'("{column}" IS NOT NULL AND "{column}" != ?)')
+            parameters.append(releases[column])
+
+        value_columns = '"Address"' if table == 'addresses' else '"Longitude", "Latitude"'
+        query = f'SELECT {value_columns} FROM {table} WHERE ({" OR ".join(conditions)})'
+        connection = self._connection()
+        if values is None:
+            query += ' ORDER BY Date'
+            if limit is not None:
+                query += f' LIMIT {int(limit)}'
+            rows = connection.execute(query, parameters).fetchall()
+        else:
+            keys = list({key for key in self.keys(table, values) if key is not None})
+            rows = []
+            for i in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+                chunk = keys[i:i + LOOKUP_CHUNK_SIZE]
+                placeholders = ', '.join('?' for _ in chunk)
+                rows += connection.execute(f'{query} AND Key IN ({placeholders})', parameters + chunk).fetchall()
+            rows = rows[:limit]
+
+        if table == 'addresses':
+            return [address for (address,) in rows]
+        return [(longitude, latitude) for longitude, latitude in rows]
+
+    def lookup(self, table, values, located=True, columns=None):
+        """
+        Return the stored results of the given addresses or coordinates without loading the rest of the table.
+
+        Parameters
+        ----------
+        table : str
+            'addresses' or 'coordinates'.
+        values : iterable of str or tuple
+            Addresses or (longitude, latitude) coordinates.
+        located : bool, optional
+            Return located results if True, or failed results if False. Default is True.
+        columns : list of str, optional
+            Columns to return. See `load`. Default returns every column.
+
+        Returns
+        -------
+        pd.DataFrame
+            Results in the same schema as `load`.
+        """
+
+        stored_columns = [column for column in self._stored_columns(table, located, columns) if column != 'Status']
+        keys = {key for key in self.keys(table, values) if key is not None}
+        rows = [row for row in self._select_keys(table, keys, stored_columns + ['Status'])
+                if (row[-1] == 'located') == located]
+        df = pd.DataFrame(rows, columns=stored_columns + ['Status'])
+        return self._to_frame(table, df, located, columns)
+
+    def load(self, table, located=True, columns=None):
+        """
+        Load all located or failed results of a table.
+
+        Parameters
+        ----------
+        table : str
+            'addresses' or 'coordinates'.
+        located : bool, optional
+            Load located results if True, or failed results if False. Default is True.
+        columns : list of str, optional
+            Columns to load, such as ['Address', 'Date']. Only the stored columns they need are read from the
+            database. Default loads every column.
+
+        Returns
+        -------
+        pd.DataFrame
+            Results in the schema used by `Geocoder`. Failed results include the 'Status' and 'Attempts' columns.
+        """
+
+        column_names = ', '.join(f'"{column}"' for column in self._stored_columns(table, located, columns))
+        condition = "Status = 'located'" if located else "Status IS NOT 'located'"
+        query = f'SELECT {column_names} FROM {table} WHERE {condition}'
+        df = pd.read_sql_query(query, self._connection())
+        return self._to_frame(table, df, located, columns)
+
+    @staticmethod
+    def _columns(table, located):
+        """ Return the columns of the DataFrame schema used by `Geocoder`. """
+        columns = REVERSE_COLUMNS if table == 'coordinates' else FORWARD_COLUMNS
+        return columns if located else columns + STATUS_COLUMNS
+
+    def _stored_columns(self, table, located, columns=None):
+        """ Return the stored columns needed for the given DataFrame columns. """
+        columns = self._columns(table, located) if columns is None else columns
+        needed = set(columns)
+        if 'Coordinates' in needed:
+            needed |= {'Longitude', 'Latitude'}
+        return [column for column in TABLES[table] if column in needed]
+
+    def _to_frame(self, table, df, located, columns=None):
+        """ Convert stored rows to the DataFrame schema used by `Geocoder`. """
+        columns = self._columns(table, located) if columns is None else columns
+        if 'Coordinates' in columns:
+            if table == 'coordinates':
+                df['Coordinates'] = list(zip(df['Longitude'], df['Latitude']))
+            else:
+                df['Coordinates'] = [None if pd.isna(longitude) else (longitude, latitude)
+                                     for longitude, latitude in zip(df['Longitude'], df['Latitude'])]
+
+        return df[list(columns)].reset_index(drop=True)
+
+    def empty(self, table):
+        """ Return True if a table has no results. Unlike `count`, this does not scan the table. """
+        return self._connection().execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone() is None
+
+    def count(self, table, located=None):
+        """ Return the number of results in a table, optionally only the located or failed ones. """
+        query = f'SELECT COUNT(*) FROM {table}'
+        if located is not None:
+            query += " WHERE Status = 'located'" if located else " WHERE Status IS NOT 'located'"
+        return self._connection().execute(query).fetchone()[0]
+
+    def delete(self, table, values):
+        """ Delete the results of the given addresses or coordinates. """
+        keys = [key for key in self.keys(table, values) if key is not None]
+        connection = self._connection()
+        with connection:
+            for i in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+                chunk = keys[i:i + LOOKUP_CHUNK_SIZE]
+                placeholders = ', '.join('?' for _ in chunk)
+                connection.execute(f'DELETE FROM {table} WHERE Key IN ({placeholders})', chunk)
+            version = self._increment_version(connection, table)
+        self._update_index(table, version, removed=keys)
+
+    def delete_older_than(self, table, cutoff_date, located=None):
+        """
+        Delete results dated before a cutoff date.
+
+        Parameters
+        ----------
+        table : str
+            'addresses' or 'coordinates'.
+        cutoff_date : str
+            Date in the format 'YYYY-MM-DD'. Results dated before it are deleted.
+        located : bool, optional
+            Only delete located results if True, or failed results if False. Default deletes both.
+
+        Returns
+        -------
+        int
+            Number of deleted results.
+        """
+
+        query = f'DELETE FROM {table} WHERE Date < ?'
+        if located is not None:
+            query += " AND Status = 'located'" if located else " AND Status IS NOT 'located'"
+        connection = self._connection()
+        with connection:
+            n_deleted = connection.execute(query, [cutoff_date]).rowcount
+            self._increment_version(connection, table)
+
+        # The deleted keys are not known, so the index is rebuilt on next use
+        self._update_index(table, None)
+        return n_deleted
@@ -1,4 +1,4 @@
-import pandas as pd
+import re
 
 
 def concatenate_address(df):
@@ -38,6 +38,46 @@ def concatenate_address(df):
     return address.str.strip()
 
 
+def split_address(address):
+    """
+    Split a single formatted address string into its street, city, state, and ZIP components.
+
+    This is the inverse of `concatenate_address` and expects addresses formatted as
+    `123 Main St, City, State Zip`. Components that cannot be identified are returned as empty strings,
+    and an address that cannot be split is returned whole as the street component.
+
+    Parameters:
+    ----------
+    address : str
+        A formatted address string.
+
+    Returns:
+    -------
+    tuple of (str, str, str, str)
+        The (street, city, state, zip) components of the address.
+    """
+
+    parts = [part.strip() for part in str(address).split(',')]
+    state_zip = re.compile(r'^([A-Za-z][A-Za-z ]*?)?\s*(\d{5}(?:-\d{4})?)?$')
+
+    # Address is in the expected format: street, city, state zip
+    if len(parts) >= 3:
+        match = state_zip.match(parts[-1])
+        if match:
+            street = ', '.join(parts[:-2])
+            return street, parts[-2], match.group(1) or '', match.group(2) or ''
+        return ', '.join(parts[:-1]), parts[-1], '', ''
+
+    # Address is missing either the city or the state and zip
+    if len(parts) == 2:
+        match = state_zip.match(parts[-1])
+        if match and match.group(2):
+            return parts[0], '', match.group(1) or '', match.group(2)
+        return parts[0], parts[1], '', ''
+
+    return str(address).strip(), '', '', ''
+
+
 def concatenate_coordinates(df):
     """
     Create a series of (Longitude, Latitude) coordinate tuples from a DataFrame.
@@ -54,10 +94,45 @@ def concatenate_coordinates(df):
         entry corresponds to a row in the input DataFrame.
     """
 
+    import pandas as pd
+
     coordinates = list(zip(df['Longitude'], df['Latitude']))
     return pd.Series(coordinates, index=df.index)
 
 
+def parse_coordinates(value):
+    """
+    Parse a (Longitude, Latitude) pair from a tuple, list, or string.
+
+    Coordinates saved to CSV are read back as strings such as '(-104.98, 39.74)'.
+    This converts them back to tuples of floats so they compare equal to freshly geocoded coordinates.
+
+    Parameters:
+    ----------
+    value : tuple, list, or str
+        A coordinate pair or its string representation.
+
+    Returns:
+    -------
+    tuple of (float, float) or None
+        The (Longitude, Latitude) pair, or None if the value is missing or cannot be parsed.
+    """
+
+    if isinstance(value, str):
+        parts = value.strip().strip('()[]').split(',')
+        try:
+            longitude, latitude = (float(part) for part in parts)
+        except ValueError:
+            return None
+        return longitude, latitude
+
+    try:
+        longitude, latitude = value
+        return float(longitude), float(latitude)
+    except (TypeError, ValueError):
+        return None
+
+
 def create_address_list(df):
     """
     Extract a list of unique addresses from a DataFrame.